@@ -1,5 +1,7 @@
 """Bot configuration using pydantic-settings."""
 
+from functools import cached_property, lru_cache
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -33,9 +35,12 @@ class Settings(BaseSettings):
 
     # Logging
     LOG_LEVEL: str = "INFO"
+    DEBUG_ENDPOINTS: bool = False  # Serve /debug/pool (unauthenticated, keep off in production)
 
     # Database
     DB_PATH: str = "bot.db"
+    DB_POOL_SIZE: int = 8
+    DB_POOL_TIMEOUT: float = 3.0  # Seconds to wait for a free connection
 
     # Limits
     MAX_TEXT_LENGTH: int = 500
@@ -52,17 +57,21 @@ class Settings(BaseSettings):
     # Premium price in kopecks (770 RUB)
     PREMIUM_PRICE: int = 77000
 
-    @property
-    def admin_ids(self) -> list[int]:
-        """Parse admin IDs from comma-separated string."""
-        if not self.ADMIN_IDS:
-            return []
-        return [int(id_.strip()) for id_ in self.ADMIN_IDS.split(",") if id_.strip()]
+    @cached_property
+    def admin_ids(self) -> frozenset[int]:
+        """Admin IDs parsed once from the comma-separated string."""
+        return frozenset(int(id_) for id_ in self.ADMIN_IDS.split(",") if id_.strip())
 
     def is_admin(self, user_id: int) -> bool:
         """Check if user is admin."""
         return user_id in self.admin_ids
 
 
+@lru_cache
+def get_settings() -> Settings:
+    """Return the process-wide settings (reads .env only once)."""
+    return Settings()
+
+
 # Global settings instance
-settings = Settings()
+settings = get_settings()
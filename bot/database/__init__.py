@@ -1,6 +1,6 @@
 """Database module."""
 
-from .database import init_db, get_db
+from .database import init_db, get_db, close_db, get_pool_stats
 from .models import User, Message, DailyUsage, Referral, Payment
 from .repositories import (
     UserRepository,
@@ -9,11 +9,14 @@ from .repositories import (
     ReferralRepository,
     PaymentRepository,
     AdminRepository,
+    last_active_flusher,
 )
 
 __all__ = [
     "init_db",
     "get_db",
+    "close_db",
+    "get_pool_stats",
     "User",
     "Message",
     "DailyUsage",
@@ -25,4 +28,5 @@ __all__ = [
     "ReferralRepository",
     "PaymentRepository",
     "AdminRepository",
+    "last_active_flusher",
 ]
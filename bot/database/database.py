@@ -1,12 +1,18 @@
 """Database connection and initialization."""
 
+import asyncio
 import logging
+import sqlite3
 import aiosqlite
+import orjson
+from datetime import datetime
+from importlib import resources
 from pathlib import Path
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
 from bot.config import settings
+from .pool import ConnectionPool
 
 logger = logging.getLogger(__name__)
 
@@ -15,129 +21,64 @@ DB_PATH = Path(settings.DB_PATH)
 # Ensure parent directory exists (critical for Railway Volumes where DB_PATH=/data/bot.db)
 DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 
-# Database schema
-SCHEMA = """
--- Users table
-CREATE TABLE IF NOT EXISTS users (
-    id INTEGER PRIMARY KEY,                           -- Telegram user ID
-    username TEXT,                                    -- @username (может быть NULL)
-    first_name TEXT NOT NULL,                         -- Имя из Telegram
-    language_code TEXT DEFAULT 'ru',                  -- Язык интерфейса
-    
-    -- Настройки обучения
-    hsk_level INTEGER DEFAULT 1 CHECK (hsk_level BETWEEN 1 AND 3),
-    speech_speed TEXT DEFAULT 'normal' CHECK (speech_speed IN ('slow', 'normal', 'fast')),
-    current_topic TEXT DEFAULT 'daily',               -- Текущая тема диалога
-    
-    -- Подписка
-    premium_until TIMESTAMP,                          -- NULL = нет Premium
-    
-    -- Реферальная программа
-    referrer_id INTEGER REFERENCES users(id),         -- Кто пригласил
-    referral_code TEXT UNIQUE,                        -- Уникальный код для ссылки
-    
-    -- Метаданные
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    last_active_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    is_blocked INTEGER DEFAULT 0                      -- Заблокирован ли
-);
-
-CREATE INDEX IF NOT EXISTS idx_users_referral_code ON users(referral_code);
-CREATE INDEX IF NOT EXISTS idx_users_referrer_id ON users(referrer_id);
-
--- Messages table
-CREATE TABLE IF NOT EXISTS messages (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-    
-    role TEXT NOT NULL CHECK (role IN ('user', 'assistant')),
-    content TEXT NOT NULL,                            -- Текст сообщения
-    
-    -- Для сообщений пользователя
-    original_text TEXT,                               -- Исходный текст (до исправления)
-    correction TEXT,                                  -- JSON: {"original": "...", "corrected": "...", "explanation": "..."}
-    
-    -- Для ответов бота
-    pinyin TEXT,                                      -- Пиньинь ответа
-    translation TEXT,                                 -- Перевод на русский
-    
-    topic TEXT,                                       -- Тема диалога
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
-
-CREATE INDEX IF NOT EXISTS idx_messages_user_id ON messages(user_id);
-CREATE INDEX IF NOT EXISTS idx_messages_created_at ON messages(created_at);
-
--- Saved words table
-CREATE TABLE IF NOT EXISTS saved_words (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-    
-    hanzi TEXT NOT NULL,                              -- 你好
-    pinyin TEXT NOT NULL,                             -- nǐ hǎo
-    translation TEXT NOT NULL,                        -- привет
-    context TEXT,                                     -- Предложение, где встретилось
-    
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    
-    UNIQUE(user_id, hanzi)                            -- Одно слово один раз
-);
-
-CREATE INDEX IF NOT EXISTS idx_saved_words_user_id ON saved_words(user_id);
-
--- Daily usage table
-CREATE TABLE IF NOT EXISTS daily_usage (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-    date TEXT NOT NULL,                               -- YYYY-MM-DD
-    
-    text_count INTEGER DEFAULT 0,                     -- Текстовых сообщений
-    voice_count INTEGER DEFAULT 0,                    -- Голосовых сообщений
-    
-    UNIQUE(user_id, date)
-);
-
-CREATE INDEX IF NOT EXISTS idx_daily_usage_user_date ON daily_usage(user_id, date);
-
--- Referrals table
-CREATE TABLE IF NOT EXISTS referrals (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    referrer_id INTEGER NOT NULL REFERENCES users(id),  -- Кто пригласил
-    referred_id INTEGER NOT NULL REFERENCES users(id),  -- Кого пригласил
-    
-    status TEXT DEFAULT 'registered' CHECK (status IN ('registered', 'subscribed')),
-    bonus_days_given INTEGER DEFAULT 0,                 -- Сколько дней уже начислено
-    
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    
-    UNIQUE(referred_id)                                 -- Каждый может быть приглашён только раз
-);
-
-CREATE INDEX IF NOT EXISTS idx_referrals_referrer_id ON referrals(referrer_id);
-
--- Payments table
-CREATE TABLE IF NOT EXISTS payments (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-    
-    amount INTEGER NOT NULL,                            -- Сумма в копейках (77000 = ₽770)
-    currency TEXT DEFAULT 'RUB',
-    
-    telegram_payment_id TEXT,                           -- ID платежа от Telegram
-    provider_payment_id TEXT,                           -- ID от платёжной системы
-    
-    status TEXT DEFAULT 'completed' CHECK (status IN ('pending', 'completed', 'failed', 'refunded')),
-    
-    days_granted INTEGER NOT NULL,                      -- Сколько дней Premium выдано
-    source TEXT DEFAULT 'payment' CHECK (source IN ('payment', 'referral', 'admin', 'promo')),
-    
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
-
-CREATE INDEX IF NOT EXISTS idx_payments_user_id ON payments(user_id);
-CREATE INDEX IF NOT EXISTS idx_payments_created_at ON payments(created_at);
-CREATE INDEX IF NOT EXISTS idx_payments_status ON payments(status);
-"""
+
+def _load_statements(name: str) -> tuple[str, ...]:
+    """Read a bundled .sql file and split it into individual statements."""
+    script = resources.files(__package__).joinpath(name).read_text(encoding="utf-8")
+    statements, buffer = [], ""
+    for line in script.splitlines(keepends=True):
+        buffer += line
+        if sqlite3.complete_statement(buffer):
+            statements.append(buffer.strip())
+            buffer = ""
+    return tuple(statements)
+
+
+# Database schema, parsed once at import.
+# Tables (UNIQUE constraints must exist before any insert)
+SCHEMA_TABLES = _load_statements("schema.sql")
+# Non-unique indexes, deferrable for bulk loads
+SCHEMA_INDEXES = _load_statements("indexes.sql")
+
+
+# Persistent pragmas (journal mode is stored in the DB file, set once at init)
+DB_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+)
+
+# Per-connection pragmas (SQLite resets these for every new connection)
+SESSION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",      # Safe under WAL, no fsync per commit
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",     # 256 MB
+    "PRAGMA cache_size=-20000",       # ~20 MB page cache
+    "PRAGMA busy_timeout=5000",
+)
+
+
+def _convert_timestamp(value: bytes):
+    """Parse TIMESTAMP columns once at fetch time.
+
+    Replaces sqlite3's default converter, which rejects the 'T' separator
+    written by datetime.isoformat(). Unparseable values stay strings.
+    """
+    text = value.decode()
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return text
+
+
+def _convert_json(value: bytes):
+    """Decode JSON columns at fetch time; malformed payloads become None."""
+    try:
+        return orjson.loads(value)
+    except ValueError:
+        return None
+
+
+sqlite3.register_converter("TIMESTAMP", _convert_timestamp)
+sqlite3.register_converter("JSON", _convert_json)
 
 
 # Migrations: add new columns safely (idempotent ALTER TABLE)
@@ -145,38 +86,128 @@ MIGRATIONS = [
     # Migration 1: Add notification tracking columns for trial/premium expiry
     "ALTER TABLE users ADD COLUMN trial_notified INTEGER DEFAULT 0",
     "ALTER TABLE users ADD COLUMN premium_expired_notified INTEGER DEFAULT 0",
+    # Migration 2: single-column indexes superseded by composite ones in SCHEMA_INDEXES
+    "DROP INDEX IF EXISTS idx_messages_user_id",
+    "DROP INDEX IF EXISTS idx_payments_user_id",
+    # Migration 3: superseded by the covering idx_payments_status_created
+    "DROP INDEX IF EXISTS idx_payments_created_at",
+    "DROP INDEX IF EXISTS idx_payments_status",
+    # Migration 4: superseded by the covering idx_referrals_referrer_status
+    "DROP INDEX IF EXISTS idx_referrals_referrer_id",
+    # Migration 5: memoized LLM output for the help / explain buttons
+    "ALTER TABLE messages ADD COLUMN suggestions JSON",
+    "ALTER TABLE messages ADD COLUMN explanation TEXT",
 ]
 
 
+async def _connect() -> aiosqlite.Connection:
+    """Connection factory for the pool: row factory, converters and session pragmas."""
+    db = await aiosqlite.connect(
+        DB_PATH,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        cached_statements=256,  # Long-lived connections: keep every repository statement prepared
+    )
+    db.row_factory = aiosqlite.Row
+    for pragma in SESSION_PRAGMAS:
+        await db.execute(pragma)
+    return db
+
+
+_pool: ConnectionPool | None = None
+
+
 async def init_db() -> None:
     """Initialize database with schema and run migrations."""
+    global _pool
     logger.info(f"Database path: {DB_PATH} (exists: {DB_PATH.exists()})")
 
     async with aiosqlite.connect(DB_PATH) as db:
-        await db.executescript(SCHEMA)
+        for pragma in DB_PRAGMAS + SESSION_PRAGMAS:
+            await db.execute(pragma)
+
+        await _execute_in_transaction(db, SCHEMA_TABLES)
+
+        await run_migrations(db)
+
+        await create_indexes(db)
+
+    # (Re)open the pool against the current DB_PATH
+    await close_db()
+    pool = ConnectionPool(_connect, settings.DB_POOL_SIZE, settings.DB_POOL_TIMEOUT)
+    await pool.open()
+    _pool = pool
+
+    logger.info(f"Database initialized successfully (pool of {pool.size} connections).")
+
+
+async def _execute_in_transaction(db: aiosqlite.Connection, statements: tuple[str, ...]) -> None:
+    await db.execute("BEGIN")
+    try:
+        for statement in statements:
+            await db.execute(statement)
         await db.commit()
+    except BaseException:
+        await db.rollback()
+        raise
+
+
+async def run_migrations(db: aiosqlite.Connection) -> None:
+    """Apply pending MIGRATIONS in one transaction, tracked by PRAGMA user_version."""
+    async with db.execute("PRAGMA user_version") as cursor:
+        version = (await cursor.fetchone())[0]
+    if version >= len(MIGRATIONS):
+        return  # Schema is current
 
-        # Run migrations (safe: ignores "duplicate column" errors)
-        for i, migration in enumerate(MIGRATIONS, 1):
+    await db.execute("BEGIN")
+    try:
+        for i, migration in enumerate(MIGRATIONS[version:], version + 1):
             try:
                 await db.execute(migration)
-                await db.commit()
                 logger.info(f"Migration {i} applied: {migration[:60]}...")
             except Exception as e:
-                if "duplicate column" in str(e).lower():
-                    pass  # Column already exists — expected on subsequent runs
-                else:
-                    logger.warning(f"Migration {i} skipped: {e}")
+                # Databases created before user_version tracking may already have the column
+                if "duplicate column" not in str(e).lower():
+                    logger.error(f"Migration {i} failed: {e}")
+                    raise
+        await db.execute(f"PRAGMA user_version = {len(MIGRATIONS)}")
+        await db.commit()
+    except BaseException:
+        # Leave user_version untouched so the next start retries
+        await db.rollback()
+        raise
+
+
+async def create_indexes(db: aiosqlite.Connection) -> None:
+    """Create secondary indexes (idempotent).
+
+    init_db() calls this on every start. Seeding/import code should create
+    the tables, load the rows, and only then call this once.
+    """
+    await _execute_in_transaction(db, SCHEMA_INDEXES)
 
-    logger.info("Database initialized successfully.")
+
+async def close_db() -> None:
+    """Close the connection pool (call on shutdown)."""
+    global _pool
+    if _pool is not None:
+        pool, _pool = _pool, None
+        await pool.close_all()
+
+
+def get_pool_stats() -> dict:
+    """Connection pool usage, or {"status": "closed"} before init_db()."""
+    if _pool is None:
+        return {"status": "closed"}
+    return {"status": "open", **_pool.stats()}
 
 
 @asynccontextmanager
 async def get_db() -> AsyncGenerator[aiosqlite.Connection, None]:
-    """Get database connection as async context manager."""
-    db = await aiosqlite.connect(DB_PATH)
-    db.row_factory = aiosqlite.Row
-    try:
+    """Get a pooled database connection as async context manager."""
+    pool = _pool
+    if pool is None:
+        raise RuntimeError("Database is not initialized: call init_db() first")
+    if pool.loop is not asyncio.get_running_loop():
+        raise RuntimeError("Database pool belongs to another event loop: call init_db() in this loop")
+    async with pool.acquire() as db:
         yield db
-    finally:
-        await db.close()
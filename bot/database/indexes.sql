@@ -0,0 +1,27 @@
+-- Non-unique secondary indexes. Kept apart from schema.sql so bulk loads can
+-- insert first and build the B-trees once afterwards (see create_indexes()).
+
+CREATE INDEX IF NOT EXISTS idx_users_referral_code ON users(referral_code);
+CREATE INDEX IF NOT EXISTS idx_users_referrer_id ON users(referrer_id);
+CREATE INDEX IF NOT EXISTS idx_users_premium_active ON users(premium_until) WHERE premium_until IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_users_created_at ON users(created_at);
+-- Case-insensitive @username lookups (get_by_username, admin search)
+CREATE INDEX IF NOT EXISTS idx_users_username_nocase ON users(username COLLATE NOCASE);
+-- Expiry notification scans (subscription checker)
+CREATE INDEX IF NOT EXISTS idx_users_trial_expiry ON users(trial_notified, is_blocked, created_at);
+CREATE INDEX IF NOT EXISTS idx_users_premium_expiry ON users(premium_expired_notified, is_blocked, premium_until);
+
+CREATE INDEX IF NOT EXISTS idx_messages_user_created ON messages(user_id, created_at DESC);
+-- Topic-scoped history: seek straight to the newest rows of one topic
+CREATE INDEX IF NOT EXISTS idx_messages_user_topic_created ON messages(user_id, topic, created_at);
+CREATE INDEX IF NOT EXISTS idx_messages_created_at ON messages(created_at);
+
+CREATE INDEX IF NOT EXISTS idx_saved_words_user_id ON saved_words(user_id);
+
+CREATE INDEX IF NOT EXISTS idx_daily_usage_user_date ON daily_usage(user_id, date);
+
+CREATE INDEX IF NOT EXISTS idx_referrals_referrer_status ON referrals(referrer_id, status);
+
+CREATE INDEX IF NOT EXISTS idx_payments_user_status ON payments(user_id, status);
+-- Covering index: revenue sums are answered from the index alone
+CREATE INDEX IF NOT EXISTS idx_payments_status_created ON payments(status, source, created_at, amount);
@@ -1,9 +1,41 @@
 """Database models as dataclasses."""
 
+import asyncio
 from dataclasses import dataclass, field
-from datetime import datetime
-from typing import Optional
-import json
+from datetime import datetime, timezone
+from typing import Any, ClassVar, Optional, Sequence
+
+import orjson
+
+_loads = orjson.loads
+
+_now_cache: Optional[tuple[float, datetime]] = None
+
+
+def _decode_json(value: Any) -> Any:
+    """Decode a JSON column value.
+
+    Already decoded when the column is declared JSON (see database.py);
+    databases created before that still return the raw string.
+    """
+    if isinstance(value, str):
+        try:
+            return _loads(value) if value else None
+        except orjson.JSONDecodeError:
+            return None
+    return value
+
+
+def _utcnow() -> datetime:
+    """Naive UTC now (the format stored in the DB), reused within 1 ms of loop time."""
+    global _now_cache
+    try:
+        tick = asyncio.get_running_loop().time()
+    except RuntimeError:
+        return datetime.now(timezone.utc).replace(tzinfo=None)
+    if _now_cache is None or abs(tick - _now_cache[0]) >= 0.001:
+        _now_cache = (tick, datetime.now(timezone.utc).replace(tzinfo=None))
+    return _now_cache[1]
 
 
 @dataclass
@@ -27,33 +59,42 @@ class User:
     referral_code: Optional[str] = None
     
     # Metadata
-    created_at: datetime = field(default_factory=datetime.utcnow)
-    last_active_at: datetime = field(default_factory=datetime.utcnow)
+    created_at: datetime = field(default_factory=_utcnow)
+    last_active_at: datetime = field(default_factory=_utcnow)
     is_blocked: bool = False
     
     # Notification tracking
     trial_notified: bool = False
     premium_expired_notified: bool = False
+
+    # Column order expected by from_row (select with COLUMNS_SQL)
+    _COLUMNS: ClassVar[tuple[str, ...]] = (
+        "id", "username", "first_name", "language_code",
+        "hsk_level", "speech_speed", "current_topic", "premium_until",
+        "referrer_id", "referral_code", "created_at", "last_active_at",
+        "is_blocked", "trial_notified", "premium_expired_notified",
+    )
+    COLUMNS_SQL: ClassVar[str] = ", ".join(_COLUMNS)
     
     @classmethod
-    def from_row(cls, row: dict) -> "User":
-        """Create User from database row."""
+    def from_row(cls, row: Sequence[Any]) -> "User":
+        """Create User from a row selected with COLUMNS_SQL."""
         return cls(
-            id=row["id"],
-            username=row.get("username"),
-            first_name=row.get("first_name", ""),
-            language_code=row.get("language_code", "ru"),
-            hsk_level=row.get("hsk_level", 1),
-            speech_speed=row.get("speech_speed", "normal"),
-            current_topic=row.get("current_topic", "daily"),
-            premium_until=_parse_datetime(row.get("premium_until")),
-            referrer_id=row.get("referrer_id"),
-            referral_code=row.get("referral_code"),
-            created_at=_parse_datetime(row.get("created_at")) or datetime.utcnow(),
-            last_active_at=_parse_datetime(row.get("last_active_at")) or datetime.utcnow(),
-            is_blocked=bool(row.get("is_blocked", 0)),
-            trial_notified=bool(row.get("trial_notified", 0)),
-            premium_expired_notified=bool(row.get("premium_expired_notified", 0)),
+            id=row[0],
+            username=row[1],
+            first_name=row[2],
+            language_code=row[3],
+            hsk_level=row[4],
+            speech_speed=row[5],
+            current_topic=row[6],
+            premium_until=_parse_datetime(row[7]),
+            referrer_id=row[8],
+            referral_code=row[9],
+            created_at=_parse_datetime(row[10]) or _utcnow(),
+            last_active_at=_parse_datetime(row[11]) or _utcnow(),
+            is_blocked=bool(row[12]),
+            trial_notified=bool(row[13]),
+            premium_expired_notified=bool(row[14]),
         )
 
 
@@ -74,29 +115,35 @@ class Message:
     translation: Optional[str] = None
     
     topic: Optional[str] = None
-    created_at: datetime = field(default_factory=datetime.utcnow)
+    created_at: datetime = field(default_factory=_utcnow)
+
+    # LLM results memoized on first request (help / explain buttons)
+    suggestions: Optional[list] = None
+    explanation: Optional[str] = None
+
+    _COLUMNS: ClassVar[tuple[str, ...]] = (
+        "id", "user_id", "role", "content", "original_text", "correction",
+        "pinyin", "translation", "topic", "created_at",
+        "suggestions", "explanation",
+    )
+    COLUMNS_SQL: ClassVar[str] = ", ".join(_COLUMNS)
     
     @classmethod
-    def from_row(cls, row: dict) -> "Message":
-        """Create Message from database row."""
-        correction = row.get("correction")
-        if correction and isinstance(correction, str):
-            try:
-                correction = json.loads(correction)
-            except json.JSONDecodeError:
-                correction = None
-        
+    def from_row(cls, row: Sequence[Any]) -> "Message":
+        """Create Message from a row selected with COLUMNS_SQL."""
         return cls(
-            id=row.get("id"),
-            user_id=row.get("user_id", 0),
-            role=row.get("role", "user"),
-            content=row.get("content", ""),
-            original_text=row.get("original_text"),
-            correction=correction,
-            pinyin=row.get("pinyin"),
-            translation=row.get("translation"),
-            topic=row.get("topic"),
-            created_at=_parse_datetime(row.get("created_at")) or datetime.utcnow(),
+            id=row[0],
+            user_id=row[1],
+            role=row[2],
+            content=row[3],
+            original_text=row[4],
+            correction=_decode_json(row[5]),
+            pinyin=row[6],
+            translation=row[7],
+            topic=row[8],
+            created_at=_parse_datetime(row[9]) or _utcnow(),
+            suggestions=_decode_json(row[10]),
+            explanation=row[11],
         )
 
 
@@ -108,16 +155,21 @@ class DailyUsage:
     date: str = ""  # YYYY-MM-DD
     text_count: int = 0
     voice_count: int = 0
+
+    _COLUMNS: ClassVar[tuple[str, ...]] = (
+        "id", "user_id", "date", "text_count", "voice_count",
+    )
+    COLUMNS_SQL: ClassVar[str] = ", ".join(_COLUMNS)
     
     @classmethod
-    def from_row(cls, row: dict) -> "DailyUsage":
-        """Create DailyUsage from database row."""
+    def from_row(cls, row: Sequence[Any]) -> "DailyUsage":
+        """Create DailyUsage from a row selected with COLUMNS_SQL."""
         return cls(
-            id=row.get("id"),
-            user_id=row.get("user_id", 0),
-            date=row.get("date", ""),
-            text_count=row.get("text_count", 0),
-            voice_count=row.get("voice_count", 0),
+            id=row[0],
+            user_id=row[1],
+            date=row[2],
+            text_count=row[3],
+            voice_count=row[4],
         )
 
 
@@ -129,18 +181,23 @@ class Referral:
     referred_id: int = 0
     status: str = "registered"  # registered or subscribed
     bonus_days_given: int = 0
-    created_at: datetime = field(default_factory=datetime.utcnow)
+    created_at: datetime = field(default_factory=_utcnow)
+
+    _COLUMNS: ClassVar[tuple[str, ...]] = (
+        "id", "referrer_id", "referred_id", "status", "bonus_days_given", "created_at",
+    )
+    COLUMNS_SQL: ClassVar[str] = ", ".join(_COLUMNS)
     
     @classmethod
-    def from_row(cls, row: dict) -> "Referral":
-        """Create Referral from database row."""
+    def from_row(cls, row: Sequence[Any]) -> "Referral":
+        """Create Referral from a row selected with COLUMNS_SQL."""
         return cls(
-            id=row.get("id"),
-            referrer_id=row.get("referrer_id", 0),
-            referred_id=row.get("referred_id", 0),
-            status=row.get("status", "registered"),
-            bonus_days_given=row.get("bonus_days_given", 0),
-            created_at=_parse_datetime(row.get("created_at")) or datetime.utcnow(),
+            id=row[0],
+            referrer_id=row[1],
+            referred_id=row[2],
+            status=row[3],
+            bonus_days_given=row[4],
+            created_at=_parse_datetime(row[5]) or _utcnow(),
         )
 
 
@@ -159,22 +216,28 @@ class Payment:
     days_granted: int = 0
     source: str = "payment"  # payment, referral, admin, promo
     
-    created_at: datetime = field(default_factory=datetime.utcnow)
+    created_at: datetime = field(default_factory=_utcnow)
+
+    _COLUMNS: ClassVar[tuple[str, ...]] = (
+        "id", "user_id", "amount", "currency", "telegram_payment_id",
+        "provider_payment_id", "status", "days_granted", "source", "created_at",
+    )
+    COLUMNS_SQL: ClassVar[str] = ", ".join(_COLUMNS)
     
     @classmethod
-    def from_row(cls, row: dict) -> "Payment":
-        """Create Payment from database row."""
+    def from_row(cls, row: Sequence[Any]) -> "Payment":
+        """Create Payment from a row selected with COLUMNS_SQL."""
         return cls(
-            id=row.get("id"),
-            user_id=row.get("user_id", 0),
-            amount=row.get("amount", 0),
-            currency=row.get("currency", "RUB"),
-            telegram_payment_id=row.get("telegram_payment_id"),
-            provider_payment_id=row.get("provider_payment_id"),
-            status=row.get("status", "completed"),
-            days_granted=row.get("days_granted", 0),
-            source=row.get("source", "payment"),
-            created_at=_parse_datetime(row.get("created_at")) or datetime.utcnow(),
+            id=row[0],
+            user_id=row[1],
+            amount=row[2],
+            currency=row[3],
+            telegram_payment_id=row[4],
+            provider_payment_id=row[5],
+            status=row[6],
+            days_granted=row[7],
+            source=row[8],
+            created_at=_parse_datetime(row[9]) or _utcnow(),
         )
 
 
@@ -183,11 +246,12 @@ def _parse_datetime(value) -> Optional[datetime]:
     if value is None:
         return None
     if isinstance(value, datetime):
+        # Fast path: TIMESTAMP columns arrive pre-parsed (see database.py)
         return value
     if isinstance(value, str):
         try:
-            # Try ISO format
-            return datetime.fromisoformat(value.replace("Z", "+00:00"))
+            # Covers 'YYYY-MM-DD HH:MM:SS', isoformat() with 'T' and a 'Z' suffix
+            return datetime.fromisoformat(value)
         except ValueError:
             try:
                 # Try SQLite format
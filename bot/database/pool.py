@@ -0,0 +1,109 @@
+"""Connection pool for aiosqlite."""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, Awaitable, Callable
+
+import aiosqlite
+
+logger = logging.getLogger(__name__)
+
+ConnectionFactory = Callable[[], Awaitable[aiosqlite.Connection]]
+
+
+class ConnectionPool:
+    """Fixed-size pool of long-lived SQLite connections.
+
+    The pool belongs to the event loop that opened it: call ``open()`` and
+    ``close_all()`` from the same loop. aiosqlite worker threads are
+    non-daemon, so a pool that is never closed keeps the process alive.
+    """
+
+    def __init__(
+        self,
+        connection_factory: ConnectionFactory,
+        size: int,
+        acquire_timeout: float | None = None,
+    ):
+        self.connection_factory = connection_factory
+        self.size = size
+        self.acquire_timeout = acquire_timeout
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self._queue: asyncio.Queue[aiosqlite.Connection] = asyncio.Queue()
+        self._closed = False
+        # Counters for stats()
+        self._waiting = 0
+        self._acquired = 0
+        self._timeouts = 0
+
+    async def open(self) -> None:
+        """Open all connections up front."""
+        self.loop = asyncio.get_running_loop()
+        for _ in range(self.size):
+            self._queue.put_nowait(await self.connection_factory())
+
+    async def _release(self, db: aiosqlite.Connection) -> None:
+        """Return a connection to the pool, replacing it if it is broken."""
+        try:
+            # Never hand out a connection with a half-finished transaction
+            if db.in_transaction:
+                await db.rollback()
+        except Exception as e:
+            logger.warning(f"Dropping broken pooled connection: {e}")
+            try:
+                await db.close()
+            except Exception:
+                pass
+            try:
+                db = await self.connection_factory()
+            except Exception as e:
+                logger.error(f"Could not replace pooled connection: {e}")
+                self.size -= 1
+                return
+        self._queue.put_nowait(db)
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncGenerator[aiosqlite.Connection, None]:
+        """Borrow a connection and return it to the pool afterwards.
+
+        Raises TimeoutError if none frees up within ``acquire_timeout``, so
+        an exhausted pool fails fast instead of stalling the caller.
+        """
+        if self._closed:
+            raise RuntimeError("Database pool is closed")
+        self._waiting += 1
+        try:
+            async with asyncio.timeout(self.acquire_timeout):
+                db = await self._queue.get()
+        except TimeoutError:
+            self._timeouts += 1
+            raise TimeoutError(
+                f"No database connection free within {self.acquire_timeout}s"
+            ) from None
+        finally:
+            self._waiting -= 1
+        self._acquired += 1
+        try:
+            yield db
+        finally:
+            await self._release(db)
+
+    def stats(self) -> dict:
+        """Snapshot of pool usage for monitoring."""
+        idle = self._queue.qsize()
+        return {
+            "size": self.size,
+            "idle": idle,
+            "in_use": self.size - idle,
+            "waiting": self._waiting,
+            "acquired_total": self._acquired,
+            "timeouts_total": self._timeouts,
+        }
+
+    async def close_all(self) -> None:
+        """Wait for borrowed connections to come back, then close them all."""
+        self._closed = True
+        for _ in range(self.size):
+            db = await self._queue.get()
+            await db.close()
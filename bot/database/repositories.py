@@ -1,14 +1,143 @@
 """Database repository classes for CRUD operations."""
 
-import json
+import asyncio
+import logging
 import secrets
+from collections import deque
+from dataclasses import replace
 from datetime import datetime, timedelta, date
-from typing import Optional
+from itertools import islice
+from typing import Any, AsyncIterator, Optional
 
 import aiosqlite
+import orjson
+
+from bot.utils.cache import TTLCache
+from bot.utils.loader import DataLoader
 
 from .database import get_db
-from .models import User, Message, DailyUsage, Referral, Payment
+from .models import User, Message, DailyUsage, Referral, Payment, _parse_datetime
+
+logger = logging.getLogger(__name__)
+
+# SQL for "now" in each column's stored layout. premium_until is written in
+# isoformat() layout ('T' separator); created_at/last_active_at come from
+# CURRENT_TIMESTAMP (' ' separator). Comparing across layouts is wrong on the
+# same day because 'T' sorts after ' '.
+_SQL_NOW_ISO = "strftime('%Y-%m-%dT%H:%M:%f', 'now')"
+
+# Hot-path statements built once, so every call hands sqlite3 the same text
+# and hits its per-connection statement cache without re-formatting SQL
+_SQL_GET_USER = f"SELECT {User.COLUMNS_SQL} FROM users WHERE id = ?"
+_SQL_TOUCH_USER = "UPDATE users SET last_active_at = CURRENT_TIMESTAMP WHERE id = ?"
+_SQL_SET_LAST_ACTIVE = "UPDATE users SET last_active_at = ? WHERE id = ?"
+_SQL_TOUCH_USER_NAME = """UPDATE users
+    SET last_active_at = CURRENT_TIMESTAMP, username = ? WHERE id = ?"""
+_SQL_INSERT_MESSAGE = """INSERT INTO messages
+    (user_id, role, content, original_text, correction, pinyin, translation, topic)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)"""
+_SQL_INSERT_PAYMENT = """INSERT INTO payments
+    (user_id, amount, currency, telegram_payment_id, provider_payment_id,
+     status, days_granted, source)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)"""
+_SQL_GET_MESSAGE = f"SELECT {Message.COLUMNS_SQL} FROM messages WHERE id = ?"
+_SQL_SET_SUGGESTIONS = "UPDATE messages SET suggestions = ? WHERE id = ?"
+_SQL_SET_EXPLANATION = "UPDATE messages SET explanation = ? WHERE id = ?"
+_SQL_SET_TRANSLATION = "UPDATE messages SET translation = ? WHERE id = ?"
+_SQL_HISTORY = f"""SELECT {Message.COLUMNS_SQL} FROM messages
+    WHERE user_id = ?
+    ORDER BY created_at DESC LIMIT ?"""
+_SQL_HISTORY_TOPIC = f"""SELECT {Message.COLUMNS_SQL} FROM messages
+    WHERE user_id = ? AND topic = ?
+    ORDER BY created_at DESC LIMIT ?"""
+_SQL_GET_USAGE = f"SELECT {DailyUsage.COLUMNS_SQL} FROM daily_usage WHERE user_id = ? AND date = ?"
+_SQL_INCREMENT_USAGE = {
+    column: f"""INSERT INTO daily_usage (user_id, date, {column})
+    VALUES (?, ?, 1)
+    ON CONFLICT(user_id, date)
+    DO UPDATE SET {column} = {column} + 1
+    RETURNING {column}"""
+    for column in ("text_count", "voice_count")
+}
+# Notification flags set for a JSON array of user IDs
+_SQL_MARK_NOTIFIED = {
+    flag: f"UPDATE users SET {flag} = 1 WHERE id IN (SELECT value FROM json_each(?))"
+    for flag in ("trial_notified", "premium_expired_notified")
+}
+# UPDATE users statements keyed by the column tuple passed to update();
+# callers only use a handful of shapes
+_update_user_sql: dict[tuple[str, ...], str] = {}
+
+
+class LastActiveFlusher:
+    """Coalesces last_active_at writes and flushes them every ``interval`` seconds.
+
+    touch() only records the time in memory; the background task writes all
+    pending users in one transaction, so a burst of messages costs one commit.
+    """
+
+    def __init__(self, interval: float = 5.0):
+        self.interval = interval
+        self._pending: dict[int, str] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def touch(self, user_id: int) -> None:
+        # Same layout as CURRENT_TIMESTAMP, which created_at comparisons rely on
+        self._pending[user_id] = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+
+    def start(self) -> None:
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task and write whatever is still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        try:
+            async with get_db() as db:
+                await db.execute("BEGIN")
+                await db.executemany(
+                    _SQL_SET_LAST_ACTIVE,
+                    [(ts, user_id) for user_id, ts in pending.items()]
+                )
+                await db.commit()
+        except Exception:
+            # Keep the batch for the next round; newer touches win
+            for user_id, ts in pending.items():
+                self._pending.setdefault(user_id, ts)
+            raise
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush last_active_at: {e}")
+
+
+last_active_flusher = LastActiveFlusher()
+
+
+# Users seen by the update pipeline, keyed by Telegram ID. Mutating
+# UserRepository methods evict the entry after they commit; the TTL bounds
+# staleness for writes made elsewhere (other processes, raw SQL).
+_user_cache: TTLCache[int, User] = TTLCache(maxsize=10_000, ttl=30)
 
 
 class UserRepository:
@@ -22,35 +151,62 @@ class UserRepository:
     async def get(self, user_id: int) -> Optional[User]:
         """Get user by ID."""
         async with get_db() as db:
-            async with db.execute(
-                "SELECT * FROM users WHERE id = ?", (user_id,)
-            ) as cursor:
+            async with db.execute(_SQL_GET_USER, (user_id,)) as cursor:
                 row = await cursor.fetchone()
                 if row:
-                    return User.from_row(dict(row))
+                    return User.from_row(row)
         return None
 
+    async def get_many(self, user_ids: list[int]) -> dict[int, User]:
+        """Get several users in one query, keyed by ID; unknown IDs are absent."""
+        if not user_ids:
+            return {}
+        async with get_db() as db:
+            async with db.execute(
+                f"SELECT {User.COLUMNS_SQL} FROM users WHERE id IN (SELECT value FROM json_each(?))",
+                (orjson.dumps(list(user_ids)).decode(),)
+            ) as cursor:
+                rows = await cursor.fetchall()
+        return {row[0]: User.from_row(row) for row in rows}
+
+    async def load(self, user_id: int) -> Optional[User]:
+        """Get user by ID, sharing one query with concurrent load() calls."""
+        return await _user_loader.load(user_id)
+
+    async def get_cached(self, user_id: int) -> Optional[User]:
+        """Get user by ID through the short-lived in-process cache.
+
+        For the per-update hot path (middlewares). Use get() when the
+        freshest row is required.
+        """
+        user = _user_cache.get(user_id)
+        if user is None:
+            user = await self.get(user_id)
+            if user is not None:
+                _user_cache.set(user_id, user)
+        return user
+
     async def get_by_username(self, username: str) -> Optional[User]:
         """Get user by username."""
         async with get_db() as db:
             async with db.execute(
-                "SELECT * FROM users WHERE LOWER(username) = LOWER(?)",
+                f"SELECT {User.COLUMNS_SQL} FROM users WHERE username = ? COLLATE NOCASE",
                 (username,)
             ) as cursor:
                 row = await cursor.fetchone()
                 if row:
-                    return User.from_row(dict(row))
+                    return User.from_row(row)
         return None
 
     async def get_by_referral_code(self, code: str) -> Optional[User]:
         """Get user by referral code."""
         async with get_db() as db:
             async with db.execute(
-                "SELECT * FROM users WHERE referral_code = ?", (code,)
+                f"SELECT {User.COLUMNS_SQL} FROM users WHERE referral_code = ?", (code,)
             ) as cursor:
                 row = await cursor.fetchone()
                 if row:
-                    return User.from_row(dict(row))
+                    return User.from_row(row)
         return None
 
     async def create(
@@ -81,58 +237,76 @@ class UserRepository:
         if not kwargs:
             return await self.get(user_id)
 
-        fields = ", ".join(f"{k} = ?" for k in kwargs.keys())
-        values = list(kwargs.values()) + [user_id]
+        keys = tuple(kwargs)
+        sql = _update_user_sql.get(keys)
+        if sql is None:
+            fields = ", ".join(f"{k} = ?" for k in keys)
+            sql = _update_user_sql[keys] = f"UPDATE users SET {fields} WHERE id = ?"
+        values = [*kwargs.values(), user_id]
 
         async with get_db() as db:
-            await db.execute(
-                f"UPDATE users SET {fields} WHERE id = ?",
-                values
-            )
+            await db.execute(sql, values)
             await db.commit()
+            _user_cache.pop(user_id)
 
         return await self.get(user_id)
 
     async def update_last_active(self, user_id: int) -> None:
-        """Update user's last active timestamp."""
+        """Update user's last active timestamp.
+
+        Deferred to last_active_flusher while it runs; written directly otherwise.
+        """
+        if last_active_flusher.running:
+            last_active_flusher.touch(user_id)
+            return
+
         async with get_db() as db:
-            await db.execute(
-                "UPDATE users SET last_active_at = CURRENT_TIMESTAMP WHERE id = ?",
-                (user_id,)
-            )
+            await db.execute(_SQL_TOUCH_USER, (user_id,))
+            await db.commit()
+
+    async def touch(self, user: User, username: Optional[str]) -> None:
+        """Record activity of `user`, renamed to `username` if that differs.
+
+        A rename is written at once together with last_active_at (one
+        UPDATE); otherwise this is update_last_active().
+        """
+        if user.username == username:
+            await self.update_last_active(user.id)
+            return
+
+        async with get_db() as db:
+            await db.execute(_SQL_TOUCH_USER_NAME, (username, user.id))
             await db.commit()
+            _user_cache.pop(user.id)
 
     async def get_expired_trial_users(self) -> list[User]:
         """Get users whose trial has expired but haven't been notified yet."""
         from bot.config import settings as cfg
-        cutoff = (datetime.utcnow() - timedelta(days=cfg.TRIAL_DAYS)).isoformat()
 
         async with get_db() as db:
             async with db.execute(
-                """SELECT * FROM users 
+                f"""SELECT {User.COLUMNS_SQL} FROM users 
                    WHERE trial_notified = 0
-                   AND (premium_until IS NULL OR premium_until <= ?)
-                   AND created_at <= ?
-                   AND NOT is_blocked""",
-                (datetime.utcnow().isoformat(), cutoff)
+                   AND (premium_until IS NULL OR premium_until <= {_SQL_NOW_ISO})
+                   AND created_at <= datetime('now', printf('-%d days', ?))
+                   AND is_blocked = 0""",
+                (cfg.TRIAL_DAYS,)
             ) as cursor:
                 rows = await cursor.fetchall()
-                return [User.from_row(dict(row)) for row in rows]
+                return [User.from_row(row) for row in rows]
 
     async def get_expired_premium_users(self) -> list[User]:
         """Get users whose premium has expired but haven't been notified yet."""
-        now = datetime.utcnow().isoformat()
         async with get_db() as db:
             async with db.execute(
-                """SELECT * FROM users 
+                f"""SELECT {User.COLUMNS_SQL} FROM users 
                    WHERE premium_expired_notified = 0
                    AND premium_until IS NOT NULL
-                   AND premium_until <= ?
-                   AND NOT is_blocked""",
-                (now,)
+                   AND premium_until <= {_SQL_NOW_ISO}
+                   AND is_blocked = 0"""
             ) as cursor:
                 rows = await cursor.fetchall()
-                return [User.from_row(dict(row)) for row in rows]
+                return [User.from_row(row) for row in rows]
 
     async def mark_trial_notified(self, user_id: int) -> None:
         """Mark user as notified about trial expiry."""
@@ -142,6 +316,7 @@ class UserRepository:
                 (user_id,)
             )
             await db.commit()
+            _user_cache.pop(user_id)
 
     async def mark_premium_expired_notified(self, user_id: int) -> None:
         """Mark user as notified about premium expiry."""
@@ -151,6 +326,27 @@ class UserRepository:
                 (user_id,)
             )
             await db.commit()
+            _user_cache.pop(user_id)
+
+    async def mark_trial_notified_many(self, user_ids: list[int]) -> None:
+        """Mark several users as notified about trial expiry in one statement."""
+        await self._mark_notified_many("trial_notified", user_ids)
+
+    async def mark_premium_expired_notified_many(self, user_ids: list[int]) -> None:
+        """Mark several users as notified about premium expiry in one statement."""
+        await self._mark_notified_many("premium_expired_notified", user_ids)
+
+    async def _mark_notified_many(self, flag: str, user_ids: list[int]) -> None:
+        if not user_ids:
+            return
+        async with get_db() as db:
+            await db.execute(
+                _SQL_MARK_NOTIFIED[flag],
+                (orjson.dumps(list(user_ids)).decode(),)
+            )
+            await db.commit()
+            for user_id in user_ids:
+                _user_cache.pop(user_id)
 
     async def reset_premium_expired_notified(self, user_id: int) -> None:
         """Reset premium expiry notification flag (when premium is re-activated)."""
@@ -160,33 +356,64 @@ class UserRepository:
                 (user_id,)
             )
             await db.commit()
+            _user_cache.pop(user_id)
 
     async def add_premium_days(self, user_id: int, days: int) -> datetime:
         """Add premium days to user. Also resets premium_expired_notified flag."""
+        now = datetime.utcnow()
         async with get_db() as db:
+            # Extend from max(premium_until, now) in one atomic statement.
+            # julianday() makes the comparison independent of the ' '/'T'
+            # separator; the result keeps the isoformat() layout.
             async with db.execute(
-                "SELECT premium_until FROM users WHERE id = ?", (user_id,)
+                """UPDATE users
+                   SET premium_until = strftime(
+                           '%Y-%m-%dT%H:%M:%f',
+                           MAX(julianday(COALESCE(premium_until, :now)), julianday(:now)),
+                           printf('+%d days', :days)
+                       ),
+                       premium_expired_notified = 0
+                   WHERE id = :user_id
+                   RETURNING premium_until""",
+                {"now": now.isoformat(), "days": days, "user_id": user_id}
             ) as cursor:
                 row = await cursor.fetchone()
+            await db.commit()
+            _user_cache.pop(user_id)
 
-            now = datetime.utcnow()
-            current = None
-            if row and row[0]:
-                try:
-                    current = datetime.fromisoformat(row[0])
-                except (ValueError, TypeError):
-                    pass
+        if row is None:
+            # Unknown user: nothing stored, report what they would have got
+            return now + timedelta(days=days)
+        return _parse_datetime(row[0])
 
-            base = max(current, now) if current else now
-            new_until = base + timedelta(days=days)
+    async def add_premium_days_many(self, user_ids: list[int], days: int) -> dict[int, datetime]:
+        """Add premium days to several users in one statement.
 
-            await db.execute(
-                "UPDATE users SET premium_until = ?, premium_expired_notified = 0 WHERE id = ?",
-                (new_until.isoformat(), user_id)
-            )
+        Returns the new premium_until per user; unknown IDs are absent.
+        """
+        if not user_ids:
+            return {}
+        now = datetime.utcnow()
+        async with get_db() as db:
+            async with db.execute(
+                """UPDATE users
+                   SET premium_until = strftime(
+                           '%Y-%m-%dT%H:%M:%f',
+                           MAX(julianday(COALESCE(premium_until, :now)), julianday(:now)),
+                           printf('+%d days', :days)
+                       ),
+                       premium_expired_notified = 0
+                   WHERE id IN (SELECT value FROM json_each(:ids))
+                   RETURNING id, premium_until""",
+                {"now": now.isoformat(), "days": days,
+                 "ids": orjson.dumps(list(user_ids)).decode()}
+            ) as cursor:
+                rows = await cursor.fetchall()
             await db.commit()
+            for user_id in user_ids:
+                _user_cache.pop(user_id)
 
-            return new_until
+        return {row[0]: _parse_datetime(row[1]) for row in rows}
 
     async def remove_premium(self, user_id: int) -> None:
         """Remove premium from user."""
@@ -196,6 +423,7 @@ class UserRepository:
                 (user_id,)
             )
             await db.commit()
+            _user_cache.pop(user_id)
 
     async def block(self, user_id: int) -> None:
         """Block user."""
@@ -205,6 +433,7 @@ class UserRepository:
                 (user_id,)
             )
             await db.commit()
+            _user_cache.pop(user_id)
 
     async def unblock(self, user_id: int) -> None:
         """Unblock user."""
@@ -214,6 +443,128 @@ class UserRepository:
                 (user_id,)
             )
             await db.commit()
+            _user_cache.pop(user_id)
+
+
+# Coalesces concurrent single-user lookups (admin clicks) into one query
+_user_loader: DataLoader[int, User] = DataLoader(UserRepository().get_many)
+
+
+# Multi-row message INSERTs keyed by row count; batches are at most max_batch rows
+_insert_messages_sqls: dict[int, str] = {}
+
+
+def _insert_messages_sql(count: int) -> str:
+    """Multi-row INSERT ... RETURNING id for ``count`` messages, built once per size."""
+    sql = _insert_messages_sqls.get(count)
+    if sql is None:
+        values = ", ".join(["(?, ?, ?, ?, ?, ?, ?, ?)"] * count)
+        sql = _insert_messages_sqls[count] = (
+            "INSERT INTO messages (user_id, role, content, original_text, "
+            f"correction, pinyin, translation, topic) VALUES {values} RETURNING id"
+        )
+    return sql
+
+
+async def insert_messages(db: aiosqlite.Connection, rows: list[Message]) -> list[int]:
+    """Insert messages with one multi-row statement and commit; return their IDs in order."""
+    if not rows:
+        return []
+    params = []
+    for m in rows:
+        params += (
+            m.user_id, m.role, m.content, m.original_text,
+            orjson.dumps(m.correction).decode() if m.correction else None,
+            m.pinyin, m.translation, m.topic,
+        )
+    try:
+        async with db.execute(_insert_messages_sql(len(rows)), params) as cursor:
+            returned = await cursor.fetchall()
+        await db.commit()
+    except BaseException:
+        await db.rollback()
+        raise
+    # RETURNING order is unspecified, but rowids grow in VALUES order
+    return sorted(row[0] for row in returned)
+
+
+# Recent dialog context per (user_id, topic), oldest first: what every dialog
+# turn sends to the LLM. Saved messages are appended to a warm entry, so only
+# a cold one costs the history SELECT. Entries are bounded deques, so an
+# append evicts the oldest message by itself.
+HISTORY_CACHE_SIZE = 10
+_history_cache: TTLCache[tuple[int, str], deque[Message]] = TTLCache(maxsize=5000, ttl=1800)
+# Keys whose history SELECT is in flight; flipped to True when a message for
+# the key is saved meanwhile, since the loaded rows may not include it
+_history_loading: dict[tuple[int, str], bool] = {}
+
+
+def _remember_messages(messages: list[Message]) -> None:
+    """Append newly saved messages to the cached history of their topic."""
+    for m in messages:
+        if not m.topic:
+            continue
+        key = (m.user_id, m.topic)
+        if key in _history_loading:
+            _history_loading[key] = True
+        history = _history_cache.get(key)
+        if history is not None:
+            history.append(m)
+
+
+def _tail(history: deque[Message], limit: int) -> list[Message]:
+    """The last `limit` messages of a cached history, as a new list."""
+    return list(islice(history, max(len(history) - limit, 0), None))
+
+
+class MessageBatcher:
+    """Coalesces concurrent message inserts into shared transactions (group commit).
+
+    The first writer starts a flush right away; rows queued while it runs are
+    written together by the next flush, at most ``max_batch`` rows at a time.
+    """
+
+    def __init__(self, max_batch: int = 50):
+        self.max_batch = max_batch
+        self._pending: list[tuple[Message, asyncio.Future]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def add(self, messages: list[Message]) -> list[int]:
+        """Queue messages for insertion and wait for their IDs."""
+        loop = asyncio.get_running_loop()
+        futures = []
+        for m in messages:
+            future = loop.create_future()
+            self._pending.append((m, future))
+            futures.append(future)
+        if self._flush_task is None or self._flush_task.done():
+            # Separate task: a cancelled caller must not strand other writers
+            self._flush_task = asyncio.create_task(self._flush())
+        return list(await asyncio.gather(*futures))
+
+    async def _flush(self) -> None:
+        while self._pending:
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            try:
+                async with get_db() as db:
+                    ids = await insert_messages(db, [m for m, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                _remember_messages([replace(m, id=message_id) for (m, _), message_id in zip(batch, ids)])
+                for (_, future), message_id in zip(batch, ids):
+                    if not future.done():
+                        future.set_result(message_id)
+
+
+_message_batcher = MessageBatcher()
+
+# Messages opened from inline buttons, keyed by ID. Rows only change through
+# the set_* methods below, which evict the entry after they commit.
+_message_cache: TTLCache[int, Message] = TTLCache(maxsize=1024, ttl=300)
 
 
 class MessageRepository:
@@ -231,29 +582,79 @@ class MessageRepository:
         topic: Optional[str] = None
     ) -> int:
         """Create new message and return its ID."""
-        correction_json = json.dumps(correction) if correction else None
+        correction_json = orjson.dumps(correction).decode() if correction else None
 
         async with get_db() as db:
             cursor = await db.execute(
-                """INSERT INTO messages 
-                   (user_id, role, content, original_text, correction, pinyin, translation, topic)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                _SQL_INSERT_MESSAGE,
                 (user_id, role, content, original_text,
                  correction_json, pinyin, translation, topic)
             )
             await db.commit()
-            return cursor.lastrowid
+        _remember_messages([Message(
+            id=cursor.lastrowid, user_id=user_id, role=role, content=content,
+            original_text=original_text, correction=correction, pinyin=pinyin,
+            translation=translation, topic=topic,
+        )])
+        return cursor.lastrowid
+
+    async def create_many(self, messages: list[Message]) -> list[int]:
+        """Save messages through the shared write batcher and return their IDs."""
+        return await _message_batcher.add(messages)
 
     async def get(self, message_id: int) -> Optional[Message]:
-        """Get message by ID."""
+        """Get message by ID (served from _message_cache when possible)."""
+        message = _message_cache.get(message_id)
+        if message is not None:
+            return message
+        async with get_db() as db:
+            async with db.execute(_SQL_GET_MESSAGE, (message_id,)) as cursor:
+                row = await cursor.fetchone()
+        if row is None:
+            return None
+        message = Message.from_row(row)
+        _message_cache.set(message_id, message)
+        return message
+
+    async def get_many(self, message_ids: list[int]) -> dict[int, Message]:
+        """Get several messages in one query, keyed by ID; unknown IDs are absent."""
+        if not message_ids:
+            return {}
         async with get_db() as db:
             async with db.execute(
-                "SELECT * FROM messages WHERE id = ?", (message_id,)
+                f"SELECT {Message.COLUMNS_SQL} FROM messages WHERE id IN (SELECT value FROM json_each(?))",
+                (orjson.dumps(list(message_ids)).decode(),)
             ) as cursor:
-                row = await cursor.fetchone()
-                if row:
-                    return Message.from_row(dict(row))
-        return None
+                rows = await cursor.fetchall()
+        messages = {row[0]: Message.from_row(row) for row in rows}
+        for message_id, message in messages.items():
+            _message_cache.set(message_id, message)
+        return messages
+
+    async def load(self, message_id: int) -> Optional[Message]:
+        """Get message by ID, sharing one query with concurrent load() calls."""
+        message = _message_cache.get(message_id)
+        if message is not None:
+            return message
+        return await _message_loader.load(message_id)
+
+    async def _set(self, sql: str, message_id: int, value: Any) -> None:
+        async with get_db() as db:
+            await db.execute(sql, (value, message_id))
+            await db.commit()
+        _message_cache.pop(message_id)
+
+    async def set_suggestions(self, message_id: int, suggestions: list) -> None:
+        """Store generated reply suggestions on the message."""
+        await self._set(_SQL_SET_SUGGESTIONS, message_id, orjson.dumps(suggestions).decode())
+
+    async def set_explanation(self, message_id: int, explanation: str) -> None:
+        """Store a generated correction explanation on the message."""
+        await self._set(_SQL_SET_EXPLANATION, message_id, explanation)
+
+    async def set_translation(self, message_id: int, translation: str) -> None:
+        """Store a translation generated after the message was saved."""
+        await self._set(_SQL_SET_TRANSLATION, message_id, translation)
 
     async def get_history(
         self,
@@ -261,23 +662,51 @@ class MessageRepository:
         limit: int = 10,
         topic: Optional[str] = None
     ) -> list[Message]:
-        """Get user's message history."""
+        """Get user's message history.
+
+        Per-topic requests for up to HISTORY_CACHE_SIZE messages are served
+        from _history_cache once it has been loaded.
+        """
+        if not topic or not 0 < limit <= HISTORY_CACHE_SIZE:
+            return await self._select_history(user_id, limit, topic)
+
+        key = (user_id, topic)
+        history = _history_cache.get(key)
+        if history is not None:
+            return _tail(history, limit)
+        if key in _history_loading:
+            # Another load of this key is in flight; it fills the cache
+            return await self._select_history(user_id, limit, topic)
+
+        _history_loading[key] = False
+        try:
+            rows = await self._select_history(user_id, HISTORY_CACHE_SIZE, topic)
+        finally:
+            stale = _history_loading.pop(key)
+        history = deque(rows, maxlen=HISTORY_CACHE_SIZE)
+        if not stale:
+            _history_cache.set(key, history)
+        return _tail(history, limit)
+
+    async def _select_history(
+        self,
+        user_id: int,
+        limit: int,
+        topic: Optional[str]
+    ) -> list[Message]:
         async with get_db() as db:
             if topic:
-                query = """SELECT * FROM messages 
-                          WHERE user_id = ? AND topic = ?
-                          ORDER BY created_at DESC LIMIT ?"""
-                params = (user_id, topic, limit)
+                query, params = _SQL_HISTORY_TOPIC, (user_id, topic, limit)
             else:
-                query = """SELECT * FROM messages 
-                          WHERE user_id = ?
-                          ORDER BY created_at DESC LIMIT ?"""
-                params = (user_id, limit)
+                query, params = _SQL_HISTORY, (user_id, limit)
 
             async with db.execute(query, params) as cursor:
                 rows = await cursor.fetchall()
                 # Return in chronological order
-                return [Message.from_row(dict(row)) for row in reversed(rows)]
+                return [Message.from_row(row) for row in reversed(rows)]
+
+
+_message_loader: DataLoader[int, Message] = DataLoader(MessageRepository().get_many, max_batch=64)
 
 
 class DailyUsageRepository:
@@ -288,13 +717,10 @@ class DailyUsageRepository:
         today = date.today().isoformat()
 
         async with get_db() as db:
-            async with db.execute(
-                "SELECT * FROM daily_usage WHERE user_id = ? AND date = ?",
-                (user_id, today)
-            ) as cursor:
+            async with db.execute(_SQL_GET_USAGE, (user_id, today)) as cursor:
                 row = await cursor.fetchone()
                 if row:
-                    return DailyUsage.from_row(dict(row))
+                    return DailyUsage.from_row(row)
 
             # Create new record
             await db.execute(
@@ -310,42 +736,24 @@ class DailyUsageRepository:
         today = date.today().isoformat()
 
         async with get_db() as db:
-            await db.execute(
-                """INSERT INTO daily_usage (user_id, date, text_count) 
-                   VALUES (?, ?, 1)
-                   ON CONFLICT(user_id, date) 
-                   DO UPDATE SET text_count = text_count + 1""",
-                (user_id, today)
-            )
-            await db.commit()
-
             async with db.execute(
-                "SELECT text_count FROM daily_usage WHERE user_id = ? AND date = ?",
-                (user_id, today)
+                _SQL_INCREMENT_USAGE["text_count"], (user_id, today)
             ) as cursor:
                 row = await cursor.fetchone()
-                return row[0] if row else 0
+            await db.commit()
+            return row[0]
 
     async def increment_voice(self, user_id: int) -> int:
         """Increment voice count and return new value."""
         today = date.today().isoformat()
 
         async with get_db() as db:
-            await db.execute(
-                """INSERT INTO daily_usage (user_id, date, voice_count) 
-                   VALUES (?, ?, 1)
-                   ON CONFLICT(user_id, date) 
-                   DO UPDATE SET voice_count = voice_count + 1""",
-                (user_id, today)
-            )
-            await db.commit()
-
             async with db.execute(
-                "SELECT voice_count FROM daily_usage WHERE user_id = ? AND date = ?",
-                (user_id, today)
+                _SQL_INCREMENT_USAGE["voice_count"], (user_id, today)
             ) as cursor:
                 row = await cursor.fetchone()
-                return row[0] if row else 0
+            await db.commit()
+            return row[0]
 
 
 class ReferralRepository:
@@ -364,16 +772,33 @@ class ReferralRepository:
             except aiosqlite.IntegrityError:
                 return False
 
+    async def create_many(self, pairs: list[tuple[int, int]]) -> int:
+        """Create (referrer_id, referred_id) records in one transaction.
+
+        Existing referrals are skipped. Returns the number of rows inserted.
+        """
+        if not pairs:
+            return 0
+        async with get_db() as db:
+            before = db.total_changes
+            await db.execute("BEGIN")
+            await db.executemany(
+                "INSERT OR IGNORE INTO referrals (referrer_id, referred_id) VALUES (?, ?)",
+                pairs
+            )
+            await db.commit()
+            return db.total_changes - before
+
     async def get_by_referred(self, referred_id: int) -> Optional[Referral]:
         """Get referral by referred user ID."""
         async with get_db() as db:
             async with db.execute(
-                "SELECT * FROM referrals WHERE referred_id = ?",
+                f"SELECT {Referral.COLUMNS_SQL} FROM referrals WHERE referred_id = ?",
                 (referred_id,)
             ) as cursor:
                 row = await cursor.fetchone()
                 if row:
-                    return Referral.from_row(dict(row))
+                    return Referral.from_row(row)
         return None
 
     async def update_status(self, referred_id: int, status: str) -> None:
@@ -389,149 +814,128 @@ class ReferralRepository:
         """Count referrals by referrer. Returns (total, subscribed)."""
         async with get_db() as db:
             async with db.execute(
-                "SELECT COUNT(*) FROM referrals WHERE referrer_id = ?",
-                (referrer_id,)
-            ) as cursor:
-                total = (await cursor.fetchone())[0]
-
-            async with db.execute(
-                "SELECT COUNT(*) FROM referrals WHERE referrer_id = ? AND status = 'subscribed'",
+                """SELECT COUNT(*), COALESCE(SUM(status = 'subscribed'), 0)
+                   FROM referrals WHERE referrer_id = ?""",
                 (referrer_id,)
             ) as cursor:
-                subscribed = (await cursor.fetchone())[0]
+                total, subscribed = await cursor.fetchone()
 
             return total, subscribed
 
 
+# Admin screens are display-only and clicked in bursts: serve repeats from
+# memory. Users-list totals are keyed by premium_only.
+_user_count_cache: TTLCache[bool, int] = TTLCache(maxsize=2, ttl=60)
+_stats_cache: TTLCache[str, dict] = TTLCache(maxsize=1, ttl=30)
+
+
 class AdminRepository:
     """Repository for admin operations."""
 
-    async def get_stats(self) -> dict:
-        """Get bot statistics."""
-        from datetime import date, timedelta
+    _STATS_QUERY = f"""
+        SELECT
+            (SELECT COUNT(*) FROM users) AS total_users,
+            (SELECT COUNT(*) FROM users
+              WHERE created_at >= :day_start AND created_at < :day_end) AS new_today,
+            (SELECT COUNT(*) FROM users WHERE created_at >= :week_start) AS new_week,
+            (SELECT COUNT(*) FROM users WHERE created_at >= :month_start) AS new_month,
+            (SELECT COUNT(*) FROM users WHERE premium_until > {_SQL_NOW_ISO}) AS premium_users,
+            (SELECT COUNT(*) FROM messages
+              WHERE created_at >= :day_start AND created_at < :day_end) AS messages_today,
+            (SELECT COALESCE(SUM(voice_count), 0) FROM daily_usage WHERE date = :usage_today) AS voice_today,
+            (SELECT COALESCE(SUM(text_count), 0) FROM daily_usage WHERE date = :usage_today) AS text_today,
+            (SELECT COUNT(DISTINCT user_id) FROM daily_usage WHERE date = :usage_today) AS dau,
+            (SELECT COUNT(DISTINCT user_id) FROM daily_usage WHERE date >= :usage_week_ago) AS wau,
+            (SELECT COUNT(DISTINCT user_id) FROM daily_usage WHERE date >= :usage_month_ago) AS mau,
+            (SELECT COALESCE(SUM(amount), 0) FROM payments
+              WHERE created_at >= :month_start AND status = 'completed' AND source = 'payment') AS revenue
+    """
 
-        today = date.today().isoformat()
-        week_ago = (date.today() - timedelta(days=7)).isoformat()
-        month_ago = (date.today() - timedelta(days=30)).isoformat()
+    async def get_stats(self) -> dict:
+        """Get bot statistics (one round-trip, cached for 30 seconds)."""
+        stats = _stats_cache.get("stats")
+        if stats is not None:
+            return stats
+
+        # created_at columns hold UTC timestamps: bound them with half-open
+        # [start, end) ranges of UTC dates so the created_at indexes apply.
+        # The bare date prefix sorts before both 'YYYY-MM-DD HH:MM:SS' and
+        # isoformat 'YYYY-MM-DDTHH:MM:SS', so either layout matches.
+        utc_today = datetime.utcnow().date()
+        # daily_usage.date is written with the local date.today()
+        local_today = date.today()
+        params = {
+            "day_start": utc_today.isoformat(),
+            "day_end": (utc_today + timedelta(days=1)).isoformat(),
+            "week_start": (utc_today - timedelta(days=7)).isoformat(),
+            "month_start": (utc_today - timedelta(days=30)).isoformat(),
+            "usage_today": local_today.isoformat(),
+            "usage_week_ago": (local_today - timedelta(days=7)).isoformat(),
+            "usage_month_ago": (local_today - timedelta(days=30)).isoformat(),
+        }
 
         async with get_db() as db:
-            # Total users
-            async with db.execute("SELECT COUNT(*) FROM users") as cursor:
-                total_users = (await cursor.fetchone())[0]
-
-            # New users today
-            async with db.execute(
-                "SELECT COUNT(*) FROM users WHERE DATE(created_at) = ?", (today,)
-            ) as cursor:
-                new_today = (await cursor.fetchone())[0]
-
-            # New users this week
-            async with db.execute(
-                "SELECT COUNT(*) FROM users WHERE DATE(created_at) >= ?", (week_ago,)
-            ) as cursor:
-                new_week = (await cursor.fetchone())[0]
-
-            # New users this month
-            async with db.execute(
-                "SELECT COUNT(*) FROM users WHERE DATE(created_at) >= ?", (month_ago,)
-            ) as cursor:
-                new_month = (await cursor.fetchone())[0]
-
-            # Active premium users
-            async with db.execute(
-                "SELECT COUNT(*) FROM users WHERE premium_until > CURRENT_TIMESTAMP"
-            ) as cursor:
-                premium_users = (await cursor.fetchone())[0]
-
-            # Messages today
-            async with db.execute(
-                "SELECT COUNT(*) FROM messages WHERE DATE(created_at) = ?", (today,)
-            ) as cursor:
-                messages_today = (await cursor.fetchone())[0]
-
-            # Voice messages today
-            async with db.execute(
-                "SELECT COALESCE(SUM(voice_count), 0) FROM daily_usage WHERE date = ?",
-                (today,)
-            ) as cursor:
-                voice_today = (await cursor.fetchone())[0]
-
-            # Text messages today
-            async with db.execute(
-                "SELECT COALESCE(SUM(text_count), 0) FROM daily_usage WHERE date = ?",
-                (today,)
-            ) as cursor:
-                text_today = (await cursor.fetchone())[0]
-
-            # DAU (distinct users active today)
-            async with db.execute(
-                "SELECT COUNT(DISTINCT user_id) FROM daily_usage WHERE date = ?",
-                (today,)
-            ) as cursor:
-                dau = (await cursor.fetchone())[0]
-
-            # WAU
-            async with db.execute(
-                "SELECT COUNT(DISTINCT user_id) FROM daily_usage WHERE date >= ?",
-                (week_ago,)
-            ) as cursor:
-                wau = (await cursor.fetchone())[0]
+            async with db.execute(self._STATS_QUERY, params) as cursor:
+                row = await cursor.fetchone()
 
-            # MAU
-            async with db.execute(
-                "SELECT COUNT(DISTINCT user_id) FROM daily_usage WHERE date >= ?",
-                (month_ago,)
-            ) as cursor:
-                mau = (await cursor.fetchone())[0]
+        stats = dict(zip(row.keys(), row))
+        total_users, premium_users = stats["total_users"], stats["premium_users"]
+        stats["conversion"] = round(premium_users / total_users * 100, 1) if total_users > 0 else 0
+        _stats_cache.set("stats", stats)
+        return stats
 
-            # Total revenue (last 30 days)
-            async with db.execute(
-                """SELECT COALESCE(SUM(amount), 0) FROM payments 
-                   WHERE created_at >= ? AND status = 'completed' AND source = 'payment'""",
-                (month_ago,)
-            ) as cursor:
-                revenue = (await cursor.fetchone())[0]
-
-            return {
-                "total_users": total_users,
-                "new_today": new_today,
-                "new_week": new_week,
-                "new_month": new_month,
-                "premium_users": premium_users,
-                "messages_today": messages_today,
-                "voice_today": voice_today,
-                "text_today": text_today,
-                "dau": dau,
-                "wau": wau,
-                "mau": mau,
-                "revenue": revenue,
-                "conversion": round(premium_users / total_users * 100, 1) if total_users > 0 else 0
-            }
-
-    async def get_users_list(
+    async def get_users_page(
         self,
         limit: int = 10,
-        offset: int = 0,
-        premium_only: bool = False
-    ) -> tuple[list[User], int]:
-        """Get paginated list of users."""
-        async with get_db() as db:
-            if premium_only:
-                count_query = "SELECT COUNT(*) FROM users WHERE premium_until > CURRENT_TIMESTAMP"
-                query = """SELECT * FROM users WHERE premium_until > CURRENT_TIMESTAMP
-                          ORDER BY created_at DESC LIMIT ? OFFSET ?"""
-            else:
-                count_query = "SELECT COUNT(*) FROM users"
-                query = "SELECT * FROM users ORDER BY created_at DESC LIMIT ? OFFSET ?"
-
-            async with db.execute(count_query) as cursor:
-                total = (await cursor.fetchone())[0]
+        premium_only: bool = False,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None
+    ) -> tuple[list[User], bool]:
+        """Get a page of users, newest first, by keyset on (created_at, id).
+
+        after_id continues past that user (next page); before_id returns the
+        page that ends just before it (previous page). The flag tells whether
+        more users lie further in the direction of travel.
+        """
+        conditions = [f"premium_until > {_SQL_NOW_ISO}"] if premium_only else []
+        params: list = []
+        order = "DESC"
+        if before_id is not None:
+            conditions.append(
+                "(created_at, id) > (SELECT created_at, id FROM users WHERE id = ?)")
+            params.append(before_id)
+            order = "ASC"
+        elif after_id is not None:
+            conditions.append(
+                "(created_at, id) < (SELECT created_at, id FROM users WHERE id = ?)")
+            params.append(after_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
 
-            async with db.execute(query, (limit, offset)) as cursor:
+        async with get_db() as db:
+            # One extra row tells whether another page exists
+            async with db.execute(
+                f"""SELECT {User.COLUMNS_SQL} FROM users {where}
+                    ORDER BY created_at {order}, id {order} LIMIT ?""",
+                (*params, limit + 1)
+            ) as cursor:
                 rows = await cursor.fetchall()
-                users = [User.from_row(dict(row)) for row in rows]
 
-            return users, total
+        has_more = len(rows) > limit
+        users = [User.from_row(row) for row in rows[:limit]]
+        if before_id is not None:
+            users.reverse()
+        return users, has_more
+
+    async def count_users(self, premium_only: bool = False) -> int:
+        """Count users for the list header; cached briefly since it is display-only."""
+        total = _user_count_cache.get(premium_only)
+        if total is None:
+            where = f"WHERE premium_until > {_SQL_NOW_ISO}" if premium_only else ""
+            async with get_db() as db:
+                async with db.execute(f"SELECT COUNT(*) FROM users {where}") as cursor:
+                    total = (await cursor.fetchone())[0]
+            _user_count_cache.set(premium_only, total)
+        return total
 
     async def search_user(self, query: str) -> Optional[User]:
         """Search user by ID or username."""
@@ -540,98 +944,95 @@ class AdminRepository:
             try:
                 user_id = int(query)
                 async with db.execute(
-                    "SELECT * FROM users WHERE id = ?", (user_id,)
+                    f"SELECT {User.COLUMNS_SQL} FROM users WHERE id = ?", (user_id,)
                 ) as cursor:
                     row = await cursor.fetchone()
                     if row:
-                        return User.from_row(dict(row))
+                        return User.from_row(row)
             except ValueError:
                 pass
 
             # Try by username
             username = query.lstrip("@")
             async with db.execute(
-                "SELECT * FROM users WHERE LOWER(username) = LOWER(?)", (username,)
+                f"SELECT {User.COLUMNS_SQL} FROM users WHERE username = ? COLLATE NOCASE", (username,)
             ) as cursor:
                 row = await cursor.fetchone()
                 if row:
-                    return User.from_row(dict(row))
+                    return User.from_row(row)
 
         return None
 
     async def get_user_details(self, user_id: int) -> dict:
         """Get detailed user info for admin card."""
         async with get_db() as db:
-            # User basic info
             async with db.execute(
-                "SELECT * FROM users WHERE id = ?", (user_id,)
+                f"""SELECT {User.COLUMNS_SQL},
+                       (SELECT COUNT(*) FROM messages WHERE user_id = u.id) AS msg_count,
+                       (SELECT COUNT(*) FROM saved_words WHERE user_id = u.id) AS words_count,
+                       (SELECT COUNT(*) FROM payments
+                         WHERE user_id = u.id AND source = 'payment') AS payment_count,
+                       (SELECT username FROM users WHERE id = u.referrer_id) AS referrer,
+                       (SELECT COUNT(*) FROM referrals WHERE referrer_id = u.id) AS referrals_count
+                   FROM users u WHERE u.id = ?""",
+                (user_id,)
             ) as cursor:
                 row = await cursor.fetchone()
-                if not row:
-                    return None
-                user = User.from_row(dict(row))
 
-            # Message count
-            async with db.execute(
-                "SELECT COUNT(*) FROM messages WHERE user_id = ?", (user_id,)
-            ) as cursor:
-                msg_count = (await cursor.fetchone())[0]
+        if not row:
+            return None
 
-            # Saved words count
-            async with db.execute(
-                "SELECT COUNT(*) FROM saved_words WHERE user_id = ?", (user_id,)
-            ) as cursor:
-                words_count = (await cursor.fetchone())[0]
+        # User columns come first; the aggregates trail them
+        return {
+            "user": User.from_row(row),
+            "msg_count": row["msg_count"],
+            "words_count": row["words_count"],
+            "payment_count": row["payment_count"],
+            "referrer": row["referrer"],
+            "referrals_count": row["referrals_count"]
+        }
 
-            # Payment count
+    @staticmethod
+    def _audience_filter(audience: str) -> str:
+        """WHERE clause selecting a broadcast audience."""
+        if audience == "premium":
+            return f"premium_until > {_SQL_NOW_ISO} AND is_blocked = 0"
+        if audience == "free":
+            return f"(premium_until IS NULL OR premium_until <= {_SQL_NOW_ISO}) AND is_blocked = 0"
+        return "is_blocked = 0"  # all
+
+    async def count_broadcast_audience(self, audience: str) -> int:
+        """Count users in a broadcast audience."""
+        async with get_db() as db:
             async with db.execute(
-                "SELECT COUNT(*) FROM payments WHERE user_id = ? AND source = 'payment'",
-                (user_id,)
+                f"SELECT COUNT(*) FROM users WHERE {self._audience_filter(audience)}"
             ) as cursor:
-                payment_count = (await cursor.fetchone())[0]
+                return (await cursor.fetchone())[0]
 
-            # Referrer info
-            referrer = None
-            if user.referrer_id:
-                async with db.execute(
-                    "SELECT username FROM users WHERE id = ?", (
-                        user.referrer_id,)
-                ) as cursor:
-                    ref_row = await cursor.fetchone()
-                    if ref_row:
-                        referrer = ref_row[0]
-
-            # Referrals count
-            async with db.execute(
-                "SELECT COUNT(*) FROM referrals WHERE referrer_id = ?", (user_id,)
-            ) as cursor:
-                referrals_count = (await cursor.fetchone())[0]
-
-            return {
-                "user": user,
-                "msg_count": msg_count,
-                "words_count": words_count,
-                "payment_count": payment_count,
-                "referrer": referrer,
-                "referrals_count": referrals_count
-            }
-
-    async def get_broadcast_audience(self, audience: str) -> list[int]:
-        """Get user IDs for broadcast."""
-        async with get_db() as db:
-            if audience == "premium":
-                query = """SELECT id FROM users 
-                          WHERE premium_until > CURRENT_TIMESTAMP AND NOT is_blocked"""
-            elif audience == "free":
-                query = """SELECT id FROM users 
-                          WHERE (premium_until IS NULL OR premium_until <= CURRENT_TIMESTAMP) 
-                          AND NOT is_blocked"""
-            else:  # all
-                query = "SELECT id FROM users WHERE NOT is_blocked"
-
-            async with db.execute(query) as cursor:
-                rows = await cursor.fetchall()
-                return [row[0] for row in rows]
+    async def iter_broadcast_audience(
+        self,
+        audience: str,
+        batch_size: int = 500
+    ) -> AsyncIterator[int]:
+        """Yield user IDs for broadcast, page by page.
+
+        Pages are fetched by keyset on id, and the pooled connection is
+        released between pages, so a long broadcast neither holds a
+        connection nor pins a read snapshot while it sends.
+        """
+        query = f"""SELECT id FROM users
+                   WHERE {self._audience_filter(audience)} AND id > ?
+                   ORDER BY id LIMIT ?"""
+        last_id = 0  # Telegram user IDs are positive
+        while True:
+            async with get_db() as db:
+                async with db.execute(query, (last_id, batch_size)) as cursor:
+                    ids = [row[0] for row in await cursor.fetchall()]
+            for user_id in ids:
+                yield user_id
+            if len(ids) < batch_size:
+                return
+            last_id = ids[-1]
 
 
 class PaymentRepository:
@@ -651,35 +1052,54 @@ class PaymentRepository:
         """Create payment record and return ID."""
         async with get_db() as db:
             cursor = await db.execute(
-                """INSERT INTO payments 
-                   (user_id, amount, currency, telegram_payment_id, provider_payment_id, 
-                    status, days_granted, source)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                _SQL_INSERT_PAYMENT,
                 (user_id, amount, currency, telegram_payment_id, provider_payment_id,
                  status, days_granted, source)
             )
             await db.commit()
             return cursor.lastrowid
 
+    async def create_many(self, rows: list[tuple]) -> None:
+        """Insert payments in one transaction.
+
+        Each row is (user_id, amount, currency, telegram_payment_id,
+        provider_payment_id, status, days_granted, source).
+        """
+        if not rows:
+            return
+        async with get_db() as db:
+            await db.execute("BEGIN")
+            await db.executemany(_SQL_INSERT_PAYMENT, rows)
+            await db.commit()
+
     async def get_user_payments(self, user_id: int) -> list[Payment]:
         """Get user's payment history."""
         async with get_db() as db:
             async with db.execute(
-                "SELECT * FROM payments WHERE user_id = ? ORDER BY created_at DESC",
+                f"SELECT {Payment.COLUMNS_SQL} FROM payments WHERE user_id = ? ORDER BY created_at DESC",
                 (user_id,)
             ) as cursor:
                 rows = await cursor.fetchall()
-                return [Payment.from_row(dict(row)) for row in rows]
+                return [Payment.from_row(row) for row in rows]
 
     async def get_total_revenue(self, days: int = 30) -> int:
         """Get total revenue in last N days (in kopecks)."""
-        cutoff = (datetime.utcnow() - timedelta(days=days)).isoformat()
-
         async with get_db() as db:
             async with db.execute(
                 """SELECT COALESCE(SUM(amount), 0) FROM payments 
-                   WHERE created_at > ? AND status = 'completed' AND source = 'payment'""",
-                (cutoff,)
+                   WHERE created_at > datetime('now', printf('-%d days', ?))
+                   AND status = 'completed' AND source = 'payment'""",
+                (days,)
             ) as cursor:
                 row = await cursor.fetchone()
                 return row[0] if row else 0
+
+
+# Repositories are stateless (each call borrows a pooled connection), so one
+# shared instance of each serves every handler
+user_repo = UserRepository()
+msg_repo = MessageRepository()
+usage_repo = DailyUsageRepository()
+referral_repo = ReferralRepository()
+admin_repo = AdminRepository()
+payment_repo = PaymentRepository()
@@ -2,11 +2,11 @@
 
 from aiogram import Router
 
+from . import start, dialog, topic, settings, premium, referral, admin, callbacks, profile
+
 
 def setup_routers() -> Router:
     """Setup and return main router with all handlers."""
-    from . import start, dialog, topic, settings, premium, referral, admin, callbacks, profile
-    
     router = Router()
     
     # Register all routers
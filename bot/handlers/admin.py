@@ -1,17 +1,21 @@
 """Admin panel handler."""
 
+import asyncio
 import logging
+import time
 from datetime import datetime
+from types import MappingProxyType
 
-from aiogram import Router, F
-from aiogram.filters import Command
-from aiogram.types import Message, CallbackQuery
+from aiogram import Bot, Router, F
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.filters import BaseFilter, Command, ExceptionTypeFilter
+from aiogram.types import Message, CallbackQuery, ErrorEvent
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
 from bot.config import settings
 from bot.database.models import User
-from bot.database.repositories import AdminRepository, UserRepository
+from bot.database.repositories import admin_repo, user_repo
 from bot.keyboards.inline import (
     get_admin_main_keyboard,
     get_admin_user_keyboard,
@@ -19,12 +23,96 @@ from bot.keyboards.inline import (
     get_admin_broadcast_keyboard,
     get_admin_users_keyboard
 )
+from bot.middlewares.callback_data import ParsedCallback
 from bot.middlewares.subscription import get_subscription_status, SubscriptionType
+from bot.utils.rate_limit import RateLimiter
+from bot.utils.tasks import spawn
 
-router = Router()
 logger = logging.getLogger(__name__)
 
+
+class IsAdminFilter(BaseFilter):
+    """Pass only updates from users listed in ADMIN_IDS."""
+
+    async def __call__(self, event: Message | CallbackQuery) -> bool:
+        return event.from_user is not None and settings.is_admin(event.from_user.id)
+
+
+# Admin handlers sit behind one router-level check. Non-admins fall through
+# to denied_router, which answers the admin entry points with a refusal.
+admin_router = Router(name="admin")
+admin_router.message.filter(IsAdminFilter())
+admin_router.callback_query.filter(IsAdminFilter())
+denied_router = Router(name="admin_denied")
+
+router = Router()
+router.include_routers(admin_router, denied_router)
+
+
+@admin_router.errors(ExceptionTypeFilter(TimeoutError))
+async def on_db_timeout(event: ErrorEvent):
+    """Tell the admin to retry when the connection pool stays exhausted.
+
+    Error events propagate through every router, so timeouts raised for
+    other users are passed on untouched.
+    """
+    source = event.update.callback_query or event.update.message
+    if source is None or source.from_user is None or not settings.is_admin(source.from_user.id):
+        return UNHANDLED
+    logger.warning(f"Admin handler timed out: {event.exception}")
+    text = "⏳ База данных перегружена, попробуйте ещё раз."
+    if isinstance(source, CallbackQuery):
+        await source.answer(text, show_alert=True)
+    else:
+        await source.answer(text)
+
 USERS_PER_PAGE = 10
+BROADCAST_CONCURRENCY = 25
+BROADCAST_RATE_PER_SECOND = 25
+BROADCAST_PROGRESS_INTERVAL = 2.0  # Seconds between status edits
+
+# Admin screens shared by several handlers, filled with format_map(stats)
+_ADMIN_PANEL_TMPL = (
+    "🔐 <b>Админ-панель</b>\n\n"
+    "📊 <b>Статистика:</b>\n"
+    "• Всего пользователей: <b>{total_users}</b>\n"
+    "• Premium активных: <b>{premium_users}</b>\n"
+    "• За сегодня новых: <b>{new_today}</b>\n"
+    "• За сегодня сообщений: <b>{messages_today}</b>"
+)
+
+_ADMIN_STATS_TMPL = (
+    "📈 <b>Статистика бота</b>\n\n"
+    "👥 <b>Пользователи:</b>\n"
+    "• Всего: <b>{total_users}</b>\n"
+    "• За сегодня: <b>+{new_today}</b>\n"
+    "• За неделю: <b>+{new_week}</b>\n"
+    "• За месяц: <b>+{new_month}</b>\n\n"
+    "💎 <b>Premium:</b>\n"
+    "• Активных: <b>{premium_users}</b>\n"
+    "• Конверсия: <b>{conversion}%</b>\n"
+    "• MRR: <b>₽{mrr:,}</b>\n\n"
+    "💬 <b>Сообщения (сегодня):</b>\n"
+    "• Текстовых: <b>{text_today}</b>\n"
+    "• Голосовых: <b>{voice_today}</b>\n"
+    "• Всего: <b>{messages_today}</b>\n\n"
+    "📊 <b>Активность:</b>\n"
+    "• DAU: <b>{dau}</b>\n"
+    "• WAU: <b>{wau}</b>\n"
+    "• MAU: <b>{mau}</b>"
+)
+
+_STATUS_EMOJI = MappingProxyType({
+    SubscriptionType.PREMIUM: "💎",
+    SubscriptionType.TRIAL: "🎁",
+    SubscriptionType.FREE: "🆓"
+})
+
+_STATUS_NAME = MappingProxyType({
+    SubscriptionType.PREMIUM: "💎 Premium",
+    SubscriptionType.TRIAL: "🎁 Trial",
+    SubscriptionType.FREE: "🆓 Free"
+})
 
 
 class AdminStates(StatesGroup):
@@ -34,76 +122,37 @@ class AdminStates(StatesGroup):
     waiting_user_message = State()
 
 
-def admin_only(func):
-    """Decorator to check admin access."""
-    async def wrapper(event, *args, **kwargs):
-        user_id = event.from_user.id if hasattr(event, 'from_user') else None
-        if not user_id or not settings.is_admin(user_id):
-            if isinstance(event, Message):
-                await event.answer("⛔ Доступ запрещён")
-            elif isinstance(event, CallbackQuery):
-                await event.answer("⛔ Доступ запрещён", show_alert=True)
-            return
-        return await func(event, *args, **kwargs)
-    return wrapper
-
-
-@router.message(Command("admin"))
+@admin_router.message(Command("admin"))
 async def cmd_admin(message: Message, user: User):
     """Handle /admin command."""
-    if not settings.is_admin(message.from_user.id):
-        await message.answer("⛔ Доступ запрещён")
-        return
-
-    admin_repo = AdminRepository()
     stats = await admin_repo.get_stats()
 
     await message.answer(
-        f"🔐 <b>Админ-панель</b>\n\n"
-        f"📊 <b>Статистика:</b>\n"
-        f"• Всего пользователей: <b>{stats['total_users']}</b>\n"
-        f"• Premium активных: <b>{stats['premium_users']}</b>\n"
-        f"• За сегодня новых: <b>{stats['new_today']}</b>\n"
-        f"• За сегодня сообщений: <b>{stats['messages_today']}</b>",
+        _ADMIN_PANEL_TMPL.format_map(stats),
         reply_markup=get_admin_main_keyboard(),
         parse_mode="HTML"
     )
 
 
 # Admin callback handlers
-@router.callback_query(F.data == "admin:back")
+@admin_router.callback_query(F.data == "admin:back")
 async def callback_admin_back(callback: CallbackQuery, state: FSMContext):
     """Return to admin main menu."""
-    if not settings.is_admin(callback.from_user.id):
-        await callback.answer("⛔ Доступ запрещён", show_alert=True)
-        return
-
     await state.clear()
 
-    admin_repo = AdminRepository()
     stats = await admin_repo.get_stats()
 
     await callback.answer()
     await callback.message.edit_text(
-        f"🔐 <b>Админ-панель</b>\n\n"
-        f"📊 <b>Статистика:</b>\n"
-        f"• Всего пользователей: <b>{stats['total_users']}</b>\n"
-        f"• Premium активных: <b>{stats['premium_users']}</b>\n"
-        f"• За сегодня новых: <b>{stats['new_today']}</b>\n"
-        f"• За сегодня сообщений: <b>{stats['messages_today']}</b>",
+        _ADMIN_PANEL_TMPL.format_map(stats),
         reply_markup=get_admin_main_keyboard(),
         parse_mode="HTML"
     )
 
 
-@router.callback_query(F.data == "admin:stats")
+@admin_router.callback_query(F.data == "admin:stats")
 async def callback_admin_stats(callback: CallbackQuery):
     """Show detailed statistics."""
-    if not settings.is_admin(callback.from_user.id):
-        await callback.answer("⛔ Доступ запрещён", show_alert=True)
-        return
-
-    admin_repo = AdminRepository()
     stats = await admin_repo.get_stats()
 
     # Calculate MRR (Monthly Recurring Revenue)
@@ -111,62 +160,51 @@ async def callback_admin_stats(callback: CallbackQuery):
 
     await callback.answer()
     await callback.message.edit_text(
-        f"📈 <b>Статистика бота</b>\n\n"
-        f"👥 <b>Пользователи:</b>\n"
-        f"• Всего: <b>{stats['total_users']}</b>\n"
-        f"• За сегодня: <b>+{stats['new_today']}</b>\n"
-        f"• За неделю: <b>+{stats['new_week']}</b>\n"
-        f"• За месяц: <b>+{stats['new_month']}</b>\n\n"
-        f"💎 <b>Premium:</b>\n"
-        f"• Активных: <b>{stats['premium_users']}</b>\n"
-        f"• Конверсия: <b>{stats['conversion']}%</b>\n"
-        f"• MRR: <b>₽{mrr:,}</b>\n\n"
-        f"💬 <b>Сообщения (сегодня):</b>\n"
-        f"• Текстовых: <b>{stats['text_today']}</b>\n"
-        f"• Голосовых: <b>{stats['voice_today']}</b>\n"
-        f"• Всего: <b>{stats['messages_today']}</b>\n\n"
-        f"📊 <b>Активность:</b>\n"
-        f"• DAU: <b>{stats['dau']}</b>\n"
-        f"• WAU: <b>{stats['wau']}</b>\n"
-        f"• MAU: <b>{stats['mau']}</b>",
+        _ADMIN_STATS_TMPL.format_map({**stats, "mrr": mrr}),
         reply_markup=get_admin_main_keyboard(),
         parse_mode="HTML"
     )
 
 
-@router.callback_query(F.data.startswith("admin:users:"))
-async def callback_admin_users(callback: CallbackQuery):
+@admin_router.callback_query(F.data.startswith("admin:users:"))
+async def callback_admin_users(callback: CallbackQuery, cb: ParsedCallback):
     """Show users list."""
-    if not settings.is_admin(callback.from_user.id):
-        await callback.answer("⛔ Доступ запрещён", show_alert=True)
-        return
-
-    parts = callback.data.split(":")
-    # admin:users:all or admin:users:premium or admin:users:all:page
-    user_type = parts[2]
-    page = int(parts[3]) if len(parts) > 3 else 1
-
+    # admin:users:<all|premium>[:<page>:<n|p>:<cursor_user_id>]
+    user_type = cb[2]
     premium_only = user_type == "premium"
 
-    admin_repo = AdminRepository()
-    offset = (page - 1) * USERS_PER_PAGE
-    users, total = await admin_repo.get_users_list(
+    page = 1
+    direction = None
+    cursor_id = None
+    if len(cb) == 6:
+        page = cb.as_int(3)
+        direction = cb[4]
+        cursor_id = cb.as_int(5)
+
+    users, has_more = await admin_repo.get_users_page(
         limit=USERS_PER_PAGE,
-        offset=offset,
-        premium_only=premium_only
+        premium_only=premium_only,
+        after_id=cursor_id if direction == "n" else None,
+        before_id=cursor_id if direction == "p" else None
     )
+    total = await admin_repo.count_users(premium_only)
 
-    total_pages = max(1, (total + USERS_PER_PAGE - 1) // USERS_PER_PAGE)
+    if direction == "p":
+        has_prev, has_next = has_more, True
+        if not has_prev:
+            page = 1
+    else:
+        has_prev, has_next = page > 1, has_more
+
+    total_pages = max(page, (total + USERS_PER_PAGE - 1) // USERS_PER_PAGE)
+    offset = (page - 1) * USERS_PER_PAGE
 
     # Format user list
     lines = []
+    now = time.time()
     for i, u in enumerate(users, start=offset + 1):
-        status = get_subscription_status(u)
-        status_emoji = {
-            SubscriptionType.PREMIUM: "💎",
-            SubscriptionType.TRIAL: "🎁",
-            SubscriptionType.FREE: "🆓"
-        }.get(status, "🆓")
+        status = get_subscription_status(u, now)
+        status_emoji = _STATUS_EMOJI.get(status, "🆓")
 
         name = f"@{u.username}" if u.username else f"user_{u.id}"
         date_str = u.created_at.strftime("%d.%m.%Y")
@@ -178,18 +216,20 @@ async def callback_admin_users(callback: CallbackQuery):
     await callback.message.edit_text(
         f"{title} ({total})\n\n" +
         "\n".join(lines) if lines else "Нет пользователей",
-        reply_markup=get_admin_users_keyboard(page, total_pages, premium_only),
+        reply_markup=get_admin_users_keyboard(
+            page,
+            total_pages,
+            premium_only,
+            prev_cursor=users[0].id if has_prev and users else None,
+            next_cursor=users[-1].id if has_next and users else None
+        ),
         parse_mode="HTML"
     )
 
 
-@router.callback_query(F.data == "admin:search")
+@admin_router.callback_query(F.data == "admin:search")
 async def callback_admin_search(callback: CallbackQuery, state: FSMContext):
     """Start user search."""
-    if not settings.is_admin(callback.from_user.id):
-        await callback.answer("⛔ Доступ запрещён", show_alert=True)
-        return
-
     await state.set_state(AdminStates.waiting_search)
     await callback.answer()
     await callback.message.edit_text(
@@ -199,13 +239,9 @@ async def callback_admin_search(callback: CallbackQuery, state: FSMContext):
     )
 
 
-@router.message(AdminStates.waiting_search)
+@admin_router.message(AdminStates.waiting_search)
 async def process_search(message: Message, state: FSMContext):
     """Process user search query."""
-    if not settings.is_admin(message.from_user.id):
-        return
-
-    admin_repo = AdminRepository()
     user = await admin_repo.search_user(message.text.strip())
 
     if not user:
@@ -221,21 +257,16 @@ async def process_search(message: Message, state: FSMContext):
     await show_user_card(message, user.id)
 
 
-@router.callback_query(F.data.startswith("admin:user:"))
-async def callback_admin_user(callback: CallbackQuery):
+@admin_router.callback_query(F.data.startswith("admin:user:"))
+async def callback_admin_user(callback: CallbackQuery, cb: ParsedCallback):
     """Show user card."""
-    if not settings.is_admin(callback.from_user.id):
-        await callback.answer("⛔ Доступ запрещён", show_alert=True)
-        return
-
-    user_id = int(callback.data.split(":")[2])
+    user_id = cb.as_int(2)
     await callback.answer()
     await show_user_card(callback.message, user_id, edit=True)
 
 
 async def show_user_card(message: Message, user_id: int, edit: bool = False):
     """Show detailed user card."""
-    admin_repo = AdminRepository()
     details = await admin_repo.get_user_details(user_id)
 
     if not details:
@@ -249,11 +280,7 @@ async def show_user_card(message: Message, user_id: int, edit: bool = False):
     user = details["user"]
     status = get_subscription_status(user)
 
-    status_name = {
-        SubscriptionType.PREMIUM: "💎 Premium",
-        SubscriptionType.TRIAL: "🎁 Trial",
-        SubscriptionType.FREE: "🆓 Free"
-    }.get(status, "🆓 Free")
+    status_name = _STATUS_NAME.get(status, "🆓 Free")
 
     premium_info = ""
     if status == SubscriptionType.PREMIUM and user.premium_until:
@@ -297,17 +324,12 @@ async def show_user_card(message: Message, user_id: int, edit: bool = False):
         )
 
 
-@router.callback_query(F.data.startswith("admin:give_premium:"))
-async def callback_give_premium(callback: CallbackQuery):
+@admin_router.callback_query(F.data.startswith("admin:give_premium:"))
+async def callback_give_premium(callback: CallbackQuery, cb: ParsedCallback):
     """Show premium days selection."""
-    if not settings.is_admin(callback.from_user.id):
-        await callback.answer("⛔ Доступ запрещён", show_alert=True)
-        return
-
-    user_id = int(callback.data.split(":")[2])
+    user_id = cb.as_int(2)
 
-    user_repo = UserRepository()
-    user = await user_repo.get(user_id)
+    user = await user_repo.load(user_id)
 
     name = f"@{user.username}" if user and user.username else f"user_{user_id}"
 
@@ -321,21 +343,23 @@ async def callback_give_premium(callback: CallbackQuery):
     )
 
 
-@router.callback_query(F.data.startswith("admin:premium_days:"))
-async def callback_premium_days(callback: CallbackQuery):
-    """Grant premium days to user."""
-    if not settings.is_admin(callback.from_user.id):
-        await callback.answer("⛔ Доступ запрещён", show_alert=True)
-        return
+async def _notify_user(bot: Bot, user_id: int, text: str) -> None:
+    """Send an HTML notification to a user, logging instead of raising."""
+    try:
+        await bot.send_message(user_id, text, parse_mode="HTML")
+    except Exception as e:
+        logger.warning(f"Failed to notify user {user_id}: {e}")
+
 
-    parts = callback.data.split(":")
-    user_id = int(parts[2])
-    days = int(parts[3])
+@admin_router.callback_query(F.data.startswith("admin:premium_days:"))
+async def callback_premium_days(callback: CallbackQuery, cb: ParsedCallback):
+    """Grant premium days to user."""
+    user_id = cb.as_int(2)
+    days = cb.as_int(3)
 
-    user_repo = UserRepository()
     new_until = await user_repo.add_premium_days(user_id, days)
 
-    user = await user_repo.get(user_id)
+    user = await user_repo.load(user_id)
     name = f"@{user.username}" if user and user.username else f"user_{user_id}"
 
     # Check if this is permanent premium (100 years)
@@ -353,16 +377,13 @@ async def callback_premium_days(callback: CallbackQuery):
             parse_mode="HTML"
         )
 
-        # Notify user
-        try:
-            await callback.bot.send_message(
-                user_id,
-                f"🎁 Вам выдан <b>перманентный Premium</b>!\n"
-                f"♾️ Подписка активна навсегда!",
-                parse_mode="HTML"
-            )
-        except Exception:
-            pass
+        # Notify user without holding up the admin's callback
+        spawn(_notify_user(
+            callback.bot,
+            user_id,
+            f"🎁 Вам выдан <b>перманентный Premium</b>!\n"
+            f"♾️ Подписка активна навсегда!"
+        ))
     else:
         await callback.answer(f"✅ Premium выдан на {days} дней!", show_alert=True)
         await callback.message.edit_text(
@@ -375,64 +396,46 @@ async def callback_premium_days(callback: CallbackQuery):
             parse_mode="HTML"
         )
 
-        # Notify user
-        try:
-            await callback.bot.send_message(
-                user_id,
-                f"🎁 Вам выдан Premium на <b>{days} дней</b>!\n"
-                f"Активен до: {new_until.strftime('%d.%m.%Y')}",
-                parse_mode="HTML"
-            )
-        except Exception:
-            pass
+        # Notify user without holding up the admin's callback
+        spawn(_notify_user(
+            callback.bot,
+            user_id,
+            f"🎁 Вам выдан Premium на <b>{days} дней</b>!\n"
+            f"Активен до: {new_until.strftime('%d.%m.%Y')}"
+        ))
 
 
-@router.callback_query(F.data.startswith("admin:block:"))
-async def callback_block_user(callback: CallbackQuery):
+@admin_router.callback_query(F.data.startswith("admin:block:"))
+async def callback_block_user(callback: CallbackQuery, cb: ParsedCallback):
     """Block user."""
-    if not settings.is_admin(callback.from_user.id):
-        await callback.answer("⛔ Доступ запрещён", show_alert=True)
-        return
+    user_id = cb.as_int(2)
 
-    user_id = int(callback.data.split(":")[2])
-
-    user_repo = UserRepository()
     await user_repo.block(user_id)
 
     await callback.answer("🚫 Пользователь заблокирован", show_alert=True)
     await show_user_card(callback.message, user_id, edit=True)
 
 
-@router.callback_query(F.data.startswith("admin:unblock:"))
-async def callback_unblock_user(callback: CallbackQuery):
+@admin_router.callback_query(F.data.startswith("admin:unblock:"))
+async def callback_unblock_user(callback: CallbackQuery, cb: ParsedCallback):
     """Unblock user."""
-    if not settings.is_admin(callback.from_user.id):
-        await callback.answer("⛔ Доступ запрещён", show_alert=True)
-        return
+    user_id = cb.as_int(2)
 
-    user_id = int(callback.data.split(":")[2])
-
-    user_repo = UserRepository()
     await user_repo.unblock(user_id)
 
     await callback.answer("✅ Пользователь разблокирован", show_alert=True)
     await show_user_card(callback.message, user_id, edit=True)
 
 
-@router.callback_query(F.data.startswith("admin:message:"))
-async def callback_message_user(callback: CallbackQuery, state: FSMContext):
+@admin_router.callback_query(F.data.startswith("admin:message:"))
+async def callback_message_user(callback: CallbackQuery, state: FSMContext, cb: ParsedCallback):
     """Start composing message to user."""
-    if not settings.is_admin(callback.from_user.id):
-        await callback.answer("⛔ Доступ запрещён", show_alert=True)
-        return
-
-    user_id = int(callback.data.split(":")[2])
+    user_id = cb.as_int(2)
 
     await state.set_state(AdminStates.waiting_user_message)
     await state.update_data(target_user_id=user_id)
 
-    user_repo = UserRepository()
-    user = await user_repo.get(user_id)
+    user = await user_repo.load(user_id)
     name = f"@{user.username}" if user and user.username else f"user_{user_id}"
 
     await callback.answer()
@@ -444,12 +447,9 @@ async def callback_message_user(callback: CallbackQuery, state: FSMContext):
     )
 
 
-@router.message(AdminStates.waiting_user_message)
+@admin_router.message(AdminStates.waiting_user_message)
 async def process_user_message(message: Message, state: FSMContext):
     """Send message to user."""
-    if not settings.is_admin(message.from_user.id):
-        return
-
     data = await state.get_data()
     user_id = data.get("target_user_id")
 
@@ -473,13 +473,9 @@ async def process_user_message(message: Message, state: FSMContext):
 
 
 # Broadcast
-@router.callback_query(F.data == "admin:broadcast")
+@admin_router.callback_query(F.data == "admin:broadcast")
 async def callback_broadcast(callback: CallbackQuery):
     """Show broadcast audience selection."""
-    if not settings.is_admin(callback.from_user.id):
-        await callback.answer("⛔ Доступ запрещён", show_alert=True)
-        return
-
     await callback.answer()
     await callback.message.edit_text(
         "📢 <b>Рассылка сообщений</b>\n\n"
@@ -489,68 +485,93 @@ async def callback_broadcast(callback: CallbackQuery):
     )
 
 
-@router.callback_query(F.data.startswith("admin:broadcast:"))
-async def callback_broadcast_audience(callback: CallbackQuery, state: FSMContext):
+@admin_router.callback_query(F.data.startswith("admin:broadcast:"))
+async def callback_broadcast_audience(callback: CallbackQuery, state: FSMContext, cb: ParsedCallback):
     """Set broadcast audience and ask for message."""
-    if not settings.is_admin(callback.from_user.id):
-        await callback.answer("⛔ Доступ запрещён", show_alert=True)
-        return
+    audience = cb[2]
 
-    audience = callback.data.split(":")[2]
+    total = await admin_repo.count_broadcast_audience(audience)
 
-    admin_repo = AdminRepository()
-    user_ids = await admin_repo.get_broadcast_audience(audience)
-
-    if not user_ids:
+    if not total:
         await callback.answer("Нет пользователей для рассылки", show_alert=True)
         return
 
     await state.set_state(AdminStates.waiting_broadcast_text)
-    await state.update_data(broadcast_audience=audience, broadcast_count=len(user_ids))
+    await state.update_data(broadcast_audience=audience, broadcast_count=total)
 
     audience_names = {"all": "всем", "premium": "Premium", "free": "Free"}
 
     await callback.answer()
     await callback.message.edit_text(
         f"📝 <b>Рассылка {audience_names.get(audience, 'всем')}</b>\n\n"
-        f"Получателей: <b>{len(user_ids)}</b>\n\n"
+        f"Получателей: <b>{total}</b>\n\n"
         f"Введите текст рассылки:",
         parse_mode="HTML"
     )
 
 
-@router.message(AdminStates.waiting_broadcast_text)
+@admin_router.message(AdminStates.waiting_broadcast_text)
 async def process_broadcast(message: Message, state: FSMContext):
     """Send broadcast message."""
-    if not settings.is_admin(message.from_user.id):
-        return
-
     data = await state.get_data()
     audience = data.get("broadcast_audience", "all")
 
-    admin_repo = AdminRepository()
-    user_ids = await admin_repo.get_broadcast_audience(audience)
+    # Counted when the audience was picked; only used for progress display
+    total = data.get("broadcast_count")
+    if total is None:
+        total = await admin_repo.count_broadcast_audience(audience)
 
     await state.clear()
 
-    status_msg = await message.answer(f"📤 Отправка... 0/{len(user_ids)}")
+    status_msg = await message.answer(f"📤 Отправка... 0/{total}")
 
     success = 0
     failed = 0
-
-    for i, user_id in enumerate(user_ids, 1):
+    last_edit = time.monotonic()
+
+    # Overlap network round trips, but stay under Telegram's ~30 msg/s
+    # bot-wide limit. The semaphore also caps how many recipients are
+    # held in memory while the audience is streamed.
+    semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+    limiter = RateLimiter(BROADCAST_RATE_PER_SECOND)
+    pending: set[asyncio.Task] = set()
+    progress: asyncio.Task | None = None
+
+    async def send(user_id: int) -> None:
+        nonlocal success, failed
         try:
-            await message.bot.send_message(user_id, message.text)
+            async with limiter:
+                # Server-side clone of the admin's message: no text payload
+                # per recipient, and entities/formatting are kept as sent
+                await message.bot.copy_message(
+                    chat_id=user_id,
+                    from_chat_id=message.chat.id,
+                    message_id=message.message_id
+                )
             success += 1
         except Exception:
             failed += 1
-
-        # Update status every 10 messages
-        if i % 10 == 0:
-            try:
-                await status_msg.edit_text(f"📤 Отправка... {i}/{len(user_ids)}")
-            except Exception:
-                pass
+        finally:
+            semaphore.release()
+
+    async for user_id in admin_repo.iter_broadcast_audience(audience):
+        await semaphore.acquire()
+        task = asyncio.create_task(send(user_id))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+
+        # Edits share the bot's rate budget with the sends: update at most
+        # every BROADCAST_PROGRESS_INTERVAL seconds, in the background, and
+        # skip while the previous edit is still in flight so edits stay ordered
+        now = time.monotonic()
+        if now - last_edit >= BROADCAST_PROGRESS_INTERVAL and (progress is None or progress.done()):
+            last_edit = now
+            progress = spawn(_edit_progress(
+                status_msg, f"📤 Отправка... {success + failed}/{total}"))
+
+    await asyncio.gather(*pending)
+    if progress is not None:
+        await progress
 
     await status_msg.edit_text(
         f"✅ <b>Рассылка завершена!</b>\n\n"
@@ -560,44 +581,50 @@ async def process_broadcast(message: Message, state: FSMContext):
     )
 
 
-@router.callback_query(F.data == "admin:premium_all_admins")
+async def _edit_progress(status_msg: Message, text: str) -> None:
+    try:
+        await status_msg.edit_text(text)
+    except Exception:
+        pass
+
+
+@admin_router.callback_query(F.data == "admin:premium_all_admins")
 async def callback_premium_all_admins(callback: CallbackQuery):
     """Grant permanent premium to all admins."""
-    if not settings.is_admin(callback.from_user.id):
-        await callback.answer("⛔ Доступ запрещён", show_alert=True)
-        return
-
     await callback.answer()
 
     # Get all admin IDs from config
-    admin_ids = [int(aid.strip())
-                 for aid in settings.ADMIN_IDS.split(',') if aid.strip()]
+    admin_ids = sorted(settings.admin_ids)
 
-    user_repo = UserRepository()
     granted = []
     failed = []
 
+    # Grant 100 years of premium (permanent) in a single write
+    try:
+        updated = await user_repo.add_premium_days_many(admin_ids, 36500)
+    except Exception as e:
+        logger.error(f"Failed to grant premium to admins: {e}")
+        updated = {}
+
+    admins = await user_repo.get_many(list(updated))
+
     for admin_id in admin_ids:
-        try:
-            # Grant 100 years of premium (permanent)
-            new_until = await user_repo.add_premium_days(admin_id, 36500)
-            user = await user_repo.get(admin_id)
-            name = f"@{user.username}" if user and user.username else f"user_{admin_id}"
-            granted.append(name)
-
-            # Notify admin
-            try:
-                await callback.bot.send_message(
-                    admin_id,
-                    f"🎁 Вам выдан <b>перманентный Premium</b>!\n"
-                    f"♾️ Подписка активна навсегда!",
-                    parse_mode="HTML"
-                )
-            except Exception:
-                pass
-        except Exception as e:
-            logger.error(f"Failed to grant premium to admin {admin_id}: {e}")
+        if admin_id not in updated:
+            # Never started the bot, or the write failed
             failed.append(str(admin_id))
+            continue
+
+        user = admins.get(admin_id)
+        name = f"@{user.username}" if user and user.username else f"user_{admin_id}"
+        granted.append(name)
+
+        # Notify admin
+        spawn(_notify_user(
+            callback.bot,
+            admin_id,
+            f"🎁 Вам выдан <b>перманентный Premium</b>!\n"
+            f"♾️ Подписка активна навсегда!"
+        ))
 
     result_text = f"✅ <b>Premium выдан всем админам!</b>\n\n"
 
@@ -614,3 +641,15 @@ async def callback_premium_all_admins(callback: CallbackQuery):
         reply_markup=get_admin_main_keyboard(),
         parse_mode="HTML"
     )
+
+
+@denied_router.message(Command("admin"))
+async def cmd_admin_denied(message: Message):
+    """Refuse /admin for non-admins."""
+    await message.answer("⛔ Доступ запрещён")
+
+
+@denied_router.callback_query(F.data.startswith("admin:"))
+async def callback_admin_denied(callback: CallbackQuery):
+    """Refuse admin buttons for non-admins (e.g. a forwarded admin message)."""
+    await callback.answer("⛔ Доступ запрещён", show_alert=True)
@@ -4,45 +4,37 @@ from aiogram import Router, F
 from aiogram.types import CallbackQuery
 
 from bot.database.models import User
-from bot.database.repositories import UserRepository, MessageRepository
+from bot.database.repositories import user_repo, msg_repo
+from bot.handlers.settings import SPEED_NAMES, TOPIC_NAMES
+from bot.handlers.topic import TOPICS
 from bot.keyboards.inline import (
     get_topic_keyboard,
     get_level_keyboard,
     get_speed_keyboard,
     get_settings_keyboard
 )
+from bot.middlewares.callback_data import ParsedCallback
 
 router = Router()
 
 
 # Topic selection
 @router.callback_query(F.data.startswith("topic:"))
-async def callback_topic(callback: CallbackQuery, user: User):
+async def callback_topic(callback: CallbackQuery, user: User, cb: ParsedCallback):
     """Handle topic selection."""
-    topic = callback.data.split(":")[1]
-
-    topics = {
-        "travel": "✈️ Путешествия",
-        "food": "🍜 Еда",
-        "work": "💼 Работа",
-        "daily": "🏠 Быт",
-        "study": "📚 Учёба",
-        "health": "🏥 Здоровье",
-        "free": "💬 Свободный диалог"
-    }
-
-    if topic not in topics:
+    topic = cb[1]
+
+    if topic not in TOPIC_NAMES:
         await callback.answer("Неизвестная тема")
         return
 
     # Update user's topic
-    repo = UserRepository()
-    await repo.update(user.id, current_topic=topic)
+    await user_repo.update(user.id, current_topic=topic)
 
-    await callback.answer(f"✅ Тема изменена на: {topics[topic]}")
+    await callback.answer(f"✅ Тема изменена на: {TOPIC_NAMES[topic]}")
     await callback.message.edit_text(
         f"🎯 <b>Выберите тему для диалога</b>\n\n"
-        f"Текущая тема: <b>{topics[topic]}</b>\n\n"
+        f"Текущая тема: <b>{TOPIC_NAMES[topic]}</b>\n\n"
         f"<i>Выбранная тема влияет на контекст и словарный запас в диалогах.</i>",
         reply_markup=get_topic_keyboard(topic),
         parse_mode="HTML"
@@ -51,17 +43,16 @@ async def callback_topic(callback: CallbackQuery, user: User):
 
 # Level selection
 @router.callback_query(F.data.startswith("level:"))
-async def callback_level(callback: CallbackQuery, user: User):
+async def callback_level(callback: CallbackQuery, user: User, cb: ParsedCallback):
     """Handle HSK level selection."""
-    level = int(callback.data.split(":")[1])
+    level = cb.as_int(1)
 
     if level not in [1, 2, 3]:
         await callback.answer("Неверный уровень")
         return
 
     # Update user's level
-    repo = UserRepository()
-    await repo.update(user.id, hsk_level=level)
+    await user_repo.update(user.id, hsk_level=level)
 
     await callback.answer(f"✅ Уровень изменён на HSK {level}")
     await callback.message.edit_text(
@@ -77,28 +68,21 @@ async def callback_level(callback: CallbackQuery, user: User):
 
 # Speed selection
 @router.callback_query(F.data.startswith("speed:"))
-async def callback_speed(callback: CallbackQuery, user: User):
+async def callback_speed(callback: CallbackQuery, user: User, cb: ParsedCallback):
     """Handle speech speed selection."""
-    speed = callback.data.split(":")[1]
-
-    speeds = {
-        "slow": "🐢 Медленная",
-        "normal": "🚶 Нормальная",
-        "fast": "🏃 Быстрая"
-    }
+    speed = cb[1]
 
-    if speed not in speeds:
+    if speed not in SPEED_NAMES:
         await callback.answer("Неверная скорость")
         return
 
     # Update user's speed
-    repo = UserRepository()
-    await repo.update(user.id, speech_speed=speed)
+    await user_repo.update(user.id, speech_speed=speed)
 
-    await callback.answer(f"✅ Скорость изменена на: {speeds[speed]}")
+    await callback.answer(f"✅ Скорость изменена на: {SPEED_NAMES[speed]}")
     await callback.message.edit_text(
         f"🔊 <b>Выберите скорость речи</b>\n\n"
-        f"Текущая скорость: <b>{speeds[speed]}</b>\n\n"
+        f"Текущая скорость: <b>{SPEED_NAMES[speed]}</b>\n\n"
         f"<b>🐢 Медленно</b> — для начинающих\n"
         f"<b>🚶 Нормально</b> — естественная речь\n"
         f"<b>🏃 Быстро</b> — как носители языка",
@@ -109,9 +93,9 @@ async def callback_speed(callback: CallbackQuery, user: User):
 
 # Settings menu navigation
 @router.callback_query(F.data.startswith("settings:"))
-async def callback_settings(callback: CallbackQuery, user: User):
+async def callback_settings(callback: CallbackQuery, user: User, cb: ParsedCallback):
     """Handle settings menu navigation."""
-    action = callback.data.split(":")[1]
+    action = cb[1]
 
     if action == "level":
         await callback.message.edit_text(
@@ -125,14 +109,9 @@ async def callback_settings(callback: CallbackQuery, user: User):
         )
 
     elif action == "speed":
-        speeds = {
-            "slow": "🐢 Медленная",
-            "normal": "🚶 Нормальная",
-            "fast": "🏃 Быстрая"
-        }
         await callback.message.edit_text(
             f"🔊 <b>Выберите скорость речи</b>\n\n"
-            f"Текущая скорость: <b>{speeds.get(user.speech_speed, 'Нормальная')}</b>\n\n"
+            f"Текущая скорость: <b>{SPEED_NAMES.get(user.speech_speed, 'Нормальная')}</b>\n\n"
             f"<b>🐢 Медленно</b> — для начинающих\n"
             f"<b>🚶 Нормально</b> — естественная речь\n"
             f"<b>🏃 Быстро</b> — как носители языка",
@@ -141,7 +120,6 @@ async def callback_settings(callback: CallbackQuery, user: User):
         )
 
     elif action == "topic":
-        from bot.handlers.topic import TOPICS
         current_topic_name = TOPICS.get(user.current_topic, "🏠 Быт")
         await callback.message.edit_text(
             f"🎯 <b>Выберите тему для диалога</b>\n\n"
@@ -159,27 +137,11 @@ async def callback_settings(callback: CallbackQuery, user: User):
 
     elif action == "back":
         # Return to main settings menu
-        speed_names = {
-            "slow": "🐢 Медленная",
-            "normal": "🚶 Нормальная",
-            "fast": "🏃 Быстрая"
-        }
-
-        topic_names = {
-            "travel": "✈️ Путешествия",
-            "food": "🍜 Еда",
-            "work": "💼 Работа",
-            "daily": "🏠 Быт",
-            "study": "📚 Учёба",
-            "health": "🏥 Здоровье",
-            "free": "💬 Свободный диалог"
-        }
-
         await callback.message.edit_text(
             f"⚙️ <b>Настройки</b>\n\n"
             f"📊 Уровень HSK: <b>{user.hsk_level}</b>\n"
-            f"🔊 Скорость речи: {speed_names.get(user.speech_speed, 'Нормальная')}\n"
-            f"🎯 Тема: {topic_names.get(user.current_topic, 'Быт')}",
+            f"🔊 Скорость речи: {SPEED_NAMES.get(user.speech_speed, 'Нормальная')}\n"
+            f"🎯 Тема: {TOPIC_NAMES.get(user.current_topic, 'Быт')}",
             reply_markup=get_settings_keyboard(),
             parse_mode="HTML"
         )
@@ -191,12 +153,11 @@ async def callback_settings(callback: CallbackQuery, user: User):
 
 # Message-related callbacks (text, help, translate, explain)
 @router.callback_query(F.data.startswith("text:"))
-async def callback_text(callback: CallbackQuery, user: User):
+async def callback_text(callback: CallbackQuery, user: User, cb: ParsedCallback):
     """Show message text (Chinese + Pinyin)."""
-    message_id = int(callback.data.split(":")[1])
+    message_id = cb.as_int(1)
 
-    msg_repo = MessageRepository()
-    msg = await msg_repo.get(message_id)
+    msg = await msg_repo.load(message_id)
 
     if not msg:
         await callback.answer("Сообщение не найдено", show_alert=True)
@@ -212,70 +173,76 @@ async def callback_text(callback: CallbackQuery, user: User):
 
 
 @router.callback_query(F.data.startswith("help:"))
-async def callback_help(callback: CallbackQuery, user: User):
+async def callback_help(callback: CallbackQuery, user: User, cb: ParsedCallback):
     """Show help/suggestions for continuing dialogue."""
-    message_id = int(callback.data.split(":")[1])
+    message_id = cb.as_int(1)
 
-    msg_repo = MessageRepository()
-    msg = await msg_repo.get(message_id)
+    msg = await msg_repo.load(message_id)
 
     if not msg:
         await callback.answer("Сообщение не найдено", show_alert=True)
         return
 
-    # Generate suggestions based on the message
-    from bot.services.ai import generate_response
+    suggestions = msg.suggestions
+    if suggestions is None:
+        # Generate suggestions based on the message
+        from bot.services.ai import generate_response
 
-    # Get conversation history for context
-    history = await msg_repo.get_history(user.id, limit=10, topic=user.current_topic)
-    history_for_ai = [{"role": m.role, "content": m.content} for m in history]
+        # Get conversation history for context
+        history = await msg_repo.get_history(user.id, limit=10, topic=user.current_topic)
+        history_for_ai = ({"role": m.role, "content": m.content} for m in history)
 
-    await callback.answer("Генерирую подсказки...")
+        await callback.answer("Генерирую подсказки...")
 
-    # Ask for suggestions
-    try:
-        result = await generate_response(
-            user_message="请给我2-3个简单的回复建议",
-            history=history_for_ai,
-            topic=user.current_topic,
-            hsk_level=user.hsk_level
-        )
+        # Ask for suggestions
+        try:
+            result = await generate_response(
+                user_message="请给我2-3个简单的回复建议",
+                history=history_for_ai,
+                topic=user.current_topic,
+                hsk_level=user.hsk_level
+            )
+        except Exception:
+            await callback.message.reply(
+                "💬 <i>Попробуйте ответить на вопрос или продолжить тему диалога.</i>",
+                parse_mode="HTML"
+            )
+            return
 
         suggestions = result.get("suggestions", [])
         if suggestions:
-            text = "💬 <b>Варианты ответа:</b>\n\n"
-            for i, s in enumerate(suggestions[:3], 1):
-                # Handle both old format (string) and new format (dict with text and pinyin)
-                if isinstance(s, dict):
-                    chinese_text = s.get("text", "")
-                    pinyin = s.get("pinyin", "")
-                    if pinyin:
-                        text += f"<b>{i}.</b> {chinese_text} - {pinyin}\n"
-                    else:
-                        text += f"<b>{i}.</b> {chinese_text}\n"
+            await msg_repo.set_suggestions(message_id, suggestions)
+    else:
+        await callback.answer()
+
+    if suggestions:
+        text = "💬 <b>Варианты ответа:</b>\n\n"
+        for i, s in enumerate(suggestions[:3], 1):
+            # Handle both old format (string) and new format (dict with text and pinyin)
+            if isinstance(s, dict):
+                chinese_text = s.get("text", "")
+                pinyin = s.get("pinyin", "")
+                if pinyin:
+                    text += f"<b>{i}.</b> {chinese_text} - {pinyin}\n"
                 else:
-                    # Fallback for old string format
-                    text += f"<b>{i}.</b> {s}\n"
-            await callback.message.reply(text, parse_mode="HTML")
-        else:
-            await callback.message.reply(
-                "💬 <i>Попробуйте ответить на вопрос или задать свой.</i>",
-                parse_mode="HTML"
-            )
-    except Exception:
+                    text += f"<b>{i}.</b> {chinese_text}\n"
+            else:
+                # Fallback for old string format
+                text += f"<b>{i}.</b> {s}\n"
+        await callback.message.reply(text, parse_mode="HTML")
+    else:
         await callback.message.reply(
-            "💬 <i>Попробуйте ответить на вопрос или продолжить тему диалога.</i>",
+            "💬 <i>Попробуйте ответить на вопрос или задать свой.</i>",
             parse_mode="HTML"
         )
 
 
 @router.callback_query(F.data.startswith("translate:"))
-async def callback_translate(callback: CallbackQuery, user: User):
+async def callback_translate(callback: CallbackQuery, user: User, cb: ParsedCallback):
     """Show translation to Russian."""
-    message_id = int(callback.data.split(":")[1])
+    message_id = cb.as_int(1)
 
-    msg_repo = MessageRepository()
-    msg = await msg_repo.get(message_id)
+    msg = await msg_repo.load(message_id)
 
     if not msg:
         await callback.answer("Сообщение не найдено", show_alert=True)
@@ -288,21 +255,24 @@ async def callback_translate(callback: CallbackQuery, user: User):
         from bot.services.ai import get_word_info
         try:
             info = await get_word_info(msg.content)
-            text = f"🔄 <b>Перевод:</b>\n\n<i>{info.get('translation', 'Перевод недоступен')}</i>"
         except Exception:
             text = "🔄 <b>Перевод недоступен</b>"
+        else:
+            translation = info.get("translation")
+            if translation:
+                await msg_repo.set_translation(message_id, translation)
+            text = f"🔄 <b>Перевод:</b>\n\n<i>{translation or 'Перевод недоступен'}</i>"
 
     await callback.answer()
     await callback.message.reply(text, parse_mode="HTML")
 
 
 @router.callback_query(F.data.startswith("explain:"))
-async def callback_explain(callback: CallbackQuery, user: User):
+async def callback_explain(callback: CallbackQuery, user: User, cb: ParsedCallback):
     """Show detailed error explanation."""
-    message_id = int(callback.data.split(":")[1])
+    message_id = cb.as_int(1)
 
-    msg_repo = MessageRepository()
-    msg = await msg_repo.get(message_id)
+    msg = await msg_repo.load(message_id)
 
     if not msg or not msg.correction:
         await callback.answer("Нет исправлений для объяснения", show_alert=True)
@@ -313,7 +283,10 @@ async def callback_explain(callback: CallbackQuery, user: User):
     # Check if there's already an explanation
     explanation = correction.get("explanation", "")
 
-    if explanation and len(explanation) > 50:
+    if msg.explanation:
+        # Generated on an earlier click
+        text = f"💡 <b>Объяснение:</b>\n\n<i>{msg.explanation}</i>"
+    elif explanation and len(explanation) > 50:
         # Use existing explanation
         text = f"💡 <b>Объяснение:</b>\n\n<i>{explanation}</i>"
     else:
@@ -327,9 +300,12 @@ async def callback_explain(callback: CallbackQuery, user: User):
                 corrected=correction.get("corrected", ""),
                 hsk_level=user.hsk_level
             )
-            text = f"💡 <b>Объяснение:</b>\n\n<i>{detailed}</i>"
         except Exception:
             text = f"💡 <b>Объяснение:</b>\n\n<i>{explanation or 'Объяснение недоступно'}</i>"
+        else:
+            if detailed:
+                await msg_repo.set_explanation(message_id, detailed)
+            text = f"💡 <b>Объяснение:</b>\n\n<i>{detailed}</i>"
 
     await callback.answer()
     await callback.message.reply(text, parse_mode="HTML")
@@ -1,26 +1,34 @@
 """Dialog handler - processes voice and text messages."""
 
+import asyncio
 import io
 import logging
+import re
 from typing import Optional
 
 from aiogram import Router, F, Bot
-from aiogram.types import Message, BufferedInputFile
+from aiogram.types import Message
 
 from bot.config import settings
-from bot.database.models import User
-from bot.database.repositories import MessageRepository, DailyUsageRepository
+from bot.database.models import User, Message as StoredMessage
+from bot.database.repositories import msg_repo, usage_repo
 from bot.keyboards.inline import get_message_keyboard
-from bot.services.ai import transcribe, generate_response, synthesize
+from bot.services.ai import transcribe, generate_response, synthesize_stream
+from bot.services.response_cache import response_cache, response_key, voice_cache
+from bot.services.router import template_reply
+from bot.utils import StreamInputFile, spawn
 
 router = Router()
 logger = logging.getLogger(__name__)
 
 # Menu button texts to ignore
-MENU_BUTTONS = {"👤 Профиль", "⚙️ Настройки"}
+MENU_BUTTONS = frozenset(("👤 Профиль", "⚙️ Настройки"))
 
+# CJK Unified Ideographs, Extension A and Compatibility Ideographs
+_CJK_RE = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]")
 
-@router.message(F.voice)
+
+@router.message(F.voice, flags={"chat_action": "record_voice"})
 async def handle_voice(message: Message, user: User, bot: Bot):
     """Handle voice messages - full AI processing."""
     voice = message.voice
@@ -34,17 +42,19 @@ async def handle_voice(message: Message, user: User, bot: Bot):
         )
         return
     
-    # Show typing indicator
-    await bot.send_chat_action(chat_id=message.chat.id, action="record_voice")
+    # History does not depend on the transcript: fetch it while the audio
+    # is downloaded and transcribed
+    history_task = asyncio.create_task(
+        msg_repo.get_history(user.id, limit=10, topic=user.current_topic)
+    )
     
     try:
         # 1. Download audio
         file = await bot.get_file(voice.file_id)
-        audio_bytes = await bot.download_file(file.file_path)
-        audio_data = audio_bytes.read()
+        audio = await bot.download_file(file.file_path)
         
-        # 2. Transcribe with Whisper
-        chinese_text = await transcribe(audio_data)
+        # 2. Transcribe with Whisper (the BytesIO goes out as is, no copy)
+        chinese_text = await transcribe(audio)
         
         if not chinese_text.strip():
             await message.answer(
@@ -58,34 +68,33 @@ async def handle_voice(message: Message, user: User, bot: Bot):
             message=message,
             user=user,
             chinese_text=chinese_text,
-            is_voice=True
+            is_voice=True,
+            history=await history_task
         )
         
-        # Increment voice counter
-        usage_repo = DailyUsageRepository()
-        await usage_repo.increment_voice(user.id)
+        # Increment voice counter (single upsert, off the reply path)
+        spawn(usage_repo.increment_voice(user.id), name="increment_voice")
         
     except Exception as e:
-        logger.error(f"Voice processing error: {e}", exc_info=True)
+        logger.error("Voice processing error: %s", e, exc_info=True)
         await message.answer(
             "❌ Произошла ошибка при обработке голосового сообщения.\n"
             "Пожалуйста, попробуйте ещё раз."
         )
+    finally:
+        history_task.cancel()  # No-op once awaited; stops it on early exits
 
 
-@router.message(F.text)
+# Commands and menu buttons are filtered out at dispatch, so they never run
+# the user/subscription middlewares for this handler
+@router.message(
+    F.text, ~F.text.startswith("/"), ~F.text.in_(MENU_BUTTONS),
+    flags={"chat_action": "record_voice"}
+)
 async def handle_text(message: Message, user: User, bot: Bot):
     """Handle text messages - full AI processing."""
     text = message.text
     
-    # Skip if it's a command
-    if text.startswith("/"):
-        return
-    
-    # Skip menu buttons (handled by other handlers)
-    if text in MENU_BUTTONS:
-        return
-    
     # Check text length limit
     if len(text) > settings.MAX_TEXT_LENGTH:
         await message.answer(
@@ -95,8 +104,10 @@ async def handle_text(message: Message, user: User, bot: Bot):
         )
         return
     
-    # Show typing indicator
-    await bot.send_chat_action(chat_id=message.chat.id, action="record_voice")
+    # No hanzi at all: don't spend an LLM call on it
+    if not _CJK_RE.search(text):
+        await message.answer("🇨🇳 Отправьте текст на китайском языке.")
+        return
     
     try:
         # Process the text (assuming Chinese input)
@@ -107,12 +118,11 @@ async def handle_text(message: Message, user: User, bot: Bot):
             is_voice=False
         )
         
-        # Increment text counter
-        usage_repo = DailyUsageRepository()
-        await usage_repo.increment_text(user.id)
+        # Increment text counter (single upsert, off the reply path)
+        spawn(usage_repo.increment_text(user.id), name="increment_text")
         
     except Exception as e:
-        logger.error(f"Text processing error: {e}", exc_info=True)
+        logger.error("Text processing error: %s", e, exc_info=True)
         await message.answer(
             "❌ Произошла ошибка при обработке сообщения.\n"
             "Пожалуйста, попробуйте ещё раз."
@@ -123,7 +133,8 @@ async def process_chinese_message(
     message: Message,
     user: User,
     chinese_text: str,
-    is_voice: bool
+    is_voice: bool,
+    history: Optional[list[StoredMessage]] = None
 ) -> None:
     """
     Process Chinese text and send AI response.
@@ -133,38 +144,46 @@ async def process_chinese_message(
         user: User model
         chinese_text: Chinese text to process
         is_voice: Whether the original message was voice
+        history: Conversation history if already fetched by the caller
     """
-    msg_repo = MessageRepository()
-    
-    # Get conversation history
-    history = await msg_repo.get_history(user.id, limit=10, topic=user.current_topic)
     
-    # Convert to OpenAI format
-    history_for_ai = [
-        {"role": msg.role, "content": msg.content}
-        for msg in history
-    ]
-    
-    # 3. Generate AI response
-    ai_result = await generate_response(
-        user_message=chinese_text,
-        history=history_for_ai,
-        topic=user.current_topic,
-        hsk_level=user.hsk_level
-    )
-    
-    # 4. Save user message to DB
-    user_msg_id = await msg_repo.create(
-        user_id=user.id,
-        role="user",
-        content=chinese_text,
-        correction=ai_result.get("correction"),
-        topic=user.current_topic
+    # Repeated utterances reuse the earlier reply and its uploaded audio
+    cache_key = response_key(
+        user.current_topic, user.hsk_level, user.speech_speed, chinese_text
     )
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        ai_result, voice_file_id = cached
+    elif (template := template_reply(chinese_text, user.hsk_level)) is not None:
+        # Stock beginner phrase - answered without history or the LLM
+        ai_result, voice_file_id = template, None
+    else:
+        voice_file_id = None
+        
+        # Get conversation history
+        if history is None:
+            history = await msg_repo.get_history(user.id, limit=10, topic=user.current_topic)
+        
+        # Convert to OpenAI format (consumed once, by generate_response)
+        history_for_ai = (
+            {"role": msg.role, "content": msg.content}
+            for msg in history
+        )
+        
+        # 3. Generate AI response
+        ai_result = await generate_response(
+            user_message=chinese_text,
+            history=history_for_ai,
+            topic=user.current_topic,
+            hsk_level=user.hsk_level
+        )
     
-    # 5. If there's a correction, show it first
-    if ai_result.get("correction"):
-        correction = ai_result["correction"]
+    correction = ai_result.get("correction")
+    response_text = ai_result.get("response", "对不起，我不明白。")
+
+    # 4-5. Show the correction and save both turns concurrently; neither
+    # depends on the other's result
+    async def send_correction() -> None:
         correction_text = f"✏️ <b>Исправление:</b>\n\n"
         correction_text += f"<s>{correction.get('original', chinese_text)}</s>\n\n"
         correction_text += f"✅ <b>{correction.get('corrected', '')}</b>"
@@ -175,27 +194,53 @@ async def process_chinese_message(
         
         await message.answer(correction_text, parse_mode="HTML")
     
-    # 6. Synthesize response audio
-    response_text = ai_result.get("response", "对不起，我不明白。")
-    audio_bytes = await synthesize(response_text, speed=user.speech_speed)
-    
-    # 7. Save assistant message to DB
-    assistant_msg_id = await msg_repo.create(
-        user_id=user.id,
-        role="assistant",
-        content=response_text,
-        pinyin=ai_result.get("pinyin", ""),
-        translation=ai_result.get("translation", ""),
-        topic=user.current_topic
-    )
-    
-    # 8. Send voice message with inline keyboard (ONLY voice, no auto-text)
-    voice_file = BufferedInputFile(audio_bytes, filename="response.opus")
-    
-    has_correction = ai_result.get("correction") is not None
-    keyboard = get_message_keyboard(assistant_msg_id, has_correction=has_correction)
-    
-    await message.answer_voice(
-        voice=voice_file,
-        reply_markup=keyboard
-    )
+    save_turns = msg_repo.create_many([
+        StoredMessage(
+            user_id=user.id,
+            role="user",
+            content=chinese_text,
+            correction=correction,
+            topic=user.current_topic
+        ),
+        StoredMessage(
+            user_id=user.id,
+            role="assistant",
+            content=response_text,
+            pinyin=ai_result.get("pinyin", ""),
+            translation=ai_result.get("translation", ""),
+            topic=user.current_topic
+        ),
+    ])
+
+    # 6. Voice the reply: one voiced before at this speed is resent by
+    # file_id; anything else is synthesized from now on, overlapping the
+    # DB write and correction send, and uploaded as it is produced
+    voice_key = (response_text, user.speech_speed)
+    voice_file_id = voice_file_id or voice_cache.get(voice_key)
+    voice_file = voice_file_id or StreamInputFile(
+        synthesize_stream(response_text, speed=user.speech_speed),
+        filename="response.opus"
+    ).prefetch()
+    
+    pending = [save_turns]
+    if correction:
+        pending.append(send_correction())
+    try:
+        (_, assistant_msg_id), *_ = await asyncio.gather(*pending)
+        
+        # 7. Send voice message with inline keyboard (ONLY voice, no auto-text)
+        has_correction = correction is not None
+        keyboard = get_message_keyboard(assistant_msg_id, has_correction=has_correction)
+        
+        sent = await message.answer_voice(
+            voice=voice_file,
+            reply_markup=keyboard
+        )
+    except BaseException:
+        if isinstance(voice_file, StreamInputFile):
+            voice_file.cancel()
+        raise
+    if sent.voice:
+        voice_cache.set(voice_key, sent.voice.file_id)
+        if cached is None:
+            response_cache.set(cache_key, (ai_result, sent.voice.file_id))
@@ -1,7 +1,5 @@
 """Premium subscription handler."""
 
-from datetime import datetime, timedelta
-
 from aiogram import Router
 from aiogram.filters import Command
 from aiogram.types import Message
@@ -9,10 +7,46 @@ from aiogram.types import Message
 from bot.config import settings
 from bot.database.models import User
 from bot.keyboards.inline import get_premium_keyboard, get_profile_subscription_keyboard
-from bot.middlewares.subscription import get_subscription_status, SubscriptionType
+from bot.middlewares.subscription import (
+    get_subscription_status, get_trial_end, SubscriptionType
+)
+from bot.utils import days_until
 
 router = Router()
 
+_PREMIUM_PRICE_RUB = settings.PREMIUM_PRICE // 100  # PREMIUM_PRICE is in kopecks
+
+_PREMIUM_TMPL = (
+    "💎 <b>Premium активен!</b>\n\n"
+    "Осталось дней: <b>{days_left}</b>\n"
+    "Активен до: {until}\n\n"
+    "✅ Безлимитные голосовые сообщения\n"
+    "✅ Безлимитные текстовые сообщения\n"
+    "✅ Приоритетная поддержка"
+)
+
+_TRIAL_TMPL = (
+    "🎁 <b>Триал активен!</b>\n\n"
+    "Осталось дней: <b>{days_left}</b>\n"
+    "Триал заканчивается: {until}\n\n"
+    "После окончания триала:\n"
+    "• 20 текстовых сообщений/день\n"
+    "• 5 голосовых сообщений/день\n\n"
+    "💎 <b>Premium — ₽{price}/мес</b>\n"
+    "Безлимитный доступ ко всем функциям!"
+)
+
+_FREE_TMPL = (
+    "📊 <b>Free версия</b>\n\n"
+    "Ваши текущие лимиты:\n"
+    "• {text_limit} текстовых сообщений/день\n"
+    "• {voice_limit} голосовых сообщений/день\n\n"
+    "💎 <b>Premium — ₽{price}/мес</b>\n\n"
+    "✅ Безлимитные голосовые сообщения\n"
+    "✅ Безлимитные текстовые сообщения\n"
+    "✅ Приоритетная поддержка"
+)
+
 
 @router.message(Command("premium"))
 async def cmd_premium(message: Message, user: User):
@@ -20,14 +54,10 @@ async def cmd_premium(message: Message, user: User):
     status = get_subscription_status(user)
     
     if status == SubscriptionType.PREMIUM:
-        days_left = (user.premium_until - datetime.utcnow()).days
-        text = (
-            f"💎 <b>Premium активен!</b>\n\n"
-            f"Осталось дней: <b>{days_left}</b>\n"
-            f"Активен до: {user.premium_until.strftime('%d.%m.%Y')}\n\n"
-            f"✅ Безлимитные голосовые сообщения\n"
-            f"✅ Безлимитные текстовые сообщения\n"
-            f"✅ Приоритетная поддержка"
+        days_left = days_until(user.premium_until)
+        text = _PREMIUM_TMPL.format(
+            days_left=days_left,
+            until=user.premium_until.strftime('%d.%m.%Y'),
         )
         await message.answer(
             text,
@@ -36,17 +66,12 @@ async def cmd_premium(message: Message, user: User):
         )
     
     elif status == SubscriptionType.TRIAL:
-        trial_end = user.created_at + timedelta(days=settings.TRIAL_DAYS)
-        days_left = (trial_end - datetime.utcnow()).days
-        text = (
-            f"🎁 <b>Триал активен!</b>\n\n"
-            f"Осталось дней: <b>{days_left}</b>\n"
-            f"Триал заканчивается: {trial_end.strftime('%d.%m.%Y')}\n\n"
-            f"После окончания триала:\n"
-            f"• 20 текстовых сообщений/день\n"
-            f"• 5 голосовых сообщений/день\n\n"
-            f"💎 <b>Premium — ₽{settings.PREMIUM_PRICE // 100}/мес</b>\n"
-            f"Безлимитный доступ ко всем функциям!"
+        trial_end = get_trial_end(user)
+        days_left = days_until(trial_end)
+        text = _TRIAL_TMPL.format(
+            days_left=days_left,
+            until=trial_end.strftime('%d.%m.%Y'),
+            price=_PREMIUM_PRICE_RUB,
         )
         await message.answer(
             text, 
@@ -55,15 +80,10 @@ async def cmd_premium(message: Message, user: User):
         )
     
     else:  # FREE
-        text = (
-            f"📊 <b>Free версия</b>\n\n"
-            f"Ваши текущие лимиты:\n"
-            f"• {settings.FREE_TEXT_LIMIT} текстовых сообщений/день\n"
-            f"• {settings.FREE_VOICE_LIMIT} голосовых сообщений/день\n\n"
-            f"💎 <b>Premium — ₽{settings.PREMIUM_PRICE // 100}/мес</b>\n\n"
-            f"✅ Безлимитные голосовые сообщения\n"
-            f"✅ Безлимитные текстовые сообщения\n"
-            f"✅ Приоритетная поддержка"
+        text = _FREE_TMPL.format(
+            text_limit=settings.FREE_TEXT_LIMIT,
+            voice_limit=settings.FREE_VOICE_LIMIT,
+            price=_PREMIUM_PRICE_RUB,
         )
         await message.answer(
             text, 
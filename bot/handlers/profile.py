@@ -1,15 +1,17 @@
 """Profile handler."""
 
-from datetime import datetime, timedelta
-
 from aiogram import Router, F
 from aiogram.types import Message
 
 from bot.config import settings
 from bot.database.models import User
-from bot.database.repositories import MessageRepository, DailyUsageRepository
+from bot.database.repositories import usage_repo
+from bot.handlers.settings import SPEED_NAMES, TOPIC_NAMES
 from bot.keyboards.inline import get_profile_subscription_keyboard
-from bot.middlewares.subscription import get_subscription_status, SubscriptionType
+from bot.middlewares.subscription import (
+    get_subscription_status, get_trial_end, SubscriptionType
+)
+from bot.utils import days_until
 
 router = Router()
 
@@ -22,17 +24,16 @@ async def btn_profile(message: Message, user: User):
 
     # Format subscription info
     if status == SubscriptionType.PREMIUM:
-        days_left = (user.premium_until - datetime.utcnow()).days
+        days_left = days_until(user.premium_until)
         sub_text = f"💎 Premium (осталось {days_left} дн.)"
     elif status == SubscriptionType.TRIAL:
-        trial_end = user.created_at + timedelta(days=settings.TRIAL_DAYS)
-        days_left = (trial_end - datetime.utcnow()).days
+        trial_end = get_trial_end(user)
+        days_left = days_until(trial_end)
         sub_text = f"🎁 Триал (осталось {days_left} дн.)"
     else:
         sub_text = "📊 Free"
 
     # Get usage for today
-    usage_repo = DailyUsageRepository()
     usage = await usage_repo.get_or_create(user.id)
 
     # Format limits for free users
@@ -44,21 +45,6 @@ async def btn_profile(message: Message, user: User):
             f"• Голос: {usage.voice_count}/{settings.FREE_VOICE_LIMIT}"
         )
 
-    topic_names = {
-        "travel": "✈️ Путешествия",
-        "food": "🍜 Еда",
-        "work": "💼 Работа",
-        "daily": "🏠 Быт",
-        "study": "📚 Учёба",
-        "health": "🏥 Здоровье"
-    }
-
-    speed_names = {
-        "slow": "🐢 Медленная",
-        "normal": "🚶 Нормальная",
-        "fast": "🏃 Быстрая"
-    }
-
     # Get subscription keyboard based on premium status
     has_premium = status == SubscriptionType.PREMIUM
     keyboard = get_profile_subscription_keyboard(has_premium)
@@ -72,8 +58,8 @@ async def btn_profile(message: Message, user: User):
         f"<b>Регистрация:</b> {user.created_at.strftime('%d.%m.%Y')}\n\n"
         f"<b>Настройки:</b>\n"
         f"• Уровень: HSK {user.hsk_level}\n"
-        f"• Тема: {topic_names.get(user.current_topic, 'Быт')}\n"
-        f"• Скорость: {speed_names.get(user.speech_speed, 'Нормальная')}"
+        f"• Тема: {TOPIC_NAMES.get(user.current_topic, 'Быт')}\n"
+        f"• Скорость: {SPEED_NAMES.get(user.speech_speed, 'Нормальная')}"
         f"{limits_text}",
         reply_markup=keyboard,
         parse_mode="HTML"
@@ -5,7 +5,7 @@ from aiogram.filters import Command
 from aiogram.types import Message
 
 from bot.database.models import User
-from bot.database.repositories import ReferralRepository, PaymentRepository
+from bot.database.repositories import referral_repo
 
 router = Router()
 
@@ -14,7 +14,6 @@ router = Router()
 async def cmd_invite(message: Message, user: User):
     """Handle /invite command - show referral info."""
     # Get referral stats
-    referral_repo = ReferralRepository()
     total_refs, subscribed_refs = await referral_repo.count_by_referrer(user.id)
     
     # Calculate bonus days earned
@@ -1,5 +1,7 @@
 """Settings handler."""
 
+from types import MappingProxyType
+
 from aiogram import Router, F
 from aiogram.filters import Command
 from aiogram.types import Message
@@ -10,6 +12,37 @@ from bot.keyboards.reply import get_main_keyboard
 
 router = Router()
 
+SPEED_NAMES = MappingProxyType({
+    "slow": "🐢 Медленная",
+    "normal": "🚶 Нормальная",
+    "fast": "🏃 Быстрая"
+})
+
+TOPIC_NAMES = MappingProxyType({
+    "travel": "✈️ Путешествия",
+    "food": "🍜 Еда",
+    "work": "💼 Работа",
+    "daily": "🏠 Быт",
+    "study": "📚 Учёба",
+    "health": "🏥 Здоровье",
+    "free": "💬 Свободный диалог"
+})
+
+_LEVEL_TMPL = (
+    "📊 <b>Выберите уровень HSK</b>\n\n"
+    "Текущий уровень: <b>HSK {hsk_level}</b>\n\n"
+    "• <b>HSK 1</b> — ~150 слов, базовая грамматика\n"
+    "• <b>HSK 2</b> — ~300 слов, простые конструкции\n"
+    "• <b>HSK 3</b> — ~600 слов, средний уровень"
+)
+
+_SETTINGS_TMPL = (
+    "⚙️ <b>Настройки</b>\n\n"
+    "📊 Уровень HSK: <b>{hsk_level}</b>\n"
+    "🔊 Скорость речи: {speed_name}\n"
+    "🎯 Тема: {topic_name}"
+)
+
 
 @router.message(Command("settings"))
 async def cmd_settings(message: Message, user: User):
@@ -29,11 +62,7 @@ async def cmd_level(message: Message, user: User):
     from bot.keyboards.inline import get_level_keyboard
 
     await message.answer(
-        f"📊 <b>Выберите уровень HSK</b>\n\n"
-        f"Текущий уровень: <b>HSK {user.hsk_level}</b>\n\n"
-        f"• <b>HSK 1</b> — ~150 слов, базовая грамматика\n"
-        f"• <b>HSK 2</b> — ~300 слов, простые конструкции\n"
-        f"• <b>HSK 3</b> — ~600 слов, средний уровень",
+        _LEVEL_TMPL.format(hsk_level=user.hsk_level),
         reply_markup=get_level_keyboard(user.hsk_level),
         parse_mode="HTML"
     )
@@ -41,27 +70,12 @@ async def cmd_level(message: Message, user: User):
 
 async def show_settings(message: Message, user: User):
     """Show settings menu."""
-    speed_names = {
-        "slow": "🐢 Медленная",
-        "normal": "🚶 Нормальная",
-        "fast": "🏃 Быстрая"
-    }
-
-    topic_names = {
-        "travel": "✈️ Путешествия",
-        "food": "🍜 Еда",
-        "work": "💼 Работа",
-        "daily": "🏠 Быт",
-        "study": "📚 Учёба",
-        "health": "🏥 Здоровье",
-        "free": "💬 Свободный диалог"
-    }
-
     await message.answer(
-        f"⚙️ <b>Настройки</b>\n\n"
-        f"📊 Уровень HSK: <b>{user.hsk_level}</b>\n"
-        f"🔊 Скорость речи: {speed_names.get(user.speech_speed, 'Нормальная')}\n"
-        f"🎯 Тема: {topic_names.get(user.current_topic, 'Быт')}",
+        _SETTINGS_TMPL.format(
+            hsk_level=user.hsk_level,
+            speed_name=SPEED_NAMES.get(user.speech_speed, "Нормальная"),
+            topic_name=TOPIC_NAMES.get(user.current_topic, "Быт"),
+        ),
         reply_markup=get_settings_keyboard(),
         parse_mode="HTML"
     )
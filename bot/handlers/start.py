@@ -1,73 +1,23 @@
 """Start command handler with onboarding."""
 
-from aiogram import Router, F
+import asyncio
+
+from aiogram import Bot, Router, F
 from aiogram.filters import Command, CommandStart, CommandObject
 from aiogram.types import Message
 
 from bot.database.models import User
-from bot.database.repositories import UserRepository, ReferralRepository
+from bot.database.repositories import user_repo, referral_repo
+from bot.handlers.settings import SPEED_NAMES, TOPIC_NAMES
 from bot.keyboards.reply import get_main_keyboard
+from bot.utils import spawn
 
 router = Router()
 
+# Static screens; only the welcome settings block varies per user
+_WELCOME_TMPL = """🎉 <b>Добро пожаловать в SpeakyChinese!</b>
 
-@router.message(CommandStart(deep_link=True))
-async def cmd_start_with_referral(
-    message: Message, 
-    command: CommandObject,
-    user: User
-):
-    """Handle /start with referral deep link (e.g., /start ref_abc123)."""
-    referral_code = command.args
-    
-    # Check if it's a referral link
-    if referral_code and referral_code.startswith("ref_"):
-        code = referral_code[4:]  # Remove "ref_" prefix
-        
-        user_repo = UserRepository()
-        referrer = await user_repo.get_by_referral_code(code)
-        
-        if referrer and referrer.id != user.id:
-            # Check if this is a new user (created just now by middleware)
-            # We can check if user has no referrer yet
-            if not user.referrer_id:
-                # Update user's referrer
-                await user_repo.update(user.id, referrer_id=referrer.id)
-                
-                # Create referral record
-                referral_repo = ReferralRepository()
-                created = await referral_repo.create(referrer.id, user.id)
-                
-                if created:
-                    # Give bonus days to both users (+7 days each)
-                    await user_repo.add_premium_days(referrer.id, 7)
-                    await user_repo.add_premium_days(user.id, 7)
-                    
-                    # Notify referrer
-                    try:
-                        await message.bot.send_message(
-                            referrer.id,
-                            f"🎉 Ваш друг {user.first_name} зарегистрировался по вашей ссылке!\n"
-                            f"Вам начислено +7 дней Premium"
-                        )
-                    except Exception:
-                        pass  # Referrer might have blocked the bot
-    
-    # Show welcome message
-    await show_welcome(message, user)
-
-
-@router.message(CommandStart())
-async def cmd_start(message: Message, user: User):
-    """Handle /start command."""
-    await show_welcome(message, user)
-
-
-async def show_welcome(message: Message, user: User):
-    """Show welcome/onboarding message."""
-    welcome_text = f"""🎉 <b>Добро пожаловать в SpeakyChinese!</b>
-
-Привет, <b>{user.first_name}</b>! Я помогу тебе практиковать разговорный китайский язык.
+Привет, <b>{first_name}</b>! Я помогу тебе практиковать разговорный китайский язык.
 
 <b>🎁 У тебя 3 дня бесплатного Premium!</b>
 <i>Полный доступ ко всем функциям</i>
@@ -86,23 +36,13 @@ async def show_welcome(message: Message, user: User):
 • <code>/help</code> — справка
 
 <b>Текущие настройки:</b>
-📊 Уровень: <b>HSK {user.hsk_level}</b>
-🎯 Тема: {_get_topic_name(user.current_topic)}
-🔊 Скорость: {_get_speed_name(user.speech_speed)}
+📊 Уровень: <b>HSK {hsk_level}</b>
+🎯 Тема: {topic_name}
+🔊 Скорость: {speed_name}
 
 <b>Начни говорить! 🎤</b>"""
-    
-    await message.answer(
-        welcome_text,
-        reply_markup=get_main_keyboard(),
-        parse_mode="HTML"
-    )
 
-
-@router.message(Command("help"))
-async def cmd_help(message: Message, user: User):
-    """Handle /help command."""
-    help_text = """📚 <b>Справка по SpeakyChinese</b>
+_HELP_TEXT = """📚 <b>Справка по SpeakyChinese</b>
 
 <b>Основные функции:</b>
 • Отправляй голосовые сообщения на китайском
@@ -134,28 +74,92 @@ async def cmd_help(message: Message, user: User):
 • 5 голосовых сообщений/день
 
 💎 <b>Premium</b> — безлимитный доступ!"""
+
+@router.message(CommandStart(deep_link=True))
+async def cmd_start_with_referral(
+    message: Message, 
+    command: CommandObject,
+    user: User
+):
+    """Handle /start with referral deep link (e.g., /start ref_abc123)."""
+    referral_code = command.args
+    
+    # Check if it's a referral link
+    if referral_code and referral_code.startswith("ref_"):
+        code = referral_code[4:]  # Remove "ref_" prefix
+        
+        referrer = await user_repo.get_by_referral_code(code)
+        
+        # Check if this is a new user (created just now by middleware):
+        # we can check if user has no referrer yet
+        if referrer and referrer.id != user.id and not user.referrer_id:
+            # Bonuses and the referrer's notification don't gate the welcome
+            spawn(_register_referral(message.bot, referrer, user), name="register_referral")
     
-    await message.answer(help_text, parse_mode="HTML")
+    # Show welcome message
+    await show_welcome(message, user)
+
+
+@router.message(CommandStart())
+async def cmd_start(message: Message, user: User):
+    """Handle /start command."""
+    await show_welcome(message, user)
+
+
+async def _register_referral(bot: Bot, referrer: User, user: User) -> None:
+    """Link user to referrer and grant both users the registration bonus."""
+    # Update user's referrer
+    await user_repo.update(user.id, referrer_id=referrer.id)
+    
+    # Create referral record
+    created = await referral_repo.create(referrer.id, user.id)
+    if not created:
+        return
+    
+    # Give bonus days to both users (+7 days each)
+    await asyncio.gather(
+        user_repo.add_premium_days(referrer.id, 7),
+        user_repo.add_premium_days(user.id, 7),
+    )
+    
+    # Notify referrer
+    try:
+        await bot.send_message(
+            referrer.id,
+            f"🎉 Ваш друг {user.first_name} зарегистрировался по вашей ссылке!\n"
+            f"Вам начислено +7 дней Premium"
+        )
+    except Exception:
+        pass  # Referrer might have blocked the bot
+
+
+async def show_welcome(message: Message, user: User):
+    """Show welcome/onboarding message."""
+    welcome_text = _WELCOME_TMPL.format(
+        first_name=user.first_name,
+        hsk_level=user.hsk_level,
+        topic_name=_get_topic_name(user.current_topic),
+        speed_name=_get_speed_name(user.speech_speed),
+    )
+    
+    await message.answer(
+        welcome_text,
+        reply_markup=get_main_keyboard(),
+        parse_mode="HTML"
+    )
+
+
+@router.message(Command("help"))
+async def cmd_help(message: Message, user: User):
+    """Handle /help command."""
+    await message.answer(_HELP_TEXT, parse_mode="HTML")
 
 
 def _get_topic_name(topic: str) -> str:
     """Get Russian topic name."""
-    topics = {
-        "travel": "✈️ Путешествия",
-        "food": "🍜 Еда",
-        "work": "💼 Работа",
-        "daily": "🏠 Быт",
-        "study": "📚 Учёба",
-        "health": "🏥 Здоровье"
-    }
-    return topics.get(topic, "🏠 Быт")
+    return TOPIC_NAMES.get(topic, "🏠 Быт")
 
 
 def _get_speed_name(speed: str) -> str:
     """Get Russian speed name."""
-    speeds = {
-        "slow": "🐢 Медленная",
-        "normal": "🚶 Нормальная",
-        "fast": "🏃 Быстрая"
-    }
-    return speeds.get(speed, "🚶 Нормальная")
+    return SPEED_NAMES.get(speed, "🚶 Нормальная")
@@ -1,5 +1,7 @@
 """Topic selection handler."""
 
+from types import MappingProxyType
+
 from aiogram import Router
 from aiogram.filters import Command
 from aiogram.types import Message
@@ -10,7 +12,7 @@ from bot.keyboards.inline import get_topic_keyboard
 router = Router()
 
 
-TOPICS = {
+TOPICS = MappingProxyType({
     "travel": "✈️ Путешествия (旅游)",
     "food": "🍜 Еда (美食)",
     "work": "💼 Работа (工作)",
@@ -18,18 +20,20 @@ TOPICS = {
     "study": "📚 Учёба (学习)",
     "health": "🏥 Здоровье (健康)",
     "free": "💬 Свободный диалог (自由对话)"
-}
+})
+
+_TOPIC_TMPL = (
+    "🎯 <b>Выберите тему для диалога</b>\n\n"
+    "Текущая тема: <b>{topic_name}</b>\n\n"
+    "<i>Выбранная тема влияет на контекст и словарный запас в диалогах.</i>"
+)
 
 
 @router.message(Command("topic"))
 async def cmd_topic(message: Message, user: User):
     """Handle /topic command."""
-    current_topic_name = TOPICS.get(user.current_topic, "🏠 Быт")
-
     await message.answer(
-        f"🎯 <b>Выберите тему для диалога</b>\n\n"
-        f"Текущая тема: <b>{current_topic_name}</b>\n\n"
-        f"<i>Выбранная тема влияет на контекст и словарный запас в диалогах.</i>",
+        _TOPIC_TMPL.format(topic_name=TOPICS.get(user.current_topic, "🏠 Быт")),
         reply_markup=get_topic_keyboard(user.current_topic),
         parse_mode="HTML"
     )
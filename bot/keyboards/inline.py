@@ -1,31 +1,58 @@
-"""Inline keyboards."""
+"""Inline keyboards.
+
+Keyboards that depend only on a small fixed key (none, the current
+selection, premium status) are built once and the same markup is reused;
+callers must not mutate the returned objects.
+"""
+
+from functools import cache, lru_cache
+from typing import Final, Optional
 
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
+from bot.config import settings
 
-def get_message_keyboard(message_id: int, has_correction: bool = False) -> InlineKeyboardMarkup:
-    """Get inline keyboard for bot response message."""
-    builder = InlineKeyboardBuilder()
+# Navigation labels shared by several keyboards
+_BACK_TEXT: Final = "◀️ Назад"
+_CANCEL_TEXT: Final = "◀️ Отмена"
+_PREV_TEXT: Final = "◀️"
+_NEXT_TEXT: Final = "▶️"
 
-    builder.row(
-        InlineKeyboardButton(
-            text="📝 Текст", callback_data=f"text:{message_id}"),
-        InlineKeyboardButton(
-            text="❓ Помощь", callback_data=f"help:{message_id}"),
-        InlineKeyboardButton(
-            text="🔄 Перевод", callback_data=f"translate:{message_id}")
-    )
+# Tribute payment link; empty when Tribute is not configured
+_TRIBUTE_LINK: Final = settings.TRIBUTE_PAYMENT_LINK
 
-    if has_correction:
-        builder.row(
-            InlineKeyboardButton(text="💡 Объяснить",
-                                 callback_data=f"explain:{message_id}")
-        )
 
-    return builder.as_markup()
+# Prototype buttons for the reply keyboard, paired with their callback
+# action; get_message_keyboard() copies them with the message ID filled in
+_MESSAGE_ROWS = (
+    tuple(
+        (InlineKeyboardButton(text=text, callback_data=f"{action}:0"), action)
+        for text, action in (("📝 Текст", "text"), ("❓ Помощь", "help"), ("🔄 Перевод", "translate"))
+    ),
+)
+_CORRECTION_ROWS = _MESSAGE_ROWS + (
+    ((InlineKeyboardButton(text="💡 Объяснить", callback_data="explain:0"), "explain"),),
+)
 
 
+def get_message_keyboard(message_id: int, has_correction: bool = False) -> InlineKeyboardMarkup:
+    """Get inline keyboard for bot response message.
+
+    Sent with every dialog reply: copying validated prototypes is several
+    times cheaper than building the buttons through InlineKeyboardBuilder.
+    """
+    rows = _CORRECTION_ROWS if has_correction else _MESSAGE_ROWS
+    return InlineKeyboardMarkup.model_construct(inline_keyboard=[
+        [
+            button.model_copy(update={"callback_data": f"{action}:{message_id}"})
+            for button, action in row
+        ]
+        for row in rows
+    ])
+
+
+@lru_cache(maxsize=16)  # Keyed by values from callback_data
 def get_topic_keyboard(current_topic: str) -> InlineKeyboardMarkup:
     """Get topic selection keyboard."""
     topics = [
@@ -51,12 +78,13 @@ def get_topic_keyboard(current_topic: str) -> InlineKeyboardMarkup:
 
     # Add back button
     builder.row(
-        InlineKeyboardButton(text="◀️ Назад", callback_data="settings:back")
+        InlineKeyboardButton(text=_BACK_TEXT, callback_data="settings:back")
     )
 
     return builder.as_markup()
 
 
+@lru_cache(maxsize=16)  # Keyed by values from callback_data
 def get_level_keyboard(current_level: int) -> InlineKeyboardMarkup:
     """Get HSK level selection keyboard."""
     builder = InlineKeyboardBuilder()
@@ -72,12 +100,13 @@ def get_level_keyboard(current_level: int) -> InlineKeyboardMarkup:
 
     # Add back button
     builder.row(
-        InlineKeyboardButton(text="◀️ Назад", callback_data="settings:back")
+        InlineKeyboardButton(text=_BACK_TEXT, callback_data="settings:back")
     )
 
     return builder.as_markup()
 
 
+@lru_cache(maxsize=16)  # Keyed by values from callback_data
 def get_speed_keyboard(current_speed: str) -> InlineKeyboardMarkup:
     """Get speech speed selection keyboard."""
     speeds = [
@@ -99,12 +128,13 @@ def get_speed_keyboard(current_speed: str) -> InlineKeyboardMarkup:
 
     # Add back button
     builder.row(
-        InlineKeyboardButton(text="◀️ Назад", callback_data="settings:back")
+        InlineKeyboardButton(text=_BACK_TEXT, callback_data="settings:back")
     )
 
     return builder.as_markup()
 
 
+@cache
 def get_settings_keyboard() -> InlineKeyboardMarkup:
     """Get settings menu keyboard."""
     builder = InlineKeyboardBuilder()
@@ -129,18 +159,17 @@ def get_settings_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@cache
 def get_premium_keyboard() -> InlineKeyboardMarkup:
     """Get premium purchase keyboard."""
-    from bot.config import settings
-
     builder = InlineKeyboardBuilder()
 
     # If Tribute is configured, show payment link
-    if settings.TRIBUTE_PAYMENT_LINK:
+    if _TRIBUTE_LINK:
         builder.row(
             InlineKeyboardButton(
                 text="💎 Купить Premium — ₽770/мес",
-                url=settings.TRIBUTE_PAYMENT_LINK
+                url=_TRIBUTE_LINK
             )
         )
     else:
@@ -155,6 +184,7 @@ def get_premium_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@cache
 def get_profile_subscription_keyboard(has_premium: bool) -> InlineKeyboardMarkup:
     """Get subscription button for profile based on premium status.
 
@@ -164,16 +194,14 @@ def get_profile_subscription_keyboard(has_premium: bool) -> InlineKeyboardMarkup
     Returns:
         Keyboard with "Управление подпиской" or "Купить подписку Premium" button
     """
-    from bot.config import settings
-
     builder = InlineKeyboardBuilder()
 
-    if settings.TRIBUTE_PAYMENT_LINK:
+    if _TRIBUTE_LINK:
         button_text = "💎 Управление подпиской" if has_premium else "💎 Купить подписку Premium"
         builder.row(
             InlineKeyboardButton(
                 text=button_text,
-                url=settings.TRIBUTE_PAYMENT_LINK
+                url=_TRIBUTE_LINK
             )
         )
     else:
@@ -201,7 +229,7 @@ def get_pagination_keyboard(
     if page > 1:
         buttons.append(
             InlineKeyboardButton(
-                text="◀️", callback_data=f"{callback_prefix}:{page - 1}")
+                text=_PREV_TEXT, callback_data=f"{callback_prefix}:{page - 1}")
         )
 
     buttons.append(
@@ -212,7 +240,7 @@ def get_pagination_keyboard(
     if page < total_pages:
         buttons.append(
             InlineKeyboardButton(
-                text="▶️", callback_data=f"{callback_prefix}:{page + 1}")
+                text=_NEXT_TEXT, callback_data=f"{callback_prefix}:{page + 1}")
         )
 
     builder.row(*buttons)
@@ -221,6 +249,7 @@ def get_pagination_keyboard(
 
 
 # Admin keyboards
+@cache
 def get_admin_main_keyboard() -> InlineKeyboardMarkup:
     """Get admin panel main keyboard."""
     builder = InlineKeyboardBuilder()
@@ -262,7 +291,7 @@ def get_admin_user_keyboard(user_id: int, is_blocked: bool) -> InlineKeyboardMar
     builder.row(
         InlineKeyboardButton(
             text="📨 Написать", callback_data=f"admin:message:{user_id}"),
-        InlineKeyboardButton(text="◀️ Назад", callback_data="admin:back")
+        InlineKeyboardButton(text=_BACK_TEXT, callback_data="admin:back")
     )
 
     return builder.as_markup()
@@ -272,26 +301,25 @@ def get_admin_premium_days_keyboard(user_id: int) -> InlineKeyboardMarkup:
     """Get premium days selection keyboard."""
     builder = InlineKeyboardBuilder()
 
+    prefix = f"admin:premium_days:{user_id}"
+
     builder.row(
-        InlineKeyboardButton(
-            text="7 дней", callback_data=f"admin:premium_days:{user_id}:7"),
-        InlineKeyboardButton(
-            text="30 дней", callback_data=f"admin:premium_days:{user_id}:30"),
-        InlineKeyboardButton(
-            text="90 дней", callback_data=f"admin:premium_days:{user_id}:90")
+        InlineKeyboardButton(text="7 дней", callback_data=f"{prefix}:7"),
+        InlineKeyboardButton(text="30 дней", callback_data=f"{prefix}:30"),
+        InlineKeyboardButton(text="90 дней", callback_data=f"{prefix}:90")
     )
     builder.row(
-        InlineKeyboardButton(
-            text="♾️ Навсегда", callback_data=f"admin:premium_days:{user_id}:36500")
+        InlineKeyboardButton(text="♾️ Навсегда", callback_data=f"{prefix}:36500")
     )
     builder.row(
         InlineKeyboardButton(
-            text="◀️ Отмена", callback_data=f"admin:user:{user_id}")
+            text=_CANCEL_TEXT, callback_data=f"admin:user:{user_id}")
     )
 
     return builder.as_markup()
 
 
+@cache
 def get_admin_broadcast_keyboard() -> InlineKeyboardMarkup:
     """Get broadcast audience selection keyboard."""
     builder = InlineKeyboardBuilder()
@@ -303,13 +331,23 @@ def get_admin_broadcast_keyboard() -> InlineKeyboardMarkup:
     builder.row(InlineKeyboardButton(text="🆓 Только Free",
                 callback_data="admin:broadcast:free"))
     builder.row(InlineKeyboardButton(
-        text="◀️ Отмена", callback_data="admin:back"))
+        text=_CANCEL_TEXT, callback_data="admin:back"))
 
     return builder.as_markup()
 
 
-def get_admin_users_keyboard(page: int, total_pages: int, premium_only: bool) -> InlineKeyboardMarkup:
-    """Get admin users list keyboard with pagination."""
+def get_admin_users_keyboard(
+    page: int,
+    total_pages: int,
+    premium_only: bool,
+    prev_cursor: Optional[int] = None,
+    next_cursor: Optional[int] = None
+) -> InlineKeyboardMarkup:
+    """Get admin users list keyboard with keyset pagination.
+
+    Cursors are the IDs of the first/last user on the page; the arrows are
+    shown only when a cursor is given.
+    """
     builder = InlineKeyboardBuilder()
 
     prefix = "admin:users:premium" if premium_only else "admin:users:all"
@@ -321,21 +359,21 @@ def get_admin_users_keyboard(page: int, total_pages: int, premium_only: bool) ->
     # Toggle premium/all
     if premium_only:
         builder.row(InlineKeyboardButton(text="👥 Все пользователи",
-                    callback_data="admin:users:all:1"))
+                    callback_data="admin:users:all"))
     else:
         builder.row(InlineKeyboardButton(text="💎 Только Premium",
-                    callback_data="admin:users:premium:1"))
+                    callback_data="admin:users:premium"))
 
     # Pagination
     buttons = []
-    if page > 1:
+    if prev_cursor is not None:
         buttons.append(InlineKeyboardButton(
-            text="◀️", callback_data=f"{prefix}:{page - 1}"))
+            text=_PREV_TEXT, callback_data=f"{prefix}:{page - 1}:p:{prev_cursor}"))
     buttons.append(InlineKeyboardButton(
         text=f"{page}/{total_pages}", callback_data="noop"))
-    if page < total_pages:
+    if next_cursor is not None:
         buttons.append(InlineKeyboardButton(
-            text="▶️", callback_data=f"{prefix}:{page + 1}"))
+            text=_NEXT_TEXT, callback_data=f"{prefix}:{page + 1}:n:{next_cursor}"))
 
     if buttons:
         builder.row(*buttons)
@@ -1,8 +1,11 @@
 """Reply keyboards (bottom menu)."""
 
+from functools import cache
+
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
 
 
+@cache  # Same markup every time: build it once
 def get_main_keyboard() -> ReplyKeyboardMarkup:
     """Get main bottom menu keyboard."""
     keyboard = ReplyKeyboardMarkup(
@@ -10,9 +10,15 @@ from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 
 from bot.config import settings
-from bot.database import init_db
+from bot.database import init_db, close_db, last_active_flusher
 from bot.handlers import setup_routers
-from bot.middlewares import AuthMiddleware, SubscriptionMiddleware, ThrottlingMiddleware
+from bot.middlewares import (
+    CallbackDataMiddleware,
+    ChatActionMiddleware,
+    ThrottlingMiddleware,
+    UserContextMiddleware,
+)
+from bot.services.ai import client as openai_client
 
 
 # Configure logging
@@ -23,18 +29,21 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Set by Railway in every deployment; their presence means production
+_RAILWAY_KEYS = frozenset((
+    "RAILWAY_STATIC_URL",
+    "RAILWAY_ENVIRONMENT",
+    "RAILWAY_PROJECT_ID",
+    "RAILWAY_SERVICE_ID",
+))
+
 
 async def main():
     """Main function to start the bot."""
     logger.info("Starting SpeakyChinese bot...")
 
     # Prevent polling in Railway (webhook-only in production)
-    if (
-        os.environ.get("RAILWAY_STATIC_URL")
-        or os.environ.get("RAILWAY_ENVIRONMENT")
-        or os.environ.get("RAILWAY_PROJECT_ID")
-        or os.environ.get("RAILWAY_SERVICE_ID")
-    ):
+    if any(os.environ.get(key) for key in _RAILWAY_KEYS):
         logger.error(
             "Polling mode is disabled on Railway. Use railway_start.py (webhook mode)."
         )
@@ -43,6 +52,7 @@ async def main():
     # Initialize database
     logger.info("Initializing database...")
     await init_db()
+    last_active_flusher.start()
 
     # Create bot instance
     bot = Bot(
@@ -53,13 +63,13 @@ async def main():
     # Create dispatcher
     dp = Dispatcher()
 
-    # Register middlewares (order matters!)
-    dp.message.middleware(ThrottlingMiddleware(rate_limit=1.0))
-    dp.message.middleware(AuthMiddleware())
-    dp.message.middleware(SubscriptionMiddleware())
+    # Register middlewares (order matters!). Throttling and the user context
+    # run once per update, before routing; rate-limited updates skip filters
+    dp.update.outer_middleware(ThrottlingMiddleware(rate_limit=1.0, callback_rate_limit=0.5))
+    dp.update.outer_middleware(UserContextMiddleware())  # Auth + subscription limits
 
-    dp.callback_query.middleware(ThrottlingMiddleware(rate_limit=0.5))
-    dp.callback_query.middleware(AuthMiddleware())
+    dp.message.middleware(ChatActionMiddleware())  # Needs the matched handler's flags
+    dp.callback_query.middleware(CallbackDataMiddleware())
 
     # Register handlers
     router = setup_routers()
@@ -77,6 +87,9 @@ async def main():
     finally:
         checker_task.cancel()
         await bot.session.close()
+        await openai_client.close()
+        await last_active_flusher.stop()
+        await close_db()
 
 
 if __name__ == "__main__":
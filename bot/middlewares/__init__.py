@@ -1,11 +1,18 @@
 """Middlewares module."""
 
 from .auth import AuthMiddleware
+from .callback_data import CallbackDataMiddleware, ParsedCallback
+from .chat_action import ChatActionMiddleware
 from .subscription import SubscriptionMiddleware
 from .throttling import ThrottlingMiddleware
+from .user_ctx import UserContextMiddleware
 
 __all__ = [
     "AuthMiddleware",
+    "CallbackDataMiddleware",
+    "ChatActionMiddleware",
+    "ParsedCallback",
     "SubscriptionMiddleware",
     "ThrottlingMiddleware",
+    "UserContextMiddleware",
 ]
@@ -1,11 +1,51 @@
 """Authentication middleware - loads/creates user from DB."""
 
-from typing import Any, Awaitable, Callable, Dict
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
 
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject, Message, CallbackQuery
 
-from bot.database.repositories import UserRepository
+from bot.database.models import User
+from bot.database.repositories import user_repo
+
+
+async def load_user(event: TelegramObject) -> Optional[User]:
+    """Load (or create) the sender of `event`; None for events without one."""
+    user_tg = None
+    if isinstance(event, Message):
+        user_tg = event.from_user
+    elif isinstance(event, CallbackQuery):
+        user_tg = event.from_user
+    
+    if not user_tg:
+        return None
+    
+    # Load or create user
+    user = await user_repo.get_cached(user_tg.id)
+    
+    if not user:
+        # Create new user
+        return await user_repo.create(
+            user_id=user_tg.id,
+            username=user_tg.username,
+            first_name=user_tg.first_name or "User",
+            language_code=user_tg.language_code or "ru"
+        )
+    
+    # Update last active (and username if changed)
+    await user_repo.touch(user, user_tg.username)
+    
+    return user
+
+
+async def reject_blocked(event: TelegramObject, user: User) -> bool:
+    """Tell a blocked user so and return True; False for everyone else."""
+    if not user.is_blocked:
+        return False
+    if isinstance(event, Message):
+        await event.answer("⛔ Ваш аккаунт заблокирован.")
+    return True
 
 
 class AuthMiddleware(BaseMiddleware):
@@ -17,43 +57,16 @@ class AuthMiddleware(BaseMiddleware):
         event: TelegramObject,
         data: Dict[str, Any]
     ) -> Any:
-        # Get user from event
-        user_tg = None
-        if isinstance(event, Message):
-            user_tg = event.from_user
-        elif isinstance(event, CallbackQuery):
-            user_tg = event.from_user
-        
-        if not user_tg:
-            return await handler(event, data)
-        
-        # Load or create user
-        repo = UserRepository()
-        user = await repo.get(user_tg.id)
-        
+        user = await load_user(event)
         if not user:
-            # Create new user
-            user = await repo.create(
-                user_id=user_tg.id,
-                username=user_tg.username,
-                first_name=user_tg.first_name or "User",
-                language_code=user_tg.language_code or "ru"
-            )
-        else:
-            # Update last active
-            await repo.update_last_active(user_tg.id)
-            
-            # Update username if changed
-            if user.username != user_tg.username:
-                await repo.update(user_tg.id, username=user_tg.username)
+            return await handler(event, data)
         
         # Check if user is blocked
-        if user.is_blocked:
-            if isinstance(event, Message):
-                await event.answer("⛔ Ваш аккаунт заблокирован.")
+        if await reject_blocked(event, user):
             return None
         
-        # Add user to handler data
+        # Add user to handler data; `now` lets later middlewares share one clock read
         data["user"] = user
+        data["now"] = time.time()
         
         return await handler(event, data)
@@ -0,0 +1,37 @@
+"""Callback data middleware - parse callback_data once per update."""
+
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, CallbackQuery
+
+
+@dataclass(frozen=True, slots=True)
+class ParsedCallback:
+    """callback_data split on ':' (e.g. "admin:premium_days:42:30")."""
+
+    parts: tuple[str, ...]
+
+    def __getitem__(self, index: int) -> str:
+        return self.parts[index]
+
+    def __len__(self) -> int:
+        return len(self.parts)
+
+    def as_int(self, index: int) -> int:
+        return int(self.parts[index])
+
+
+class CallbackDataMiddleware(BaseMiddleware):
+    """Split callback_data once and pass it to handlers as ``cb``."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        if isinstance(event, CallbackQuery) and event.data:
+            data["cb"] = ParsedCallback(tuple(event.data.split(":")))
+        return await handler(event, data)
@@ -0,0 +1,36 @@
+"""Chat action middleware - show the handler's chat action while it runs."""
+
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import TelegramObject, Message
+from aiogram.utils.chat_action import ChatActionSender
+
+
+class ChatActionMiddleware(BaseMiddleware):
+    """Send the ``chat_action`` flag of the matched handler until it returns.
+
+    Register as an inner middleware: the flag belongs to the matched
+    handler. Telegram shows an action for about 5 s, so it is repeated every
+    ``interval`` seconds (4 by default) until the handler returns. Handlers
+    without the flag are left alone.
+    """
+
+    def __init__(self, interval: float = 4.0):
+        self.interval = interval
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        action = get_flag(data, "chat_action")
+        if action is None or not isinstance(event, Message):
+            return await handler(event, data)
+
+        async with ChatActionSender(
+            bot=data["bot"], chat_id=event.chat.id, action=action, interval=self.interval
+        ):
+            return await handler(event, data)
@@ -1,17 +1,33 @@
 """Subscription middleware - checks limits for free users."""
 
-from datetime import datetime, timedelta
+import time
+from datetime import datetime, timedelta, timezone
 from enum import Enum
-from typing import Any, Awaitable, Callable, Dict
+from typing import Any, Awaitable, Callable, Dict, Optional
 
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject, Message
 
 from bot.config import settings
 from bot.database.models import User
-from bot.database.repositories import DailyUsageRepository
+from bot.database.repositories import usage_repo
 from bot.keyboards.inline import get_premium_keyboard
 
+_TRIAL_PERIOD = timedelta(days=settings.TRIAL_DAYS)
+
+_FREE_VOICE_LIMIT = settings.FREE_VOICE_LIMIT
+_FREE_TEXT_LIMIT = settings.FREE_TEXT_LIMIT
+
+# Daily limit notices with the limit filled in; only {used} varies
+_LIMIT_TMPL = (
+    "📊 <b>Дневной лимит достигнут</b>\n\n"
+    "Вы использовали {{used}}/{limit} {kind} сегодня.\n"
+    "Лимит сбросится в 00:00 по МСК.\n\n"
+    "💎 Хотите безлимитный доступ?"
+)
+_VOICE_LIMIT_TMPL = _LIMIT_TMPL.format(limit=_FREE_VOICE_LIMIT, kind="голосовых сообщений")
+_TEXT_LIMIT_TMPL = _LIMIT_TMPL.format(limit=_FREE_TEXT_LIMIT, kind="текстовых сообщений")
+
 
 class SubscriptionType(Enum):
     """Subscription types."""
@@ -20,16 +36,51 @@ class SubscriptionType(Enum):
     PREMIUM = "premium"
 
 
-def get_subscription_status(user: User) -> SubscriptionType:
-    """Determine user's subscription status."""
-    now = datetime.utcnow()
+def get_trial_end(user: User) -> datetime:
+    """End of the user's trial, memoized on the (cached) user object."""
+    trial_end = user.__dict__.get("_trial_end")
+    if trial_end is None:
+        trial_end = user._trial_end = user.created_at + _TRIAL_PERIOD
+    return trial_end
+
+
+def _epoch(moment: datetime) -> float:
+    """UNIX timestamp of a naive UTC datetime."""
+    return moment.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _subscription_deadlines(user: User) -> tuple[float, float]:
+    """(premium_until, trial_end) as epoch seconds, memoized on the user object.
+
+    Cached users are replaced rather than mutated on writes, so the memo
+    never outlives the values it was computed from.
+    """
+    deadlines = user.__dict__.get("_deadlines")
+    if deadlines is None:
+        premium_until = user.premium_until
+        deadlines = user._deadlines = (
+            _epoch(premium_until) if premium_until is not None else 0.0,
+            _epoch(get_trial_end(user)),
+        )
+    return deadlines
+
+
+def get_subscription_status(
+    user: User, now: Optional[float] = None
+) -> SubscriptionType:
+    """Determine user's subscription status.
+
+    `now` is a time.time() timestamp, defaulting to the current time.
+    """
+    if now is None:
+        now = time.time()
+    premium_until, trial_end = _subscription_deadlines(user)
     
     # 1. Check Premium
-    if user.premium_until and user.premium_until > now:
+    if premium_until > now:
         return SubscriptionType.PREMIUM
     
     # 2. Check Trial (3 days from registration)
-    trial_end = user.created_at + timedelta(days=settings.TRIAL_DAYS)
     if now < trial_end:
         return SubscriptionType.TRIAL
     
@@ -37,6 +88,32 @@ def get_subscription_status(user: User) -> SubscriptionType:
     return SubscriptionType.FREE
 
 
+async def within_free_limits(event: Message, user: User) -> bool:
+    """Check a free user's daily limits; answers and returns False when used up."""
+    usage = await usage_repo.get_or_create(user.id)
+    
+    # Check if this is a voice or text message
+    if event.voice is not None:
+        if usage.voice_count >= _FREE_VOICE_LIMIT:
+            await event.answer(
+                _VOICE_LIMIT_TMPL.format(used=usage.voice_count),
+                reply_markup=get_premium_keyboard(),
+                parse_mode="HTML"
+            )
+            return False
+    elif event.text and not event.text.startswith("/"):
+        # Text message (not a command)
+        if usage.text_count >= _FREE_TEXT_LIMIT:
+            await event.answer(
+                _TEXT_LIMIT_TMPL.format(used=usage.text_count),
+                reply_markup=get_premium_keyboard(),
+                parse_mode="HTML"
+            )
+            return False
+    
+    return True
+
+
 class SubscriptionMiddleware(BaseMiddleware):
     """Middleware that checks subscription limits."""
     
@@ -54,45 +131,10 @@ class SubscriptionMiddleware(BaseMiddleware):
         if not user:
             return await handler(event, data)
         
-        # Get subscription status
-        status = get_subscription_status(user)
-        data["subscription_status"] = status
-        
-        # Trial and Premium - no limits
-        if status in (SubscriptionType.TRIAL, SubscriptionType.PREMIUM):
-            return await handler(event, data)
-        
-        # Free tier - check limits
-        usage_repo = DailyUsageRepository()
-        usage = await usage_repo.get_or_create(user.id)
-        
-        # Check if this is a voice or text message
-        is_voice = event.voice is not None
-        
-        if is_voice:
-            if usage.voice_count >= settings.FREE_VOICE_LIMIT:
-                await event.answer(
-                    f"📊 <b>Дневной лимит достигнут</b>\n\n"
-                    f"Вы использовали {usage.voice_count}/{settings.FREE_VOICE_LIMIT} "
-                    f"голосовых сообщений сегодня.\n"
-                    f"Лимит сбросится в 00:00 по МСК.\n\n"
-                    f"💎 Хотите безлимитный доступ?",
-                    reply_markup=get_premium_keyboard(),
-                    parse_mode="HTML"
-                )
-                return None
-        elif event.text and not event.text.startswith("/"):
-            # Text message (not a command)
-            if usage.text_count >= settings.FREE_TEXT_LIMIT:
-                await event.answer(
-                    f"📊 <b>Дневной лимит достигнут</b>\n\n"
-                    f"Вы использовали {usage.text_count}/{settings.FREE_TEXT_LIMIT} "
-                    f"текстовых сообщений сегодня.\n"
-                    f"Лимит сбросится в 00:00 по МСК.\n\n"
-                    f"💎 Хотите безлимитный доступ?",
-                    reply_markup=get_premium_keyboard(),
-                    parse_mode="HTML"
-                )
-                return None
+        # Free tier - check limits; Trial and Premium have none. Handlers
+        # that need the status call get_subscription_status() themselves
+        status = get_subscription_status(user, data.get("now"))
+        if status is SubscriptionType.FREE and not await within_free_limits(event, user):
+            return None
         
         return await handler(event, data)
@@ -1,18 +1,45 @@
 """Throttling middleware - rate limiting to prevent spam."""
 
 import time
-from typing import Any, Awaitable, Callable, Dict
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Dict, Optional
 
 from aiogram import BaseMiddleware
-from aiogram.types import TelegramObject, Message, CallbackQuery
+from aiogram.types import TelegramObject, Message, CallbackQuery, Update
 
 
 class ThrottlingMiddleware(BaseMiddleware):
-    """Rate limiting middleware - 1 message per second per user."""
+    """Rate limiting middleware - 1 message per second per user.
+
+    Also drops updates it has already seen: Telegram redelivers an update
+    (same update_id) when a webhook response times out.
+
+    Register it as an outer middleware on ``dp.update`` to throttle messages
+    (``rate_limit``) and callback queries (``callback_rate_limit``, default
+    ``rate_limit``) before routing and filters run; it also works on a
+    single event observer.
+    """
     
-    def __init__(self, rate_limit: float = 1.0):
+    def __init__(
+        self,
+        rate_limit: float = 1.0,
+        max_users: int = 10_000,
+        max_updates: int = 16_384,
+        callback_rate_limit: Optional[float] = None,
+    ):
         self.rate_limit = rate_limit
-        self.user_last_message: Dict[int, float] = {}
+        self.callback_rate_limit = (
+            rate_limit if callback_rate_limit is None else callback_rate_limit
+        )
+        self.max_users = max_users
+        # LRU of last event time per user and event kind; oldest entries are
+        # evicted first
+        self.user_last_message: OrderedDict[int, float] = OrderedDict()
+        self.user_last_callback: OrderedDict[int, float] = OrderedDict()
+        # Recently seen update IDs: the deque keeps arrival order for eviction,
+        # the set answers membership
+        self._seen_updates: deque[int] = deque(maxlen=max_updates)
+        self._seen_update_ids: set[int] = set()
     
     async def __call__(
         self,
@@ -20,34 +47,49 @@ class ThrottlingMiddleware(BaseMiddleware):
         event: TelegramObject,
         data: Dict[str, Any]
     ) -> Any:
-        # Get user ID
-        user_id = None
-        if isinstance(event, Message) and event.from_user:
-            user_id = event.from_user.id
-        elif isinstance(event, CallbackQuery) and event.from_user:
-            user_id = event.from_user.id
+        # Drop redelivered updates
+        update = event if isinstance(event, Update) else data.get("event_update")
+        if update is not None:
+            update_id = update.update_id
+            if update_id in self._seen_update_ids:
+                return None
+            seen = self._seen_updates
+            if len(seen) == seen.maxlen:
+                self._seen_update_ids.discard(seen[0])
+            seen.append(update_id)
+            self._seen_update_ids.add(update_id)
+        
+        # Registered on dp.update: throttle the message or callback inside
+        target = event
+        if isinstance(event, Update):
+            target = event.message or event.callback_query
         
+        if isinstance(target, Message):
+            table, rate_limit = self.user_last_message, self.rate_limit
+        elif isinstance(target, CallbackQuery):
+            table, rate_limit = self.user_last_callback, self.callback_rate_limit
+        else:
+            return await handler(event, data)
+        
+        # Get user ID
+        user_id = target.from_user.id if target.from_user else None
         if not user_id:
             return await handler(event, data)
         
-        now = time.time()
+        now = time.monotonic()
         
         # Check rate limit
-        if user_id in self.user_last_message:
-            elapsed = now - self.user_last_message[user_id]
-            if elapsed < self.rate_limit:
-                # Too fast - ignore message silently
-                return None
+        last = table.get(user_id)
+        if last is not None and now - last < rate_limit:
+            # Too fast - ignore message silently
+            return None
         
         # Update last message time
-        self.user_last_message[user_id] = now
-        
-        # Cleanup old entries (every 100 users)
-        if len(self.user_last_message) > 1000:
-            cutoff = now - 60  # Remove entries older than 1 minute
-            self.user_last_message = {
-                uid: ts for uid, ts in self.user_last_message.items()
-                if ts > cutoff
-            }
+        table[user_id] = now
+        table.move_to_end(user_id)
+        
+        # Evict least recently active users
+        while len(table) > self.max_users:
+            table.popitem(last=False)
         
         return await handler(event, data)
@@ -0,0 +1,52 @@
+"""User context middleware - auth and subscription checks in one pass."""
+
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Message, Update
+
+from .auth import load_user, reject_blocked
+from .subscription import SubscriptionType, get_subscription_status, within_free_limits
+
+
+class UserContextMiddleware(BaseMiddleware):
+    """AuthMiddleware and SubscriptionMiddleware fused into one middleware.
+
+    Loads the user, rejects blocked users and, for messages, resolves the
+    subscription status and enforces free-tier limits - without a second
+    middleware frame per update. Sets the same handler data as the pair.
+
+    Meant to be an outer middleware on ``dp.update`` (it then looks at the
+    message or callback query inside); it also works on a single event
+    observer.
+    """
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        target = event
+        if isinstance(event, Update):
+            target = event.message or event.callback_query
+        
+        user = await load_user(target)
+        if not user:
+            return await handler(event, data)
+        
+        if await reject_blocked(target, user):
+            return None
+        
+        now = time.time()
+        data["user"] = user
+        data["now"] = now
+        
+        # Subscription limits apply to messages only (not callbacks)
+        if isinstance(target, Message):
+            status = get_subscription_status(user, now)
+            if status is SubscriptionType.FREE and not await within_free_limits(target, user):
+                return None
+        
+        return await handler(event, data)
@@ -4,7 +4,16 @@ from .ai import (
     transcribe,
     generate_response,
     synthesize,
+    synthesize_stream,
     get_word_info,
     explain_correction,
     TOPICS
 )
+from .response_cache import (
+    explanation_cache,
+    response_cache,
+    response_key,
+    voice_cache,
+    word_info_cache,
+)
+from .router import template_reply
@@ -1,17 +1,28 @@
 """AI services - OpenAI integration for STT, LLM, and TTS."""
 
-import json
+import importlib.util
+import io
 import logging
-from typing import Optional
+from functools import lru_cache
+from typing import AsyncIterator, Iterable, Optional
 
-from openai import AsyncOpenAI
+import orjson
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, Timeout
 
 from bot.config import settings
+from bot.services.response_cache import explanation_cache, word_info_cache
 
 logger = logging.getLogger(__name__)
 
-# OpenAI client - uses OPENAI_API_KEY from env
-client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+# OpenAI client - uses OPENAI_API_KEY from env. One client (and connection
+# pool) for STT, chat and TTS; with the optional h2 package installed, HTTP/2
+# multiplexes concurrent calls over one connection. The timeout replaces the
+# SDK's 10-minute read default, far beyond any call the bot makes.
+client = AsyncOpenAI(
+    api_key=settings.OPENAI_API_KEY,
+    timeout=Timeout(30.0, connect=5.0),
+    http_client=DefaultAsyncHttpxClient(http2=importlib.util.find_spec("h2") is not None),
+)
 
 # Topic definitions for prompts
 TOPICS = {
@@ -27,23 +38,33 @@ TOPICS = {
 # Speed mapping for TTS
 SPEED_MAP = {"slow": 0.8, "normal": 1.0, "fast": 1.2}
 
+# Speech-to-text routing: short clips (the typical learner phrase; Telegram
+# opus is ~2-4 KB per second) go to the lower-latency model
+STT_MODEL = "whisper-1"
+STT_FAST_MODEL = "gpt-4o-mini-transcribe"
+STT_FAST_MAX_BYTES = 64_000
 
-async def transcribe(audio_bytes: bytes, filename: str = "audio.ogg") -> str:
+
+async def transcribe(audio: bytes | io.BytesIO, filename: str = "audio.ogg") -> str:
     """
-    Transcribe audio to Chinese text using Whisper.
+    Transcribe audio to Chinese text (gpt-4o-mini-transcribe for short
+    clips, Whisper otherwise).
 
     Args:
-        audio_bytes: Audio data in bytes
+        audio: Audio data, as bytes or the BytesIO returned by
+            Bot.download_file (uploaded as is, without copying it out)
         filename: Name hint for the file (default: audio.ogg)
 
     Returns:
         Transcribed text in Chinese
     """
-    logger.debug(f"Transcribing audio, size: {len(audio_bytes)} bytes")
+    size = len(audio) if isinstance(audio, bytes) else audio.getbuffer().nbytes
+    model = STT_FAST_MODEL if size < STT_FAST_MAX_BYTES else STT_MODEL
+    logger.debug(f"Transcribing audio, size: {size} bytes, model: {model}")
 
     transcript = await client.audio.transcriptions.create(
-        model="whisper-1",
-        file=(filename, audio_bytes, "audio/ogg"),
+        model=model,
+        file=(filename, audio, "audio/ogg"),
         language="zh"  # Chinese
     )
 
@@ -51,32 +72,12 @@ async def transcribe(audio_bytes: bytes, filename: str = "audio.ogg") -> str:
     return transcript.text
 
 
-async def generate_response(
-    user_message: str,
-    history: list[dict],
-    topic: str,
-    hsk_level: int
-) -> dict:
-    """
-    Generate bot response with corrections using GPT-4o-mini.
-
-    Args:
-        user_message: User's message in Chinese
-        history: Conversation history (list of {"role": "user"|"assistant", "content": str})
-        topic: Current dialogue topic
-        hsk_level: User's HSK level (1-3)
-
-    Returns:
-        dict with keys:
-        - correction: dict with original, corrected, corrected_pinyin, explanation (or None)
-        - response: Bot's response in Chinese
-        - pinyin: Pinyin transcription
-        - translation: Russian translation
-        - suggestions: List of dicts with "text" (Chinese) and "pinyin" keys
-    """
+@lru_cache(maxsize=32)
+def _system_prompt(topic: str, hsk_level: int) -> str:
+    """Dialog system prompt; one per (topic, HSK level) pair, built once."""
     topic_name = TOPICS.get(topic, TOPICS["daily"])
 
-    system_prompt = f"""你是一个中文老师，帮助学生练习汉语口语。
+    return f"""你是一个中文老师，帮助学生练习汉语口语。
 
 当前话题: {topic_name}
 学生水平: HSK {hsk_level}
@@ -99,10 +100,35 @@ async def generate_response(
     ]
 }}"""
 
+
+async def generate_response(
+    user_message: str,
+    history: Iterable[dict],
+    topic: str,
+    hsk_level: int
+) -> dict:
+    """
+    Generate bot response with corrections using GPT-4o-mini.
+
+    Args:
+        user_message: User's message in Chinese
+        history: Recent conversation, oldest first, already trimmed by the
+            caller ({"role": "user"|"assistant", "content": str} each)
+        topic: Current dialogue topic
+        hsk_level: User's HSK level (1-3)
+
+    Returns:
+        dict with keys:
+        - correction: dict with original, corrected, corrected_pinyin, explanation (or None)
+        - response: Bot's response in Chinese
+        - pinyin: Pinyin transcription
+        - translation: Russian translation
+        - suggestions: List of dicts with "text" (Chinese) and "pinyin" keys
+    """
     # Build messages list
     messages = [
-        {"role": "system", "content": system_prompt},
-        *history[-10:],  # Last 10 messages for context
+        {"role": "system", "content": _system_prompt(topic, hsk_level)},
+        *history,
         {"role": "user", "content": user_message}
     ]
 
@@ -119,7 +145,7 @@ async def generate_response(
     content = response.choices[0].message.content
     logger.debug(f"LLM response: {content[:200]}...")
 
-    result = json.loads(content)
+    result = orjson.loads(content)
 
     # Ensure all required fields exist
     result.setdefault("correction", None)
@@ -160,6 +186,32 @@ async def synthesize(text: str, speed: str = "normal") -> bytes:
     return audio_bytes
 
 
+async def synthesize_stream(text: str, speed: str = "normal") -> AsyncIterator[bytes]:
+    """
+    Stream synthesized speech as OpenAI TTS produces it.
+
+    Args:
+        text: Text to synthesize (Chinese)
+        speed: Speech speed - "slow", "normal", or "fast"
+
+    Yields:
+        Chunks of opus audio, in order
+    """
+    tts_speed = SPEED_MAP.get(speed, 1.0)
+
+    logger.debug(f"Streaming synthesis: {text[:50]}... (speed: {speed})")
+
+    async with client.audio.speech.with_streaming_response.create(
+        model="tts-1",
+        voice="nova",
+        input=text,
+        speed=tts_speed,
+        response_format="opus"
+    ) as response:
+        async for chunk in response.iter_bytes():
+            yield chunk
+
+
 async def get_word_info(hanzi: str, context: Optional[str] = None) -> dict:
     """
     Get pinyin and translation for a Chinese word/phrase.
@@ -169,8 +221,15 @@ async def get_word_info(hanzi: str, context: Optional[str] = None) -> dict:
         context: Optional context where the word was used
 
     Returns:
-        dict with pinyin and translation
+        dict with pinyin and translation (shared from word_info_cache;
+        do not mutate)
     """
+    hanzi = hanzi.strip()
+    key = (hanzi, context)
+    cached = word_info_cache.get(key)
+    if cached is not None:
+        return cached
+
     prompt = f"""Дай пиньинь и перевод для:
 汉字: {hanzi}
 {"Контекст: " + context if context else ""}
@@ -186,7 +245,9 @@ async def get_word_info(hanzi: str, context: Optional[str] = None) -> dict:
         max_tokens=100
     )
 
-    return json.loads(response.choices[0].message.content)
+    info = orjson.loads(response.choices[0].message.content)
+    word_info_cache.set(key, info)
+    return info
 
 
 async def explain_correction(
@@ -205,6 +266,12 @@ async def explain_correction(
     Returns:
         Detailed explanation in Russian
     """
+    original, corrected = original.strip(), corrected.strip()
+    key = (original, corrected, hsk_level)
+    cached = explanation_cache.get(key)
+    if cached is not None:
+        return cached
+
     prompt = f"""Объясни ошибку подробно для студента уровня HSK {hsk_level}:
 
 Неправильно: {original}
@@ -222,4 +289,7 @@ async def explain_correction(
         max_tokens=300
     )
 
-    return response.choices[0].message.content
+    explanation = response.choices[0].message.content
+    if explanation:
+        explanation_cache.set(key, explanation)
+    return explanation
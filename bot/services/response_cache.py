@@ -0,0 +1,49 @@
+"""Reuse of LLM/TTS results for repeated inputs.
+
+Dialog replies for repeated utterances, voices for repeated reply texts,
+and word info / correction explanations for recurring vocabulary and
+learner mistakes.
+"""
+
+import re
+import unicodedata
+
+from bot.utils import TTLCache
+
+# Whitespace, punctuation and symbols (emoji included); hanzi, letters and
+# digits are word characters and are kept
+_NON_WORD_RE = re.compile(r"[\W_]+")
+
+# (ai_result, file_id of the voice reply already uploaded to Telegram),
+# keyed by response_key()
+response_cache: TTLCache[tuple, tuple[dict, str]] = TTLCache(maxsize=2000, ttl=6 * 3600)
+
+# file_id of the voice already uploaded for a reply text, keyed by
+# (response_text, speech_speed): short stock replies ("好的。", "对不起。")
+# come back from the LLM for many different utterances
+voice_cache: TTLCache[tuple[str, str], str] = TTLCache(maxsize=1000, ttl=24 * 3600)
+
+# get_word_info() results keyed by (hanzi, context) and explain_correction()
+# results keyed by (original, corrected, hsk_level); common HSK vocabulary
+# and typical mistakes recur across users
+word_info_cache: TTLCache[tuple, dict] = TTLCache(maxsize=5000, ttl=30 * 86400)
+explanation_cache: TTLCache[tuple, str] = TTLCache(maxsize=5000, ttl=30 * 86400)
+
+
+def normalize_utterance(text: str) -> str:
+    """Fold a user utterance for matching: NFKC, no punctuation/spaces, lowercase.
+
+    "你好！", "你好" and " 你好。" normalize alike, as do "你好，你叫什么？"
+    and "你好 你叫什么". Only characters that cannot change the correction
+    are dropped: near-miss wordings stay distinct.
+    """
+    return _NON_WORD_RE.sub("", unicodedata.normalize("NFKC", text)).lower()
+
+
+def response_key(topic: str, hsk_level: int, speed: str, text: str) -> tuple:
+    """Cache key for a user utterance: dialog settings plus normalized text.
+
+    The speech speed is part of it because the cached reply includes the
+    synthesized audio.
+    """
+    return (topic, hsk_level, speed, normalize_utterance(text))
@@ -0,0 +1,72 @@
+"""Dialog routing - answer stock beginner phrases without the LLM."""
+
+from types import MappingProxyType
+from typing import Optional
+
+from bot.services.response_cache import normalize_utterance
+
+
+def _reply(response: str, pinyin: str, translation: str, *suggestions: tuple[str, str]) -> dict:
+    return {
+        "correction": None,
+        "response": response,
+        "pinyin": pinyin,
+        "translation": translation,
+        "suggestions": [{"text": text, "pinyin": py} for text, py in suggestions],
+    }
+
+
+# Error-free HSK 1 phrases whose teacher reply does not depend on the topic
+# or the conversation so far, keyed by normalize_utterance(); replies are
+# shared dicts and must not be mutated
+_TEMPLATES = MappingProxyType({
+    "你好": _reply(
+        "你好！你今天好吗？", "Nǐ hǎo! Nǐ jīntiān hǎo ma?", "Привет! Как ты сегодня?",
+        ("我很好，谢谢。", "Wǒ hěn hǎo, xièxie."), ("我不太好。", "Wǒ bú tài hǎo."),
+    ),
+    "您好": _reply(
+        "您好！您今天好吗？", "Nín hǎo! Nín jīntiān hǎo ma?", "Здравствуйте! Как вы сегодня?",
+        ("我很好，谢谢。", "Wǒ hěn hǎo, xièxie."), ("我不太好。", "Wǒ bú tài hǎo."),
+    ),
+    "你好吗": _reply(
+        "我很好，谢谢！你呢？", "Wǒ hěn hǎo, xièxie! Nǐ ne?", "У меня всё хорошо, спасибо! А у тебя?",
+        ("我也很好。", "Wǒ yě hěn hǎo."), ("我有点儿累。", "Wǒ yǒudiǎnr lèi."),
+    ),
+    "谢谢": _reply(
+        "不客气！", "Bú kèqi!", "Не за что!",
+        ("再见！", "Zàijiàn!"), ("我们说汉语吧。", "Wǒmen shuō Hànyǔ ba."),
+    ),
+    "谢谢你": _reply(
+        "不客气！", "Bú kèqi!", "Не за что!",
+        ("再见！", "Zàijiàn!"), ("我们说汉语吧。", "Wǒmen shuō Hànyǔ ba."),
+    ),
+    "对不起": _reply(
+        "没关系！", "Méi guānxi!", "Ничего страшного!",
+        ("谢谢。", "Xièxie."), ("我们说汉语吧。", "Wǒmen shuō Hànyǔ ba."),
+    ),
+    "再见": _reply(
+        "再见！明天见！", "Zàijiàn! Míngtiān jiàn!", "До свидания! До завтра!",
+        ("明天见！", "Míngtiān jiàn!"), ("好的，再见。", "Hǎo de, zàijiàn."),
+    ),
+    "早上好": _reply(
+        "早上好！你吃早饭了吗？", "Zǎoshang hǎo! Nǐ chī zǎofàn le ma?",
+        "Доброе утро! Ты уже позавтракал(а)?",
+        ("我吃了。", "Wǒ chī le."), ("我还没吃。", "Wǒ hái méi chī."),
+    ),
+    "晚上好": _reply(
+        "晚上好！你今天忙吗？", "Wǎnshang hǎo! Nǐ jīntiān máng ma?",
+        "Добрый вечер! Ты сегодня занят(а)?",
+        ("我很忙。", "Wǒ hěn máng."), ("我不忙。", "Wǒ bù máng."),
+    ),
+})
+
+
+def template_reply(user_message: str, hsk_level: int) -> Optional[dict]:
+    """generate_response()-shaped reply for a stock phrase, or None.
+
+    Only HSK 1 learners get templates; at higher levels the LLM's richer
+    replies are the point of the exercise.
+    """
+    if hsk_level != 1:
+        return None
+    return _TEMPLATES.get(normalize_utterance(user_message))
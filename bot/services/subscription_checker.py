@@ -7,13 +7,40 @@ from datetime import datetime
 from aiogram import Bot
 
 from bot.config import settings
-from bot.database.repositories import UserRepository
+from bot.database.repositories import UserRepository, user_repo
+from bot.utils.rate_limit import RateLimiter
 
 logger = logging.getLogger(__name__)
 
 # Check interval: every 1 hour
 CHECK_INTERVAL_SECONDS = 3600
 
+# Expiry notices are sent concurrently, spaced under Telegram's rate limit
+NOTIFY_CONCURRENCY = 20
+NOTIFY_RATE_PER_SECOND = 25
+
+_TRIAL_EXPIRED_TEXT = (
+    "⏰ <b>Ваш бесплатный триал закончился!</b>\n\n"
+    "Вы использовали 3 дня полного доступа.\n"
+    "Теперь действуют лимиты Free-версии:\n\n"
+    f"• {settings.FREE_TEXT_LIMIT} текстовых сообщений/день\n"
+    f"• {settings.FREE_VOICE_LIMIT} голосовых сообщений/день\n\n"
+    "💎 <b>Хотите продолжить без ограничений?</b>\n"
+    f"Подписка Premium — всего ₽{settings.PREMIUM_PRICE // 100}/мес\n\n"
+    "✅ Безлимитные голосовые и текстовые сообщения\n"
+    "✅ Приоритетная поддержка"
+)
+
+_PREMIUM_EXPIRED_TEXT = (
+    "⏰ <b>Ваша подписка Premium истекла!</b>\n\n"
+    "К сожалению, срок действия вашей Premium-подписки закончился.\n"
+    "Теперь действуют лимиты Free-версии:\n\n"
+    f"• {settings.FREE_TEXT_LIMIT} текстовых сообщений/день\n"
+    f"• {settings.FREE_VOICE_LIMIT} голосовых сообщений/день\n\n"
+    "💎 <b>Продлите подписку, чтобы продолжить без ограничений!</b>\n"
+    f"Premium — ₽{settings.PREMIUM_PRICE // 100}/мес"
+)
+
 
 def _get_premium_keyboard_markup():
     """Build inline keyboard with Tribute payment button."""
@@ -30,34 +57,38 @@ def _get_premium_keyboard_markup():
     return InlineKeyboardMarkup(inline_keyboard=buttons) if buttons else None
 
 
+async def _notify_all(bot: Bot, users: list, text: str, what: str) -> int:
+    """Send `text` to every user concurrently. Returns count of delivered messages.
+
+    Round trips overlap, but sends are spaced to stay under Telegram's
+    ~30 msg/s bot-wide limit.
+    """
+    keyboard = _get_premium_keyboard_markup()
+    semaphore = asyncio.Semaphore(NOTIFY_CONCURRENCY)
+    limiter = RateLimiter(NOTIFY_RATE_PER_SECOND)
+
+    async def send(user) -> bool:
+        async with semaphore:
+            try:
+                async with limiter:
+                    await bot.send_message(
+                        user.id, text, reply_markup=keyboard, parse_mode="HTML"
+                    )
+            except Exception as e:
+                logger.warning(f"Failed to notify user {user.id} about {what}: {e}")
+                return False
+            return True
+
+    return sum(await asyncio.gather(*map(send, users)))
+
+
 async def _notify_trial_expired(bot: Bot, user_repo: UserRepository) -> int:
     """Notify users whose trial period has ended. Returns count of notified users."""
     users = await user_repo.get_expired_trial_users()
-    notified = 0
+    notified = await _notify_all(bot, users, _TRIAL_EXPIRED_TEXT, "trial expiry")
 
-    for user in users:
-        try:
-            keyboard = _get_premium_keyboard_markup()
-            await bot.send_message(
-                user.id,
-                "⏰ <b>Ваш бесплатный триал закончился!</b>\n\n"
-                "Вы использовали 3 дня полного доступа.\n"
-                "Теперь действуют лимиты Free-версии:\n\n"
-                f"• {settings.FREE_TEXT_LIMIT} текстовых сообщений/день\n"
-                f"• {settings.FREE_VOICE_LIMIT} голосовых сообщений/день\n\n"
-                "💎 <b>Хотите продолжить без ограничений?</b>\n"
-                f"Подписка Premium — всего ₽{settings.PREMIUM_PRICE // 100}/мес\n\n"
-                "✅ Безлимитные голосовые и текстовые сообщения\n"
-                "✅ Приоритетная поддержка",
-                reply_markup=keyboard,
-                parse_mode="HTML"
-            )
-            notified += 1
-        except Exception as e:
-            logger.warning(f"Failed to notify user {user.id} about trial expiry: {e}")
-
-        # Always mark as notified to avoid retrying failed sends forever
-        await user_repo.mark_trial_notified(user.id)
+    # Always mark as notified to avoid retrying failed sends forever
+    await user_repo.mark_trial_notified_many([user.id for user in users])
 
     return notified
 
@@ -65,37 +96,16 @@ async def _notify_trial_expired(bot: Bot, user_repo: UserRepository) -> int:
 async def _notify_premium_expired(bot: Bot, user_repo: UserRepository) -> int:
     """Notify users whose premium subscription has expired. Returns count of notified users."""
     users = await user_repo.get_expired_premium_users()
-    notified = 0
-
-    for user in users:
-        try:
-            keyboard = _get_premium_keyboard_markup()
-            await bot.send_message(
-                user.id,
-                "⏰ <b>Ваша подписка Premium истекла!</b>\n\n"
-                "К сожалению, срок действия вашей Premium-подписки закончился.\n"
-                "Теперь действуют лимиты Free-версии:\n\n"
-                f"• {settings.FREE_TEXT_LIMIT} текстовых сообщений/день\n"
-                f"• {settings.FREE_VOICE_LIMIT} голосовых сообщений/день\n\n"
-                "💎 <b>Продлите подписку, чтобы продолжить без ограничений!</b>\n"
-                f"Premium — ₽{settings.PREMIUM_PRICE // 100}/мес",
-                reply_markup=keyboard,
-                parse_mode="HTML"
-            )
-            notified += 1
-        except Exception as e:
-            logger.warning(f"Failed to notify user {user.id} about premium expiry: {e}")
+    notified = await _notify_all(bot, users, _PREMIUM_EXPIRED_TEXT, "premium expiry")
 
-        # Always mark as notified to avoid retrying failed sends forever
-        await user_repo.mark_premium_expired_notified(user.id)
+    # Always mark as notified to avoid retrying failed sends forever
+    await user_repo.mark_premium_expired_notified_many([user.id for user in users])
 
     return notified
 
 
 async def check_subscriptions(bot: Bot) -> None:
     """Run a single check for expired trials and premiums."""
-    user_repo = UserRepository()
-
     trial_count = await _notify_trial_expired(bot, user_repo)
     premium_count = await _notify_premium_expired(bot, user_repo)
 
@@ -109,14 +119,24 @@ async def check_subscriptions(bot: Bot) -> None:
 async def start_subscription_checker(bot: Bot) -> None:
     """Start the periodic subscription checker as a background task.
     
-    Runs check_subscriptions every CHECK_INTERVAL_SECONDS (1 hour).
+    Runs check_subscriptions every CHECK_INTERVAL_SECONDS (1 hour), measured
+    from the start of one run to the next, so run time does not add drift.
+    A run that overruns the interval is followed by the next one at once.
     """
     logger.info(f"Subscription checker started (interval: {CHECK_INTERVAL_SECONDS}s)")
+    loop = asyncio.get_running_loop()
 
     while True:
+        started = loop.time()
         try:
             await check_subscriptions(bot)
         except Exception as e:
             logger.error(f"Subscription checker error: {e}", exc_info=True)
 
-        await asyncio.sleep(CHECK_INTERVAL_SECONDS)
+        elapsed = loop.time() - started
+        if elapsed > CHECK_INTERVAL_SECONDS:
+            logger.warning(
+                f"Subscription check took {elapsed:.0f}s, "
+                f"longer than the {CHECK_INTERVAL_SECONDS}s interval"
+            )
+        await asyncio.sleep(max(0.0, CHECK_INTERVAL_SECONDS - elapsed))
@@ -1,5 +1,11 @@
 """Utilities module."""
 
+from .cache import TTLCache
+from .input_file import StreamInputFile
+from .loader import DataLoader
+from .rate_limit import RateLimiter
+from .tasks import spawn
+from .time import days_until
 from .hsk import (
     load_hsk_dictionary,
     get_vocabulary_for_level,
@@ -2,22 +2,29 @@
 
 import json
 import os
+import random
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
-from typing import Optional
+from typing import NamedTuple, Optional
 
 # Path to data directory
 DATA_DIR = Path(__file__).parent.parent.parent / "data"
 
 
-def load_hsk_dictionary(level: int) -> list[dict]:
+@lru_cache(maxsize=4)
+def load_hsk_dictionary(level: int) -> tuple[dict, ...]:
     """
     Load HSK vocabulary for a given level.
     
+    The file is parsed once per process; the result is shared, so callers
+    must not modify the word dictionaries.
+    
     Args:
         level: HSK level (1, 2, or 3)
     
     Returns:
-        List of word dictionaries with keys: hanzi, pinyin, translation
+        Word dictionaries with keys: hanzi, pinyin, translation
     """
     if level not in [1, 2, 3]:
         raise ValueError(f"Invalid HSK level: {level}. Must be 1, 2, or 3.")
@@ -25,15 +32,16 @@ def load_hsk_dictionary(level: int) -> list[dict]:
     filepath = DATA_DIR / f"hsk{level}.json"
     
     if not filepath.exists():
-        return []
+        return ()
     
     with open(filepath, "r", encoding="utf-8") as f:
         data = json.load(f)
     
-    return data.get("words", [])
+    return tuple(data.get("words", ()))
 
 
-def get_vocabulary_for_level(level: int) -> list[dict]:
+@lru_cache(maxsize=4)
+def get_vocabulary_for_level(level: int) -> tuple[dict, ...]:
     """
     Get cumulative vocabulary up to and including the given HSK level.
     
@@ -41,12 +49,32 @@ def get_vocabulary_for_level(level: int) -> list[dict]:
         level: HSK level (1, 2, or 3)
     
     Returns:
-        Combined list of words from HSK 1 up to the given level
+        Combined words from HSK 1 up to the given level (shared, read-only)
     """
     words = []
     for l in range(1, level + 1):
         words.extend(load_hsk_dictionary(l))
-    return words
+    return tuple(words)
+
+
+class _HskIndex(NamedTuple):
+    """Lookup tables over one level's words, by position in the word list."""
+    by_hanzi: dict[str, int]
+    by_pinyin: dict[str, int]  # Lowercased pinyin
+    translations: tuple[str, ...]  # Lowercased, in word order
+
+
+@lru_cache(maxsize=4)
+def _build_index(level: int) -> _HskIndex:
+    by_hanzi: dict[str, int] = {}
+    by_pinyin: dict[str, int] = {}
+    translations = []
+    for i, word in enumerate(load_hsk_dictionary(level)):
+        # setdefault: the first of duplicate entries wins, as in a scan
+        by_hanzi.setdefault(word["hanzi"], i)
+        by_pinyin.setdefault(word["pinyin"].lower(), i)
+        translations.append(word["translation"].lower())
+    return _HskIndex(by_hanzi, by_pinyin, tuple(translations))
 
 
 def search_word(query: str, level: int = 3) -> Optional[dict]:
@@ -64,11 +92,21 @@ def search_word(query: str, level: int = 3) -> Optional[dict]:
     
     for l in range(1, level + 1):
         words = load_hsk_dictionary(l)
-        for word in words:
-            if (word["hanzi"] == query or 
-                word["pinyin"].lower() == query_lower or
-                query_lower in word["translation"].lower()):
-                return {**word, "hsk_level": l}
+        index = _build_index(l)
+        
+        # First word matching by hanzi or pinyin, unless a translation
+        # match comes earlier in the list
+        found = min(
+            index.by_hanzi.get(query, len(words)),
+            index.by_pinyin.get(query_lower, len(words)),
+        )
+        for i, translation in enumerate(islice(index.translations, found)):
+            if query_lower in translation:
+                found = i
+                break
+        
+        if found < len(words):
+            return {**words[found], "hsk_level": l}
     
     return None
 
@@ -84,8 +122,6 @@ def get_random_words(count: int = 5, level: int = 1) -> list[dict]:
     Returns:
         List of random words
     """
-    import random
-    
     words = load_hsk_dictionary(level)
     if not words:
         return []
@@ -0,0 +1,57 @@
+"""Telegram upload helpers."""
+
+import asyncio
+from typing import TYPE_CHECKING, AsyncGenerator, AsyncIterable, Optional
+
+from aiogram.types import InputFile
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+
+class StreamInputFile(InputFile):
+    """Uploads chunks from an async iterable as they arrive.
+
+    Lets a generated file (e.g. TTS audio) go out to Telegram while it is
+    still being produced. Single use: the iterable is consumed by the upload.
+    """
+
+    def __init__(self, chunks: AsyncIterable[bytes], filename: str):
+        super().__init__(filename=filename)
+        self.chunks = chunks
+        self._queue: Optional[asyncio.Queue[Optional[bytes]]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def prefetch(self) -> "StreamInputFile":
+        """Start consuming the chunks now; the upload picks them up later.
+
+        Overlaps producing the file with whatever the caller awaits before
+        sending it. Call cancel() if the file ends up not being sent.
+        """
+        queue: asyncio.Queue[Optional[bytes]] = asyncio.Queue()
+
+        async def pump() -> None:
+            try:
+                async for chunk in self.chunks:
+                    queue.put_nowait(chunk)
+            finally:
+                queue.put_nowait(None)
+
+        self._queue = queue
+        self._task = asyncio.create_task(pump())
+        return self
+
+    def cancel(self) -> None:
+        """Stop a prefetch started with prefetch()."""
+        if self._task is not None:
+            self._task.cancel()
+
+    async def read(self, bot: "Bot") -> AsyncGenerator[bytes, None]:
+        if self._task is None:
+            async for chunk in self.chunks:
+                yield chunk
+            return
+
+        while (chunk := await self._queue.get()) is not None:
+            yield chunk
+        await self._task  # Re-raise a failure of the source
@@ -0,0 +1,60 @@
+"""Request coalescing for concurrent lookups."""
+
+import asyncio
+from typing import Awaitable, Callable, Generic, Hashable, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class DataLoader(Generic[K, V]):
+    """Collects keys requested within ``delay`` seconds into one batch call.
+
+    ``batch_fn`` receives the distinct keys and returns a mapping; keys it
+    leaves out resolve to None. Concurrent loads of the same key share a
+    single lookup.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[list[K]], Awaitable[dict[K, V]]],
+        delay: float = 0.005,
+        max_batch: int = 100,
+    ):
+        self.batch_fn = batch_fn
+        self.delay = delay
+        self.max_batch = max_batch
+        self._pending: dict[K, asyncio.Future] = {}
+        self._handle: Optional[asyncio.TimerHandle] = None
+
+    async def load(self, key: K) -> Optional[V]:
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[key] = future
+            if len(self._pending) >= self.max_batch:
+                self._dispatch()
+            elif self._handle is None:
+                self._handle = loop.call_later(self.delay, self._dispatch)
+        # A cancelled caller must not cancel the lookup shared with others
+        return await asyncio.shield(future)
+
+    def _dispatch(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        batch, self._pending = self._pending, {}
+        asyncio.create_task(self._run(batch))
+
+    async def _run(self, batch: dict[K, asyncio.Future]) -> None:
+        try:
+            results = await self.batch_fn(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for key, future in batch.items():
+                if not future.done():
+                    future.set_result(results.get(key))
@@ -0,0 +1,28 @@
+"""Async rate limiting helpers."""
+
+import asyncio
+
+
+class RateLimiter:
+    """Spaces acquisitions so at most ``max_rate`` happen per ``period`` seconds.
+
+    Usage: ``async with limiter: await bot.send_message(...)``. Waiters are
+    given evenly spaced slots, so bursts are smoothed rather than rejected.
+    """
+
+    def __init__(self, max_rate: float, period: float = 1.0):
+        self.interval = period / max_rate
+        self._next_slot = 0.0
+
+    async def acquire(self) -> None:
+        now = asyncio.get_running_loop().time()
+        slot = max(self._next_slot, now)
+        self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def __aenter__(self) -> None:
+        await self.acquire()
+
+    async def __aexit__(self, *exc_info) -> None:
+        return None
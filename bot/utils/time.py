@@ -0,0 +1,8 @@
+"""Date helpers shared by the subscription screens."""
+
+from datetime import datetime
+
+
+def days_until(moment: datetime) -> int:
+    """Whole days from now (naive UTC, as stored in the DB) until ``moment``."""
+    return (moment - datetime.utcnow()).days
@@ -11,9 +11,15 @@ from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_applicati
 from aiohttp import web
 
 from bot.config import settings
-from bot.database import init_db
+from bot.database import init_db, close_db, last_active_flusher
 from bot.handlers import setup_routers
-from bot.middlewares import AuthMiddleware, SubscriptionMiddleware, ThrottlingMiddleware
+from bot.middlewares import (
+    CallbackDataMiddleware,
+    ChatActionMiddleware,
+    ThrottlingMiddleware,
+    UserContextMiddleware,
+)
+from bot.services.ai import client as openai_client
 
 logging.basicConfig(
     level=getattr(logging, settings.LOG_LEVEL),
@@ -43,6 +49,10 @@ def _resolve_public_base_url() -> str:
 
 async def on_startup(bot: Bot):
     """Set webhook on startup."""
+    # Prime Bot.me()'s cache so the first /invite doesn't wait on getMe
+    # (start_polling does this itself in polling mode)
+    await bot.me()
+
     # Delete any existing webhook first
     await bot.delete_webhook(drop_pending_updates=True)
 
@@ -63,6 +73,9 @@ async def on_shutdown(bot: Bot):
     logger.info("Removing webhook...")
     await bot.delete_webhook()
     await bot.session.close()
+    await openai_client.close()
+    await last_active_flusher.stop()
+    await close_db()
 
 
 async def health_check(request):
@@ -82,6 +95,7 @@ async def main():
     # Initialize database
     logger.info("Initializing database...")
     await init_db()
+    last_active_flusher.start()
 
     # Create bot instance
     bot = Bot(
@@ -92,13 +106,13 @@ async def main():
     # Create dispatcher
     dp = Dispatcher()
 
-    # Register middlewares
-    dp.message.middleware(ThrottlingMiddleware(rate_limit=1.0))
-    dp.message.middleware(AuthMiddleware())
-    dp.message.middleware(SubscriptionMiddleware())
+    # Register middlewares. Throttling and the user context run once per
+    # update, before routing; rate-limited updates skip filters
+    dp.update.outer_middleware(ThrottlingMiddleware(rate_limit=1.0, callback_rate_limit=0.5))
+    dp.update.outer_middleware(UserContextMiddleware())  # Auth + subscription limits
 
-    dp.callback_query.middleware(ThrottlingMiddleware(rate_limit=0.5))
-    dp.callback_query.middleware(AuthMiddleware())
+    dp.message.middleware(ChatActionMiddleware())  # Needs the matched handler's flags
+    dp.callback_query.middleware(CallbackDataMiddleware())
 
     # Register handlers
     router = setup_routers()
@@ -119,11 +133,13 @@ async def main():
     webhook_handler.register(app, path="/webhook")
 
     # Import and add Tribute webhook handler (payment processing)
-    from webhook_server import tribute_webhook_handler
+    from webhook_server import pool_stats_handler, tribute_webhook_handler
     app.router.add_post('/webhook/tribute', tribute_webhook_handler)
 
     # Add health check
     app.router.add_get('/health', health_check)
+    if settings.DEBUG_ENDPOINTS:
+        app.router.add_get('/debug/pool', pool_stats_handler)
     app.router.add_get('/', health_check)
 
     # Setup application
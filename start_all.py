@@ -9,6 +9,14 @@ import logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
 logger = logging.getLogger(__name__)
 
+# Set by Railway in every deployment; their presence means production
+_RAILWAY_KEYS = frozenset((
+    "RAILWAY_STATIC_URL",
+    "RAILWAY_ENVIRONMENT",
+    "RAILWAY_PROJECT_ID",
+    "RAILWAY_SERVICE_ID",
+))
+
 processes = []
 
 
@@ -26,12 +34,7 @@ def signal_handler(sig, frame):
 async def main():
     """Run both bot and webhook server."""
     # Safety: never run polling bundle on Railway
-    if (
-        os.environ.get("RAILWAY_STATIC_URL")
-        or os.environ.get("RAILWAY_ENVIRONMENT")
-        or os.environ.get("RAILWAY_PROJECT_ID")
-        or os.environ.get("RAILWAY_SERVICE_ID")
-    ):
+    if any(os.environ.get(key) for key in _RAILWAY_KEYS):
         logger.error(
             "start_all.py is for local dev only. On Railway use railway_start.py."
         )
@@ -19,6 +19,7 @@ import hashlib
 import os
 import sys
 import pytest
+import pytest_asyncio
 import tempfile
 from datetime import datetime, timedelta
 from pathlib import Path
@@ -45,6 +46,22 @@ def _patch_db(tmp_path, monkeypatch):
     monkeypatch.setattr(db_mod, "DB_PATH", db_file)
 
 
+@pytest_asyncio.fixture(autouse=True)
+async def _close_pool():
+    """Close the connection pool opened by init_db() before the test loop goes away."""
+    yield
+    from bot.database.database import close_db
+    from bot.database.repositories import (
+        _user_cache, _user_count_cache, _stats_cache, _message_cache, _history_cache,
+    )
+    await close_db()
+    _user_cache.clear()
+    _message_cache.clear()
+    _history_cache.clear()
+    _user_count_cache.clear()
+    _stats_cache.clear()
+
+
 @pytest.fixture
 def event_loop():
     loop = asyncio.new_event_loop()
@@ -489,6 +506,24 @@ class TestSubscriptionExpiryNotifications:
         assert len(trial_msgs) >= 1, f"Expected trial notification, got: {all_texts}"
         assert len(premium_msgs) >= 1, f"Expected premium expiry notification, got: {all_texts}"
 
+        # Everyone notified is flagged, so a second run sends nothing
+        mock_bot.send_message.reset_mock()
+        await check_subscriptions(mock_bot)
+        mock_bot.send_message.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_premium_expired_minutes_ago_is_detected(self):
+        """Expiry is detected the same day, not only after the date rolls over."""
+        await _init()
+        await _create_user(55140)
+
+        from bot.database.repositories import UserRepository
+        repo = UserRepository()
+        await repo.update(55140, premium_until=(datetime.utcnow() - timedelta(minutes=1)).isoformat())
+
+        expired = await repo.get_expired_premium_users()
+        assert [u.id for u in expired] == [55140]
+
 
 class TestWebhookIntegration:
     """Test the actual webhook HTTP handler end-to-end."""
@@ -660,3 +695,764 @@ class TestDatabasePersistence:
 
         payments = await payment_repo.get_user_payments(55003)
         assert len(payments) == 3
+
+    @pytest.mark.asyncio
+    async def test_init_db_enables_wal(self):
+        """init_db should switch the database file to WAL journal mode."""
+        await _init()
+
+        from bot.database.database import get_db
+        async with get_db() as db:
+            cursor = await db.execute("PRAGMA journal_mode")
+            row = await cursor.fetchone()
+        assert row[0].lower() == "wal"
+
+    @pytest.mark.asyncio
+    async def test_payment_for_unknown_user_is_recorded(self):
+        """Tribute may pay for a user who never pressed /start — keep the record."""
+        await _init()
+
+        from bot.database.repositories import PaymentRepository
+        payment_repo = PaymentRepository()
+
+        await payment_repo.create(
+            user_id=55999,
+            amount=77000,
+            days_granted=30,
+            source="payment",
+            status="completed"
+        )
+
+        payments = await payment_repo.get_user_payments(55999)
+        assert len(payments) == 1
+
+    @pytest.mark.asyncio
+    async def test_timestamps_parsed_in_both_formats(self):
+        """TIMESTAMP columns written by SQLite (' ') and isoformat() ('T') both load as datetimes."""
+        await _init()
+        await _create_user(55101)
+
+        from bot.database.database import get_db
+        async with get_db() as db:
+            await db.execute(
+                "UPDATE users SET created_at = ?, premium_until = ? WHERE id = 55101",
+                ("2025-03-04 05:06:07", "2025-04-05T06:07:08.123456"),
+            )
+            await db.commit()
+
+        from bot.database.repositories import UserRepository
+        user = await UserRepository().get(55101)
+        assert user.created_at == datetime(2025, 3, 4, 5, 6, 7)
+        assert user.premium_until == datetime(2025, 4, 5, 6, 7, 8, 123456)
+
+    @pytest.mark.asyncio
+    async def test_migrations_tracked_by_user_version(self):
+        """Migrations run once, including on databases that predate user_version."""
+        await _init()
+
+        from bot.database.database import get_db, MIGRATIONS
+        async with get_db() as db:
+            # Simulate a legacy database: columns exist but no version recorded
+            await db.execute("PRAGMA user_version = 0")
+            await db.commit()
+
+        await _init()
+        await _init()
+
+        async with get_db() as db:
+            async with db.execute("PRAGMA user_version") as cursor:
+                assert (await cursor.fetchone())[0] == len(MIGRATIONS)
+            async with db.execute("SELECT trial_notified FROM users LIMIT 1") as cursor:
+                await cursor.fetchone()
+
+    @pytest.mark.asyncio
+    async def test_failed_migration_is_retried(self):
+        """A migration error rolls back without advancing user_version."""
+        import aiosqlite
+        await _init()
+
+        from bot.database.database import get_db, run_migrations, MIGRATIONS
+        broken = [*MIGRATIONS, "ALTER TABLE missing_table ADD COLUMN x INTEGER"]
+        async with get_db() as db:
+            with patch("bot.database.database.MIGRATIONS", broken):
+                with pytest.raises(aiosqlite.OperationalError):
+                    await run_migrations(db)
+            async with db.execute("PRAGMA user_version") as cursor:
+                assert (await cursor.fetchone())[0] == len(MIGRATIONS)
+
+
+class TestConnectionPool:
+    """Test the shared SQLite connection pool."""
+
+    @pytest.mark.asyncio
+    async def test_connection_is_reused(self):
+        """get_db should hand out pooled connections instead of opening new ones."""
+        await _init()
+
+        from bot.database.database import get_db, _pool
+        async with get_db() as db:
+            first = db
+        seen = set()
+        for _ in range(_pool.size + 1):
+            async with get_db() as db:
+                seen.add(id(db))
+        assert id(first) in seen
+        assert len(seen) <= _pool.size
+
+    @pytest.mark.asyncio
+    async def test_open_transaction_rolled_back_on_error(self):
+        """An exception inside get_db must not leak a half-finished transaction."""
+        await _init()
+        await _create_user(55100)
+
+        from bot.database.database import get_db
+        with pytest.raises(RuntimeError):
+            async with get_db() as db:
+                await db.execute("UPDATE users SET first_name = 'Changed' WHERE id = 55100")
+                assert db.in_transaction
+                raise RuntimeError("boom")
+
+        from bot.database.repositories import UserRepository
+        user = await UserRepository().get(55100)
+        assert user.first_name == "Test"
+
+    @pytest.mark.asyncio
+    async def test_closed_pool_rejects_acquire(self):
+        """After close_db() the pool must refuse to hand out connections."""
+        await _init()
+
+        from bot.database.database import get_db, close_db
+        await close_db()
+        with pytest.raises(RuntimeError):
+            async with get_db():
+                pass
+
+    @pytest.mark.asyncio
+    async def test_exhausted_pool_times_out(self):
+        """acquire() gives up after acquire_timeout when every connection is borrowed."""
+        await _init()
+
+        from bot.database.database import _pool, get_pool_stats
+        _pool.acquire_timeout = 0.05
+        borrowed = [_pool.acquire() for _ in range(_pool.size)]
+        for cm in borrowed:
+            await cm.__aenter__()
+        try:
+            assert get_pool_stats()["in_use"] == _pool.size
+            with pytest.raises(TimeoutError):
+                async with _pool.acquire():
+                    pass
+        finally:
+            for cm in borrowed:
+                await cm.__aexit__(None, None, None)
+
+        stats = get_pool_stats()
+        assert stats["idle"] == _pool.size and stats["timeouts_total"] == 1
+
+    @pytest.mark.asyncio
+    async def test_db_timeout_reply_only_for_admins(self):
+        """The admin pool-timeout reply leaves other users' errors unhandled."""
+        from aiogram.dispatcher.event.bases import UNHANDLED
+        from aiogram.types import Chat, ErrorEvent, Message, Update, User
+        from bot.handlers.admin import on_db_timeout
+
+        def error_for(user_id: int) -> ErrorEvent:
+            message = Message(
+                message_id=1, date=datetime.now(), chat=Chat(id=user_id, type="private"),
+                from_user=User(id=user_id, is_bot=False, first_name="Test"), text="/admin",
+            )
+            return ErrorEvent(update=Update(update_id=1, message=message), exception=TimeoutError())
+
+        with patch.dict("bot.handlers.admin.settings.__dict__", {"admin_ids": frozenset({777})}), \
+                patch.object(Message, "answer", new_callable=AsyncMock) as answer:
+            assert await on_db_timeout(error_for(55271)) is UNHANDLED
+            answer.assert_not_awaited()
+            assert await on_db_timeout(error_for(777)) is not UNHANDLED
+            answer.assert_awaited_once()
+
+
+class TestRepositories:
+    """Test repository queries and bulk writes."""
+
+    @pytest.mark.asyncio
+    async def test_batched_message_writes_return_matching_ids(self):
+        """Concurrent create_many calls share transactions but each gets its own IDs."""
+        await _init()
+        await _create_user(55102)
+
+        from bot.database.models import Message
+        from bot.database.repositories import MessageRepository
+        repo = MessageRepository()
+
+        results = await asyncio.gather(*[
+            repo.create_many([
+                Message(user_id=55102, role="user", content=f"q{i}", correction={"n": i}),
+                Message(user_id=55102, role="assistant", content=f"a{i}"),
+            ])
+            for i in range(20)
+        ])
+
+        for i, (user_id, assistant_id) in enumerate(results):
+            assert (await repo.get(user_id)).content == f"q{i}"
+            assert (await repo.get(user_id)).correction == {"n": i}
+            assert (await repo.get(assistant_id)).content == f"a{i}"
+
+    @pytest.mark.asyncio
+    async def test_admin_stats_single_query(self):
+        """get_stats returns every counter from the combined query."""
+        await _init()
+        await _create_user(55103)
+        await _create_user(55104, created_at=datetime.utcnow() - timedelta(days=10))
+
+        from bot.database.repositories import AdminRepository, UserRepository, MessageRepository
+        await UserRepository().add_premium_days(55103, 30)
+        await MessageRepository().create(55103, "user", "你好")
+
+        stats = await AdminRepository().get_stats()
+        assert stats["total_users"] == 2
+        assert stats["new_today"] == 1
+        assert stats["new_week"] == 1
+        assert stats["new_month"] == 2
+        assert stats["premium_users"] == 1
+        assert stats["messages_today"] == 1
+        assert stats["conversion"] == 50.0
+
+    @pytest.mark.asyncio
+    async def test_concurrent_premium_grants_all_apply(self):
+        """Concurrent add_premium_days calls must not overwrite each other."""
+        await _init()
+        await _create_user(55105)
+
+        from bot.database.repositories import UserRepository
+        repo = UserRepository()
+        await asyncio.gather(*[repo.add_premium_days(55105, 30) for _ in range(3)])
+
+        user = await repo.get(55105)
+        delta = user.premium_until - datetime.utcnow()
+        assert 89 <= delta.days <= 90
+
+    @pytest.mark.asyncio
+    async def test_users_list_keyset_pages(self):
+        """get_users_page walks newest-first pages forwards and back; count_users totals them."""
+        await _init()
+        for uid in range(55110, 55115):
+            await _create_user(uid)
+
+        from bot.database.repositories import AdminRepository
+        repo = AdminRepository()
+
+        # Same created_at second for all rows: id breaks the tie
+        page1, more = await repo.get_users_page(limit=2)
+        assert [u.id for u in page1] == [55114, 55113] and more
+
+        page2, more = await repo.get_users_page(limit=2, after_id=page1[-1].id)
+        assert [u.id for u in page2] == [55112, 55111] and more
+
+        page3, more = await repo.get_users_page(limit=2, after_id=page2[-1].id)
+        assert [u.id for u in page3] == [55110] and not more
+
+        back, more = await repo.get_users_page(limit=2, before_id=page3[0].id)
+        assert [u.id for u in back] == [55112, 55111] and more
+
+        back, more = await repo.get_users_page(limit=2, before_id=back[0].id)
+        assert [u.id for u in back] == [55114, 55113] and not more
+
+        assert await repo.count_users() == 5
+
+    @pytest.mark.asyncio
+    async def test_count_by_referrer(self):
+        """count_by_referrer returns total and subscribed counts from one scan."""
+        await _init()
+        for uid in (55120, 55121, 55122, 55123):
+            await _create_user(uid)
+
+        from bot.database.repositories import ReferralRepository
+        repo = ReferralRepository()
+        assert await repo.count_by_referrer(55120) == (0, 0)
+
+        for uid in (55121, 55122, 55123):
+            await repo.create(55120, uid)
+        await repo.update_status(55122, "subscribed")
+
+        assert await repo.count_by_referrer(55120) == (3, 1)
+
+    @pytest.mark.asyncio
+    async def test_admin_user_details(self):
+        """get_user_details returns the user and all counters from one query."""
+        await _init()
+        await _create_user(55130, username="ref_owner")
+        from bot.database.repositories import (
+            UserRepository, MessageRepository, ReferralRepository, PaymentRepository, AdminRepository,
+        )
+        await UserRepository().create(55131, "invited", "Inv", referrer_id=55130)
+        await ReferralRepository().create(55130, 55131)
+        await MessageRepository().create(55131, "user", "你好")
+        await PaymentRepository().create(user_id=55131, amount=77000, days_granted=30)
+
+        details = await AdminRepository().get_user_details(55131)
+        assert details["user"].id == 55131
+        assert details["msg_count"] == 1
+        assert details["words_count"] == 0
+        assert details["payment_count"] == 1
+        assert details["referrer"] == "ref_owner"
+        assert details["referrals_count"] == 0
+
+        assert (await AdminRepository().get_user_details(55130))["referrals_count"] == 1
+        assert await AdminRepository().get_user_details(55999) is None
+
+    @pytest.mark.asyncio
+    async def test_broadcast_audience_streams_in_pages(self):
+        """iter_broadcast_audience yields every recipient across page boundaries."""
+        await _init()
+        ids = list(range(55150, 55157))
+        for uid in ids:
+            await _create_user(uid)
+
+        from bot.database.repositories import AdminRepository, UserRepository
+        await UserRepository().block(55153)
+        repo = AdminRepository()
+
+        streamed = [uid async for uid in repo.iter_broadcast_audience("all", batch_size=2)]
+        assert streamed == [uid for uid in ids if uid != 55153]
+        assert await repo.count_broadcast_audience("all") == len(streamed)
+
+    @pytest.mark.asyncio
+    async def test_bulk_create_and_grant(self):
+        """create_many / add_premium_days_many write every row in one call."""
+        await _init()
+        for uid in (55180, 55181, 55182):
+            await _create_user(uid)
+
+        from bot.database.repositories import (
+            UserRepository, ReferralRepository, PaymentRepository,
+        )
+        referral_repo = ReferralRepository()
+        assert await referral_repo.create_many([(55180, 55181), (55180, 55182)]) == 2
+        assert await referral_repo.create_many([(55180, 55181)]) == 0
+
+        await PaymentRepository().create_many([
+            (55181, 19900, "RUB", None, f"bulk-{i}", "completed", 30, "payment")
+            for i in range(3)
+        ])
+        assert len(await PaymentRepository().get_user_payments(55181)) == 3
+
+        updated = await UserRepository().add_premium_days_many([55180, 55182, 99999], 10)
+        assert set(updated) == {55180, 55182}
+        user = await UserRepository().get(55182)
+        assert user.premium_until == updated[55182]
+        assert 9 <= (user.premium_until - datetime.utcnow()).days <= 10
+
+    @pytest.mark.asyncio
+    async def test_username_lookup_ignores_case(self):
+        """get_by_username and admin search match usernames case-insensitively."""
+        await _init()
+        await _create_user(55190, username="MixedCase")
+
+        from bot.database.repositories import UserRepository, AdminRepository
+        assert (await UserRepository().get_by_username("mixedcase")).id == 55190
+        assert (await AdminRepository().search_user("@MIXEDCASE")).id == 55190
+
+    @pytest.mark.asyncio
+    async def test_touch_writes_rename_with_last_active(self):
+        """A renamed user is saved in one UPDATE; an unchanged one is only buffered."""
+        await _init()
+        user = await _create_user(55260, username="old")
+
+        from bot.database.repositories import UserRepository, LastActiveFlusher
+        import bot.database.repositories as repos
+
+        flusher = LastActiveFlusher(interval=3600)
+        repo = UserRepository()
+        with patch.object(repos, "last_active_flusher", flusher):
+            flusher.start()
+            await repo.touch(user, "old")
+            assert 55260 in flusher._pending
+
+            await repo.touch(user, "new")
+            assert (await repo.get_cached(55260)).username == "new"
+            await flusher.stop()
+
+    @pytest.mark.asyncio
+    async def test_generated_help_is_stored_on_message(self):
+        """Suggestions and explanations survive a cache eviction once stored."""
+        await _init()
+        await _create_user(55210)
+
+        from bot.database.repositories import MessageRepository, _message_cache
+        repo = MessageRepository()
+        message_id = await repo.create(55210, "assistant", "你好")
+        assert (await repo.get(message_id)).suggestions is None
+
+        suggestions = [{"text": "你好", "pinyin": "nǐ hǎo"}]
+        await repo.set_suggestions(message_id, suggestions)
+        await repo.set_explanation(message_id, "Порядок слов")
+        _message_cache.clear()
+
+        msg = await repo.get(message_id)
+        assert msg.suggestions == suggestions
+        assert msg.explanation == "Порядок слов"
+        assert await repo.get(message_id) is msg
+
+
+class TestRepositoryCaches:
+    """Test the in-process user, message and history caches."""
+
+    @pytest.mark.asyncio
+    async def test_cached_user_is_evicted_on_write(self):
+        """get_cached serves repeat reads and drops the entry after a mutation."""
+        await _init()
+        await _create_user(55160)
+
+        from bot.database.repositories import UserRepository, _user_cache
+        repo = UserRepository()
+        _user_cache.clear()
+
+        first = await repo.get_cached(55160)
+        assert await repo.get_cached(55160) is first
+
+        await repo.block(55160)
+        user = await repo.get_cached(55160)
+        assert user is not first
+        assert user.is_blocked
+
+    @pytest.mark.asyncio
+    async def test_last_active_is_flushed_in_batches(self):
+        """While the flusher runs, touches are buffered and written on stop()."""
+        await _init()
+        await _create_user(55170)
+        await _create_user(55171)
+
+        from bot.database.database import get_db
+        from bot.database.repositories import UserRepository, LastActiveFlusher
+        import bot.database.repositories as repos
+
+        async with get_db() as db:
+            await db.execute(
+                "UPDATE users SET last_active_at = '2000-01-01 00:00:00' WHERE id IN (55170, 55171)"
+            )
+            await db.commit()
+
+        flusher = LastActiveFlusher(interval=3600)
+        repo = UserRepository()
+        with patch.object(repos, "last_active_flusher", flusher):
+            flusher.start()
+            await repo.update_last_active(55170)
+            await repo.update_last_active(55171)
+            assert (await repo.get(55170)).last_active_at.year == 2000
+
+            await flusher.stop()
+
+        for uid in (55170, 55171):
+            user = await repo.get(uid)
+            assert (datetime.utcnow() - user.last_active_at).total_seconds() < 60
+
+    @pytest.mark.asyncio
+    async def test_concurrent_loads_share_one_query(self):
+        """UserRepository.load coalesces concurrent lookups into one get_many call."""
+        await _init()
+        await _create_user(55200)
+        await _create_user(55201)
+
+        from bot.database.repositories import UserRepository, _user_loader
+        repo = UserRepository()
+        batch_fn = AsyncMock(side_effect=repo.get_many)
+
+        with patch.object(_user_loader, "batch_fn", batch_fn):
+            a, b, again, missing = await asyncio.gather(
+                repo.load(55200), repo.load(55201), repo.load(55200), repo.load(99999)
+            )
+
+        batch_fn.assert_awaited_once()
+        assert sorted(batch_fn.await_args.args[0]) == [55200, 55201, 99999]
+        assert (a.id, b.id, missing) == (55200, 55201, None)
+        assert again is a
+
+    @pytest.mark.asyncio
+    async def test_concurrent_message_loads_share_one_query(self):
+        """MessageRepository.load coalesces clicks on several buttons into one get_many call."""
+        await _init()
+        await _create_user(55220)
+
+        from bot.database.repositories import MessageRepository, _message_loader
+        repo = MessageRepository()
+        first = await repo.create(55220, "assistant", "你好")
+        second = await repo.create(55220, "assistant", "再见")
+        batch_fn = AsyncMock(side_effect=repo.get_many)
+
+        with patch.object(_message_loader, "batch_fn", batch_fn):
+            a, b, again = await asyncio.gather(
+                repo.load(first), repo.load(second), repo.load(first)
+            )
+            assert await repo.load(first) is a  # Served from the message cache
+
+        batch_fn.assert_awaited_once()
+        assert sorted(batch_fn.await_args.args[0]) == [first, second]
+        assert (a.content, b.content) == ("你好", "再见")
+        assert again is a
+
+    @pytest.mark.asyncio
+    async def test_history_cache_follows_saved_turns(self):
+        """A warm topic history is extended by saves instead of re-queried."""
+        await _init()
+        await _create_user(55240)
+
+        from bot.database.models import Message
+        from bot.database.repositories import MessageRepository
+        repo = MessageRepository()
+        await repo.create(55240, "user", "早上好", topic="daily")
+        await repo.create(55240, "user", "Other topic", topic="food")
+        assert [m.content for m in await repo.get_history(55240, topic="daily")] == ["早上好"]
+
+        with patch.object(repo, "_select_history", AsyncMock()) as select:
+            await repo.create_many([
+                Message(user_id=55240, role="user", content="你好", topic="daily"),
+                Message(user_id=55240, role="assistant", content="你好！", topic="daily"),
+            ])
+            history = await repo.get_history(55240, limit=2, topic="daily")
+        select.assert_not_awaited()
+        assert [(m.role, m.content) for m in history] == [("user", "你好"), ("assistant", "你好！")]
+        assert history[1].id is not None
+
+
+class TestResponseCache:
+    """Test cached and templated replies that skip the LLM."""
+
+    def test_response_key_normalizes_utterance(self):
+        """Repeated phrasings share a reply cache key; dialog settings split it."""
+        from bot.services.response_cache import response_key
+
+        key = response_key("daily", 1, "normal", "你好！")
+        assert response_key("daily", 1, "normal", " 你 好。") == key
+        assert response_key("daily", 1, "normal", "你好?") == key
+        assert response_key("daily", 1, "normal", "你好，我是学生！") == \
+            response_key("daily", 1, "normal", "你好 我是学生 🙂")
+        assert response_key("daily", 1, "normal", "我是学生") != \
+            response_key("daily", 1, "normal", "我是学")
+        assert response_key("daily", 2, "normal", "你好") != key
+        assert response_key("daily", 1, "slow", "你好") != key
+
+    @pytest.mark.asyncio
+    async def test_repeated_explanation_skips_llm(self):
+        """The same correction at the same level is explained by the LLM once."""
+        from bot.services import ai
+
+        reply = MagicMock()
+        reply.choices[0].message.content = "Порядок слов: время идёт перед глаголом."
+        create = AsyncMock(return_value=reply)
+        with patch.object(ai.client.chat.completions, "create", create):
+            first = await ai.explain_correction("我吃饭今天", "我今天吃饭", hsk_level=1)
+            again = await ai.explain_correction(" 我吃饭今天", "我今天吃饭 ", hsk_level=1)
+            await ai.explain_correction("我吃饭今天", "我今天吃饭", hsk_level=2)
+        assert first == again
+        assert create.await_count == 2
+
+    def test_stock_phrases_answered_from_templates(self):
+        """HSK 1 greetings get a canned reply; other levels and phrases go to the LLM."""
+        from bot.services.router import template_reply
+
+        reply = template_reply("你好！", hsk_level=1)
+        assert reply["response"] and reply["correction"] is None
+        assert template_reply(" 你好 ", hsk_level=1) is reply
+        assert template_reply("你好", hsk_level=2) is None
+        assert template_reply("我好", hsk_level=1) is None
+
+
+class TestReferrals:
+    """Test referral handling on /start."""
+
+    @pytest.mark.asyncio
+    async def test_referral_start_grants_bonus_in_background(self):
+        """/start ref_<code> shows the welcome first; bonuses land in a background task."""
+        await _init()
+        referrer = await _create_user(55230)
+        user = await _create_user(55231)
+
+        from aiogram.filters import CommandObject
+        from bot.handlers.start import cmd_start_with_referral
+        from bot.database.repositories import UserRepository, ReferralRepository
+        from bot.utils.tasks import _background_tasks
+
+        message = MagicMock()
+        message.answer = AsyncMock()
+        message.bot.send_message = AsyncMock()
+        command = CommandObject(command="start", args=f"ref_{referrer.referral_code}")
+
+        await cmd_start_with_referral(message, command, user)
+        message.answer.assert_awaited_once()
+        await asyncio.gather(*_background_tasks)
+
+        assert (await UserRepository().get(55231)).referrer_id == 55230
+        assert (await ReferralRepository().get_by_referred(55231)).referrer_id == 55230
+        for user_id in (55230, 55231):
+            assert (await UserRepository().get(user_id)).premium_until is not None
+        message.bot.send_message.assert_awaited_once()
+
+
+class TestThrottling:
+    """Test the throttling middleware."""
+
+    @pytest.mark.asyncio
+    async def test_throttling_evicts_least_recent_user(self):
+        """The throttle table stays bounded and drops the idlest user first."""
+        from aiogram.types import Chat, Message, User
+        from bot.middlewares.throttling import ThrottlingMiddleware
+
+        throttle = ThrottlingMiddleware(rate_limit=60, max_users=2)
+        handler = AsyncMock(return_value="ok")
+
+        def message(user_id):
+            return Message(
+                message_id=1, date=datetime.now(), chat=Chat(id=user_id, type="private"),
+                from_user=User(id=user_id, is_bot=False, first_name="u"), text="你好",
+            )
+
+        for user_id in (1, 2, 3):
+            assert await throttle(handler, message(user_id), {}) == "ok"
+        assert await throttle(handler, message(3), {}) is None
+        assert list(throttle.user_last_message) == [2, 3]
+        assert await throttle(handler, message(1), {}) == "ok"
+
+    @pytest.mark.asyncio
+    async def test_throttling_drops_redelivered_update(self):
+        """An update_id seen before is dropped even when the rate limit allows it."""
+        from aiogram.types import Chat, Message, Update, User
+        from bot.middlewares.throttling import ThrottlingMiddleware
+
+        throttle = ThrottlingMiddleware(rate_limit=0, max_updates=2)
+        handler = AsyncMock(return_value="ok")
+        message = Message(
+            message_id=1, date=datetime.now(), chat=Chat(id=1, type="private"),
+            from_user=User(id=1, is_bot=False, first_name="u"), text="你好",
+        )
+
+        def call(update_id):
+            update = Update(update_id=update_id, message=message)
+            return throttle(handler, message, {"event_update": update})
+
+        assert await call(10) == "ok"
+        assert await call(10) is None
+        assert await call(11) == "ok"
+        assert await call(12) == "ok"  # Evicts 10 from the window of 2
+        assert await call(10) == "ok"
+
+
+class TestMiddlewares:
+    """Test user context and update-level middleware wiring."""
+
+    @pytest.mark.asyncio
+    async def test_user_context_middleware_enforces_free_limit(self):
+        """One middleware pass loads the user and stops a free user at the limit."""
+        await _init()
+        await _create_user(55250, created_at=datetime.utcnow() - timedelta(days=10))
+
+        from aiogram.types import Chat, Message, User
+        from bot.config import settings
+        from bot.database.repositories import DailyUsageRepository
+        from bot.middlewares import UserContextMiddleware
+
+        message = Message(
+            message_id=1, date=datetime.now(), chat=Chat(id=55250, type="private"),
+            from_user=User(id=55250, is_bot=False, first_name="Test", username="testuser"),
+            text="你好",
+        )
+        handler = AsyncMock(return_value="ok")
+        data = {}
+        with patch.object(Message, "answer", AsyncMock()) as answer:
+            assert await UserContextMiddleware()(handler, message, data) == "ok"
+            assert data["user"].id == 55250
+
+            for _ in range(settings.FREE_TEXT_LIMIT):
+                await DailyUsageRepository().increment_text(55250)
+            assert await UserContextMiddleware()(handler, message, {}) is None
+        handler.assert_awaited_once()
+        answer.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_update_level_middlewares_reach_handlers(self):
+        """Outer update middlewares throttle per event kind and inject the user."""
+        await _init()
+        await _create_user(55270)
+
+        from aiogram import Bot, Dispatcher, Router
+        from aiogram.types import CallbackQuery, Chat, Message, Update, User
+        from bot.middlewares import ThrottlingMiddleware, UserContextMiddleware
+
+        dp = Dispatcher()
+        dp.update.outer_middleware(ThrottlingMiddleware(rate_limit=60, callback_rate_limit=60))
+        dp.update.outer_middleware(UserContextMiddleware())
+        router = Router()
+        seen = []
+
+        @router.message()
+        async def on_message(message: Message, user):
+            seen.append(("message", user.id))
+
+        @router.callback_query()
+        async def on_callback(callback: CallbackQuery, user):
+            seen.append(("callback", user.id))
+
+        dp.include_router(router)
+        tg_user = User(id=55270, is_bot=False, first_name="Test", username="testuser")
+        message = Message(
+            message_id=1, date=datetime.now(), chat=Chat(id=55270, type="private"),
+            from_user=tg_user, text="/start",
+        )
+        callback = CallbackQuery(id="1", from_user=tg_user, chat_instance="1", data="noop")
+        bot = Bot("1:test")
+        await dp.feed_update(bot, Update(update_id=1, message=message))
+        await dp.feed_update(bot, Update(update_id=2, message=message))  # Throttled
+        await dp.feed_update(bot, Update(update_id=3, callback_query=callback))
+        await bot.session.close()
+        assert seen == [("message", 55270), ("callback", 55270)]
+
+
+class TestTextToSpeech:
+    """Test the streamed TTS upload."""
+
+    @pytest.mark.asyncio
+    async def test_prefetched_upload_reads_ahead(self):
+        """prefetch() consumes the source before the upload reads it, in order."""
+        from bot.utils import StreamInputFile
+
+        produced = []
+
+        async def chunks():
+            for chunk in (b"a", b"b", b"c"):
+                produced.append(chunk)
+                yield chunk
+
+        voice = StreamInputFile(chunks(), filename="response.opus").prefetch()
+        await asyncio.sleep(0)
+        assert produced == [b"a", b"b", b"c"]
+        assert [chunk async for chunk in voice.read(None)] == produced
+
+        async def failing():
+            yield b"a"
+            raise RuntimeError("tts failed")
+
+        voice = StreamInputFile(failing(), filename="response.opus").prefetch()
+        with pytest.raises(RuntimeError):
+            [chunk async for chunk in voice.read(None)]
+
+
+class TestHsk:
+    """Test HSK dictionary loading and search."""
+
+    def test_hsk_dictionaries_parsed_once(self):
+        """HSK word lists are loaded once and shared as immutable sequences."""
+        from bot.utils.hsk import get_vocabulary_for_level, load_hsk_dictionary
+
+        words = load_hsk_dictionary(1)
+        assert isinstance(words, tuple) and words
+        assert load_hsk_dictionary(1) is words
+        assert get_vocabulary_for_level(2)[:len(words)] == words
+
+    def test_search_word_uses_index_in_list_order(self):
+        """Indexed search matches hanzi, pinyin and translation like a list scan."""
+        from bot.utils.hsk import load_hsk_dictionary, search_word
+
+        first, second = load_hsk_dictionary(1)[:2]
+        assert search_word(first["hanzi"])["hanzi"] == first["hanzi"]
+        assert search_word(second["pinyin"].upper())["hanzi"] == second["hanzi"]
+        assert search_word(first["translation"].upper())["hsk_level"] == 1
+        assert search_word("несуществующее слово") is None
@@ -1,5 +1,4 @@
 """Webhook server for Tribute payment notifications."""
-import asyncio
 import hmac
 import hashlib
 import logging
@@ -11,8 +10,8 @@ from aiogram import Bot
 sys.path.insert(0, '.')
 
 from bot.config import settings
-from bot.database import init_db
-from bot.database.repositories import UserRepository, PaymentRepository, ReferralRepository
+from bot.database import init_db, close_db, get_pool_stats
+from bot.database.repositories import user_repo, payment_repo, referral_repo
 
 logging.basicConfig(
     level=getattr(logging, settings.LOG_LEVEL),
@@ -69,12 +68,7 @@ async def tribute_webhook_handler(request):
                 logger.error("Missing telegram_user_id in payload")
                 return web.json_response({'error': 'Missing user_id'}, status=400)
             
-            # Grant premium access
-            user_repo = UserRepository()
-            payment_repo = PaymentRepository()
-            referral_repo = ReferralRepository()
-            
-            # Add 30 days premium
+            # Grant premium access: add 30 days premium
             new_premium_until = await user_repo.add_premium_days(user_id, days=30)
             logger.info(f"Premium granted to user {user_id} until {new_premium_until}")
             
@@ -148,6 +142,11 @@ async def health_check_handler(request):
     })
 
 
+async def pool_stats_handler(request):
+    """Database pool usage, for tuning DB_POOL_SIZE / DB_POOL_TIMEOUT."""
+    return web.json_response(get_pool_stats())
+
+
 async def init_app():
     """Initialize webhook application."""
     # Initialize database
@@ -158,7 +157,10 @@ async def init_app():
     app = web.Application()
     app.router.add_post('/webhook/tribute', tribute_webhook_handler)
     app.router.add_get('/health', health_check_handler)
+    if settings.DEBUG_ENDPOINTS:
+        app.router.add_get('/debug/pool', pool_stats_handler)
     app.router.add_get('/', health_check_handler)
+    app.on_cleanup.append(lambda _app: close_db())
     
     return app
 
@@ -175,9 +177,8 @@ def main():
     if not settings.TRIBUTE_PRODUCT_ID:
         logger.warning("⚠️  TRIBUTE_PRODUCT_ID not set! Payment processing may fail.")
     
-    # Run app
-    app = asyncio.run(init_app())
-    web.run_app(app, host='0.0.0.0', port=settings.WEBHOOK_PORT)
+    # Run app (init_app runs inside the server loop so the DB pool lives there)
+    web.run_app(init_app(), host='0.0.0.0', port=settings.WEBHOOK_PORT)
 
 
 if __name__ == '__main__':